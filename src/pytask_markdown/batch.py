@@ -0,0 +1,497 @@
+"""Render compatible marp tasks or tasks of a quarto project with a single process.
+
+Starting marp means booting Node.js and, for pdf, png and pptx documents, a headless
+browser. When many tasks share the same options and theme set, marp can convert all
+of their scripts in one invocation which amortizes the startup costs. Similarly,
+quarto loads a project and resolves cross references for every ``quarto render``, so
+tasks whose scripts belong to the same project are rendered with one project render.
+
+Marp writes the output of every input file next to the input file and quarto into the
+output directory of the project. After the batch finished, the outputs are moved to
+the documents of the tasks. Tasks whose output is missing after the batch, because it
+failed or exceeded ``markdown_timeout``, are rendered individually afterwards which
+means failures are still reported for the task which caused them.
+
+"""
+from __future__ import annotations
+
+import contextlib
+import functools
+import os
+import re
+import shutil
+import subprocess
+import time
+from pathlib import Path
+from typing import Any
+from typing import Generator
+
+import networkx as nx
+from pytask import has_mark
+from pytask import Session
+from pytask import Task
+from pytask_markdown import renderers
+from pytask_markdown.browser import check_connected
+from pytask_markdown.browser import get_browser
+from pytask_markdown.compilation_steps import SUFFIX_TO_QUARTO_FORMAT
+from pytask_markdown.metrics import run_command
+from pytask_markdown.processes import deadline
+from pytask_markdown.tokens import TokenPool
+from pytask_markdown.utils import get_dag
+from pytask_markdown.utils import keep_unchanged
+from pytask_markdown.utils import move_aside
+from pytask_markdown.utils import replace_if_changed
+
+
+_SKIP_MARKERS = (
+    "skip",
+    "skipif",
+    "skip_unchanged",
+    "skip_ancestor_failed",
+    "would_be_executed",
+    "persist",
+)
+
+_SUFFIX_TO_FORMAT_OPTIONS = {
+    ".html": [],
+    ".pdf": ["--pdf"],
+    ".png": ["--image", "png"],
+    ".pptx": ["--pptx"],
+}
+
+_QUARTO_PROJECT_FILES = ("_quarto.yml", "_quarto.yaml")
+_QUARTO_OUTPUT_DIR = re.compile(
+    r"^[ \t]+output-dir[ \t]*:[ \t]*[\"']?([^\"'#\n]+?)[\"']?[ \t]*(?:#.*)?$", re.M
+)
+_QUARTO_PROJECT_TYPE = re.compile(r"^[ \t]+type[ \t]*:[ \t]*[\"']?(\w+)", re.M)
+_QUARTO_DEFAULT_OUTPUT_DIRS = {"website": "_site", "book": "_book"}
+
+
+class _Batch:
+    """A group of tasks which can be rendered with one process."""
+
+    def __init__(self) -> None:
+        self.members: dict[str, tuple[Path, Path]] = {}
+        self.claimed: set[str] = set()
+        self.rendered: set[Path] = set()
+
+    def add(self, task_name: str, path_to_md: Path, path_to_document: Path) -> None:
+        """Add a task to the batch."""
+        self.members[task_name] = (path_to_md, path_to_document)
+
+    def has_rendered(self, path_to_document: Path) -> bool:
+        """Check whether the document was already produced by the batch."""
+        return path_to_document in self.rendered
+
+    def _claim_ready_members(self, session: Session, task: Task) -> list[str]:
+        """Claim the task and return it together with other members which are ready.
+
+        Members whose documents were already rendered by the batch are left out.
+
+        """
+        assert task.name is not None
+        if session.config["dry_run"] or not is_ready(session, task.name):
+            return []
+        self.claimed.add(task.name)
+        names = [task.name] + [
+            name
+            for name in self.members
+            if name not in self.claimed and is_ready(session, name)
+        ]
+        return [name for name in names if not self.has_rendered(self.members[name][1])]
+
+    def _move_outputs(
+        self,
+        members: dict[str, tuple[Path, Path, Path]],
+        start: float,
+        previous_documents: dict[Path, Path],
+    ) -> None:
+        """Move the outputs which were written by the batch to the documents.
+
+        Documents with the same content as the output are not touched. Documents which
+        were moved aside and not rendered by the batch are put back.
+
+        """
+        for _, path_to_document, natural_output in members.values():
+            if natural_output.exists() and natural_output.stat().st_mtime >= start - 1:
+                if natural_output != path_to_document:
+                    replace_if_changed(natural_output, path_to_document)
+                self.rendered.add(path_to_document)
+            elif path_to_document in previous_documents:
+                os.replace(previous_documents.pop(path_to_document), path_to_document)
+
+
+class MarpBatch(_Batch):
+    """A group of marp tasks which can be rendered with one marp process.
+
+    Parameters
+    ----------
+    options : tuple[str, ...]
+        The options which are shared by all members of the batch.
+    path_to_css : Path | None
+        The path to the theme set shared by all members of the batch.
+    suffix : str
+        The suffix of the documents produced by the members.
+    parallel : int | None
+        The number of files marp converts in parallel.
+    token_pool : TokenPool | None
+        The pool of tokens for heavy renders. The batch holds one token while it runs.
+
+    """
+
+    def __init__(
+        self,
+        options: tuple[str, ...],
+        path_to_css: Path | None,
+        suffix: str,
+        parallel: int | None = None,
+        token_pool: TokenPool | None = None,
+    ) -> None:
+        super().__init__()
+        self.options = options
+        self.path_to_css = path_to_css
+        self.suffix = suffix
+        self.parallel = parallel
+        self.token_pool = token_pool
+
+    def render(self, session: Session, task: Task) -> None:
+        """Render the task together with all other members which are ready."""
+        names = self._claim_ready_members(session, task)
+        if len(names) < 2:  # noqa: PLR2004
+            return
+
+        members = {}
+        natural_outputs = set()
+        for name in names:
+            path_to_md, path_to_document = self.members[name]
+            natural_output = path_to_md.with_suffix(self.suffix)
+            if natural_output in natural_outputs or (
+                natural_output != path_to_document and natural_output.exists()
+            ):
+                # Marp would overwrite a file which is not owned by the task.
+                continue
+            natural_outputs.add(natural_output)
+            members[name] = (path_to_md, path_to_document, natural_output)
+
+        if len(members) < 2:  # noqa: PLR2004
+            return
+
+        self.claimed.update(members)
+        tokens = (
+            contextlib.nullcontext()
+            if self.token_pool is None
+            else self.token_pool.acquire()
+        )
+        previous_documents = _move_aside_overwritten(members)
+        start = time.time()
+        browser = get_browser()
+        with keep_unchanged(previous_documents):
+            with tokens, deadline(
+                session.config["markdown_timeout"]
+            ), contextlib.suppress(subprocess.TimeoutExpired):
+                if browser is None or self.suffix == ".html":
+                    run_command(self._build_command(members))
+                else:
+                    with browser.page():
+                        returncode = run_command(
+                            self._build_command(members), env=browser.environment()
+                        )
+                    if returncode == 0:
+                        check_connected(browser)
+            self._move_outputs(members, start, previous_documents)
+
+    def _build_command(self, members: dict[str, tuple[Path, Path, Path]]) -> list[str]:
+        cmd = [
+            renderers.resolve("marp") or "marp",
+            *_SUFFIX_TO_FORMAT_OPTIONS[self.suffix],
+            *self.options,
+        ]
+        if self.path_to_css is not None:
+            cmd += ["--theme-set", self.path_to_css.as_posix()]
+        if self.parallel is not None:
+            cmd += ["--parallel", str(self.parallel)]
+        cmd += [path_to_md.as_posix() for path_to_md, _, _ in members.values()]
+        return cmd
+
+
+class QuartoProjectBatch(_Batch):
+    """A group of quarto tasks whose scripts belong to the same quarto project.
+
+    The whole project is rendered with one ``quarto render`` which starts quarto, loads
+    the project and resolves cross references only once. Quarto renders all files of
+    the project and writes the outputs to the output directory of the project. Existing
+    outputs of members which are not rendered by the batch are put back afterwards.
+
+    Parameters
+    ----------
+    path_to_project : Path
+        The directory of the project which contains the ``_quarto.yml``.
+    options : tuple[str, ...]
+        The options which are shared by all members of the batch.
+    suffix : str
+        The suffix of the documents produced by the members.
+    token_pool : TokenPool | None
+        The pool of tokens for heavy renders. The batch holds one token while it runs.
+
+    """
+
+    def __init__(
+        self,
+        path_to_project: Path,
+        options: tuple[str, ...],
+        suffix: str,
+        token_pool: TokenPool | None = None,
+    ) -> None:
+        super().__init__()
+        self.path_to_project = path_to_project
+        self.options = options
+        self.suffix = suffix
+        self.token_pool = token_pool
+        self.output_dir = _get_quarto_output_dir(path_to_project)
+
+    def render(self, session: Session, task: Task) -> None:
+        """Render the project if the task and another member are ready."""
+        names = self._claim_ready_members(session, task)
+        if len(names) < 2:  # noqa: PLR2004
+            return
+
+        members = {}
+        for name in names:
+            path_to_md, path_to_document = self.members[name]
+            natural_output = self._get_natural_output(path_to_md)
+            members[name] = (path_to_md, path_to_document, natural_output)
+
+        unclaimed_outputs = []
+        for name, (path_to_md, _) in self.members.items():
+            if name not in members:
+                natural_output = self._get_natural_output(path_to_md)
+                unclaimed_outputs += [
+                    natural_output,
+                    natural_output.with_name(f"{natural_output.stem}_files"),
+                ]
+
+        self.claimed.update(members)
+        tokens = (
+            contextlib.nullcontext()
+            if self.token_pool is None
+            else self.token_pool.acquire()
+        )
+        previous_documents = _move_aside_overwritten(members)
+        start = time.time()
+        with keep_unchanged(previous_documents), _put_back(unclaimed_outputs):
+            with tokens, deadline(
+                session.config["markdown_timeout"]
+            ), contextlib.suppress(subprocess.TimeoutExpired):
+                run_command(self._build_command())
+            self._move_outputs(members, start, previous_documents)
+
+        # Html documents refer to supporting files in a directory next to them.
+        for _, path_to_document, natural_output in members.values():
+            supporting_files = natural_output.with_name(f"{natural_output.stem}_files")
+            target = path_to_document.with_name(f"{path_to_document.stem}_files")
+            if (
+                path_to_document in self.rendered
+                and natural_output != path_to_document
+                and supporting_files.is_dir()
+            ):
+                shutil.rmtree(target, ignore_errors=True)
+                os.replace(supporting_files, target)
+
+    def _get_natural_output(self, path_to_md: Path) -> Path:
+        """Get the path where quarto writes the output of a script of the project."""
+        return self.output_dir.joinpath(
+            path_to_md.relative_to(self.path_to_project)
+        ).with_suffix(self.suffix)
+
+    def _build_command(self) -> list[str]:
+        cmd = [
+            renderers.resolve("quarto") or "quarto",
+            "render",
+            self.path_to_project.as_posix(),
+            *self.options,
+            "--no-cache",
+        ]
+        if "--to" not in self.options:
+            cmd += ["--to", SUFFIX_TO_QUARTO_FORMAT[self.suffix]]
+        return cmd
+
+
+def get_batch_key(
+    compilation_steps: list[Any], path_to_css: Path | None, suffix: str
+) -> tuple[tuple[str, ...], Path | None, str] | None:
+    """Return the key under which a task can be batched or ``None``."""
+    if len(compilation_steps) != 1:
+        return None
+
+    step = compilation_steps[0]
+    options = getattr(step, "options", None)
+    if step.__name__ != "run_marp" or options is None:
+        return None
+
+    if any(opt.startswith(("--image", "--images")) for opt in options):
+        return None
+
+    return (tuple(options), path_to_css, suffix)
+
+
+def get_quarto_project_key(
+    compilation_steps: list[Any], path_to_md: Path, suffix: str
+) -> tuple[Path, tuple[str, ...], str] | None:
+    """Return the key under which a task is rendered with its project or ``None``.
+
+    Tasks which cache the results of code chunks are not batched because the cache is
+    refreshed depending on the dependencies of every task.
+
+    """
+    if len(compilation_steps) != 1 or suffix not in SUFFIX_TO_QUARTO_FORMAT:
+        return None
+
+    step = compilation_steps[0]
+    options = getattr(step, "options", None)
+    if step.__name__ != "run_quarto" or options is None or step.cache:
+        return None
+
+    path_to_project = find_quarto_project(path_to_md.parent)
+    if path_to_project is None:
+        return None
+
+    return (path_to_project, tuple(options), suffix)
+
+
+@functools.lru_cache(maxsize=None)
+def find_quarto_project(path: Path) -> Path | None:
+    """Find the directory of the quarto project which contains a path."""
+    for directory in (path, *path.parents):
+        if any(directory.joinpath(name).is_file() for name in _QUARTO_PROJECT_FILES):
+            return directory
+    return None
+
+
+def _get_quarto_output_dir(path_to_project: Path) -> Path:
+    """Get the directory where quarto writes the outputs of a project.
+
+    Quarto writes outputs next to the inputs unless the project sets an output
+    directory or is a website or a book which have default output directories.
+
+    """
+    for name in _QUARTO_PROJECT_FILES:
+        path = path_to_project.joinpath(name)
+        if path.is_file():
+            config = path.read_text(encoding="utf-8")
+            break
+    else:
+        return path_to_project
+
+    match = _QUARTO_OUTPUT_DIR.search(config)
+    if match is not None:
+        return path_to_project.joinpath(match.group(1))
+
+    match = _QUARTO_PROJECT_TYPE.search(config)
+    if match is not None and match.group(1) in _QUARTO_DEFAULT_OUTPUT_DIRS:
+        return path_to_project.joinpath(_QUARTO_DEFAULT_OUTPUT_DIRS[match.group(1)])
+    return path_to_project
+
+
+@contextlib.contextmanager
+def _put_back(paths: list[Path]) -> Generator[None, None, None]:
+    """Put existing files and directories back after a renderer overwrote them.
+
+    Quarto renders all files of a project. Outputs of members which are not rendered
+    by the batch might be documents which are unchanged or restored from the render
+    cache.
+
+    """
+    previous = move_aside(paths)
+    try:
+        yield
+    finally:
+        for path, moved in previous.items():
+            if path.is_dir() and not path.is_symlink():
+                shutil.rmtree(path)
+            else:
+                path.unlink(missing_ok=True)
+            os.replace(moved, path)
+
+
+def _move_aside_overwritten(
+    members: dict[str, tuple[Path, Path, Path]]
+) -> dict[Path, Path]:
+    """Move aside documents which the renderer writes to directly.
+
+    Renderers which write into an existing file would alter documents restored from
+    the render cache, which are hardlinks to the store.
+
+    """
+    return move_aside(
+        path_to_document
+        for _, path_to_document, natural_output in members.values()
+        if natural_output == path_to_document
+    )
+
+
+def will_be_skipped(task: Task) -> bool:
+    """Check whether pytask marked a task to be skipped."""
+    return any(has_mark(task, marker) for marker in _SKIP_MARKERS)
+
+
+def is_ready(session: Session, task_name: str) -> bool:
+    """Check whether a task can be rendered now.
+
+    A task is ready if it will not be skipped and all tasks producing its dependencies
+    have finished.
+
+    """
+    dag = get_dag(session)
+    task = dag.nodes[task_name]["task"]
+    if will_be_skipped(task):
+        return False
+
+    finished = session.config.get("_markdown_finished_tasks", set())
+    for dependency in dag.predecessors(task_name):
+        for producer in dag.predecessors(dependency):
+            if producer not in finished:
+                return False
+    return not is_skipped_unchanged(session, task)
+
+
+def is_skipped_unchanged(session: Session, task: Task) -> bool:
+    """Check whether a task only runs because of renders which kept their documents.
+
+    pytask selects all tasks which depend on a changed task before the execution. If a
+    markdown task produced the same documents as before, the documents are not
+    touched, and tasks which depend on them are skipped if none of their other inputs
+    changed either. Other tasks are never skipped, see :func:`add_unchanged_render`.
+
+    """
+    return (
+        task.name in session.config.get("_markdown_downstream_tasks", ())
+        and not session.config["force"]
+        and not session.config["dry_run"]
+        and not has_task_changed(session, task)
+    )
+
+
+def add_unchanged_render(session: Session, task: Task) -> None:
+    """Remember the tasks downstream of a render which kept its documents."""
+    session.config.setdefault("_markdown_downstream_tasks", set()).update(
+        nx.descendants(get_dag(session), task.name)
+    )
+
+
+def has_node_changed(session: Session, task: Task, name: str) -> bool:
+    """Check whether a node of a task changed since the last execution of the task."""
+    assert session.hook is not None
+    dag = get_dag(session)
+    return session.hook.pytask_dag_has_node_changed(
+        session=session,
+        dag=dag,
+        task_name=task.name,
+        node=dag.nodes[name].get("task") or dag.nodes[name]["node"],
+    )
+
+
+def has_task_changed(session: Session, task: Task) -> bool:
+    """Check whether a task, its dependencies or its products changed."""
+    dag = get_dag(session)
+    names = (task.name, *dag.predecessors(task.name), *dag.successors(task.name))
+    return any(has_node_changed(session, task, name) for name in names)
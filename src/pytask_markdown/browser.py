@@ -0,0 +1,199 @@
+"""A headless browser which is shared by all marp conversions of a session.
+
+Marp converts documents to pdf, png and pptx with a headless Chromium which it launches
+for every conversion. Launching the browser takes most of the time and memory of these
+conversions. Instead, pytask-markdown can start one browser with a remote-debugging
+endpoint for the whole session.
+
+Marp is attached to the browser by ``marp_browser.js`` which is preloaded into the
+marp processes and workers with ``NODE_OPTIONS``. It replaces puppeteer's ``launch``
+with ``connect`` and closing the browser with disconnecting from it. A semaphore bounds
+the number of conversions, and thus the number of pages, which use the browser
+concurrently.
+
+The preload relies on marp loading puppeteer as a module. If a version of marp bundles
+puppeteer differently, the patch does not apply and marp launches its own browser. The
+preload leaves a marker file whenever it connects. If a conversion succeeds without
+the marker, a warning is shown and the shared browser is shut down, so marp launches
+browsers like without the option.
+
+The browser is started in its own process group like the renderers, so that its child
+processes are terminated with it.
+
+"""
+from __future__ import annotations
+
+import contextlib
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+import warnings
+from pathlib import Path
+from typing import Generator
+
+from pytask_markdown.processes import NEW_PROCESS_GROUP
+from pytask_markdown.processes import terminate_process_group
+from pytask_markdown.processes import wait_for_process
+
+
+_PRELOAD = Path(__file__).parent / "marp_browser.js"
+
+ENDPOINT_VARIABLE = "PYTASK_MARKDOWN_BROWSER_WS"
+MARKER_VARIABLE = "PYTASK_MARKDOWN_BROWSER_MARKER"
+
+_CANDIDATES = (
+    "google-chrome",
+    "google-chrome-stable",
+    "chromium",
+    "chromium-browser",
+    "chrome",
+    "msedge",
+)
+
+_BROWSER: SharedBrowser | None = None
+_LOCK = threading.Lock()
+_UNSUPPORTED = False
+"""Whether marp did not connect to the browser and it is not started again."""
+
+
+class SharedBrowser:
+    """A headless browser with a remote-debugging endpoint.
+
+    Parameters
+    ----------
+    executable : str
+        The path to a Chromium-based browser.
+    max_pages : int
+        The maximum number of conversions which use the browser at the same time.
+    timeout : float
+        The number of seconds to wait for the remote-debugging endpoint.
+
+    """
+
+    def __init__(self, executable: str, max_pages: int, timeout: float = 30) -> None:
+        self._user_data_dir = tempfile.mkdtemp(prefix="pytask-markdown-browser-")
+        self._marker = Path(f"{self._user_data_dir}.connected")
+        self._pages = threading.BoundedSemaphore(max_pages)
+        self._process = subprocess.Popen(
+            [
+                executable,
+                "--headless=new",
+                "--remote-debugging-port=0",
+                f"--user-data-dir={self._user_data_dir}",
+                "--no-first-run",
+                "--no-default-browser-check",
+                "about:blank",
+            ],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            **NEW_PROCESS_GROUP,
+        )
+        try:
+            self.endpoint = self._wait_for_endpoint(timeout)
+        except RuntimeError:
+            self.close()
+            raise
+
+    def _wait_for_endpoint(self, timeout: float) -> str:
+        """Read the endpoint from the file the browser writes after starting."""
+        path = Path(self._user_data_dir, "DevToolsActivePort")
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self._process.poll() is not None:
+                raise RuntimeError("The shared browser terminated while starting.")
+            with contextlib.suppress(OSError):
+                lines = path.read_text().splitlines()
+                if len(lines) >= 2:  # noqa: PLR2004
+                    return f"ws://127.0.0.1:{lines[0]}{lines[1]}"
+            time.sleep(0.05)
+        raise RuntimeError("The shared browser did not open a remote-debugging port.")
+
+    def environment(self) -> dict[str, str]:
+        """Return the environment which attaches marp processes to the browser."""
+        node_options = os.environ.get("NODE_OPTIONS", "")
+        return {
+            **os.environ,
+            ENDPOINT_VARIABLE: self.endpoint,
+            MARKER_VARIABLE: self._marker.as_posix(),
+            "NODE_OPTIONS": f'{node_options} --require "{_PRELOAD.as_posix()}"'.strip(),
+        }
+
+    @contextlib.contextmanager
+    def page(self) -> Generator[None, None, None]:
+        """Wait until the browser can take another conversion."""
+        with self._pages:
+            yield
+
+    def has_connections(self) -> bool:
+        """Check whether a marp process connected to the browser."""
+        return self._marker.exists()
+
+    def close(self) -> None:
+        """Shut down the browser and its child processes and remove its profile."""
+        if self._process.returncode is not None:
+            return
+        terminate_process_group(
+            self._process.pid, lambda timeout: wait_for_process(self._process, timeout)
+        )
+        self._process.wait()
+        shutil.rmtree(self._user_data_dir, ignore_errors=True)
+        self._marker.unlink(missing_ok=True)
+
+
+def find_browser() -> str | None:
+    """Find a Chromium-based browser like marp does."""
+    for candidate in (os.environ.get("CHROME_PATH"), *_CANDIDATES):
+        if candidate:
+            path = shutil.which(candidate)
+            if path is not None:
+                return path
+    return None
+
+
+def start_browser(max_pages: int) -> SharedBrowser | None:
+    """Start the browser of the session if it is not running already."""
+    global _BROWSER  # noqa: PLW0603
+    if _BROWSER is None and not _UNSUPPORTED:
+        executable = find_browser()
+        if executable is not None:
+            _BROWSER = SharedBrowser(executable, max_pages)
+    return _BROWSER
+
+
+def get_browser() -> SharedBrowser | None:
+    """Return the browser of the session if it is available in this process."""
+    return _BROWSER
+
+
+def stop_browser() -> None:
+    """Shut down the browser of the session."""
+    global _BROWSER, _UNSUPPORTED  # noqa: PLW0603
+    with _LOCK:
+        if _BROWSER is not None:
+            _BROWSER.close()
+            _BROWSER = None
+        _UNSUPPORTED = False
+
+
+def check_connected(browser: SharedBrowser) -> None:
+    """Shut down the browser if a successful conversion did not connect to it.
+
+    The browser is not started again in this session.
+
+    """
+    global _BROWSER, _UNSUPPORTED  # noqa: PLW0603
+    with _LOCK:
+        if _BROWSER is not browser or browser.has_connections():
+            return
+        warnings.warn(
+            "marp did not connect to the shared browser and launches its own browser "
+            "for every conversion. The shared browser is shut down. Your version of "
+            "marp might not be supported by 'marp_shared_browser'.",
+            stacklevel=2,
+        )
+        _BROWSER.close()
+        _BROWSER = None
+        _UNSUPPORTED = True
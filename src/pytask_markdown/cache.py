@@ -0,0 +1,207 @@
+"""A content-addressable store for rendered documents.
+
+Rendering is expensive and mostly deterministic. The store keeps rendered documents
+under a key which is a hash of everything which influences the render: the script, the
+css file, the contents of the other dependencies, the compilation steps and their
+options, the name of the document and the version of the renderer.
+
+Paths enter the key relative to the script. Thus, the store can be shared between
+checkouts of the same project and across CI runs. Documents are restored with
+hardlinks if possible and copied otherwise. The size of the store is bounded and the
+least recently used documents are evicted first. The store is scanned once to learn
+its size and again only when the size tracked since then exceeds the limit. The last
+use of a document is recorded on an empty marker file because the modification time of
+a hardlinked document is the one of the document in the project.
+
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Any
+from typing import Callable
+from typing import Iterable
+
+from pytask_markdown.utils import hash_file
+from pytask_markdown.utils import have_same_content
+
+
+class RenderCache:
+    """The store of rendered documents.
+
+    Parameters
+    ----------
+    path : Path
+        The directory of the store.
+    max_size : int
+        The maximum size of the store in bytes.
+
+    """
+
+    def __init__(self, path: Path, max_size: int) -> None:
+        self.path = path
+        self.max_size = max_size
+        self._size: int | None = None
+        self._lock = threading.Lock()
+
+    def _object_path(self, key: str) -> Path:
+        return self.path.joinpath("objects", key[:2], key)
+
+    def _marker_path(self, key: str) -> Path:
+        return self.path.joinpath("used", key[:2], key)
+
+    def _mark_used(self, key: str) -> None:
+        marker = self._marker_path(key)
+        marker.parent.mkdir(parents=True, exist_ok=True)
+        marker.touch()
+        # The clock of the file system may be too coarse to order uses.
+        now = time.time_ns()
+        os.utime(marker, ns=(now, now))
+
+    def restore(self, key: str, path_to_document: Path) -> bool:
+        """Restore the document from the store and return whether it was found.
+
+        A document with the same content as the stored one is not touched.
+
+        """
+        obj = self._object_path(key)
+        if not obj.exists():
+            return False
+
+        self._mark_used(key)
+        if path_to_document.exists() and have_same_content(obj, path_to_document):
+            return True
+
+        path_to_document.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path_to_document.with_name(
+            f".{path_to_document.name}.{os.getpid()}.{threading.get_ident()}.tmp"
+        )
+        try:
+            os.link(obj, tmp)
+        except OSError:
+            shutil.copyfile(obj, tmp)
+        os.replace(tmp, path_to_document)
+        return True
+
+    def store(self, key: str, path_to_document: Path) -> None:
+        """Copy the rendered document into the store."""
+        obj = self._object_path(key)
+        obj.parent.mkdir(parents=True, exist_ok=True)
+        tmp = obj.with_name(f".{key}.{os.getpid()}.{threading.get_ident()}.tmp")
+        shutil.copyfile(path_to_document, tmp)
+        size = tmp.stat().st_size
+        try:
+            replaced = obj.stat().st_size
+        except FileNotFoundError:
+            replaced = 0
+        os.replace(tmp, obj)
+        self._mark_used(key)
+
+        with self._lock:
+            if self._size is None:
+                self._size = sum(size for _, size, _ in self._scan())
+            else:
+                self._size += size - replaced
+            if self._size > self.max_size:
+                self._size = self._evict()
+
+    def _scan(self) -> list[tuple[float, int, str]]:
+        """Collect the last use, the size and the key of every object in the store."""
+        objects = []
+        for directory in self.path.joinpath("objects").iterdir():
+            for entry in os.scandir(directory):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    # The object was evicted by a concurrent render.
+                    continue
+                try:
+                    last_used = self._marker_path(entry.name).stat().st_mtime
+                except FileNotFoundError:
+                    last_used = stat.st_mtime
+                objects.append((last_used, stat.st_size, entry.name))
+        return objects
+
+    def _evict(self) -> int:
+        """Remove the least recently used objects until the store is small enough.
+
+        The store is scanned again because other processes may share it. The remaining
+        size is returned.
+
+        """
+        objects = self._scan()
+        total = sum(size for _, size, _ in objects)
+        for _, size, key in sorted(objects):
+            if total <= self.max_size:
+                break
+            self._object_path(key).unlink(missing_ok=True)
+            self._marker_path(key).unlink(missing_ok=True)
+            total -= size
+        return total
+
+
+def is_cacheable(
+    compilation_steps: list[Callable[..., Any]], path_to_document: Path
+) -> bool:
+    """Check whether the document can be restored from the store.
+
+    Only the built-in compilation steps are known to produce nothing but the document.
+
+    """
+    for step in compilation_steps:
+        options = getattr(step, "options", None)
+        if options is None:
+            return False
+        if any(opt.startswith("--images") for opt in options):
+            return False
+        if (
+            step.__name__ == "run_quarto"
+            and path_to_document.suffix == ".html"
+            and not any(
+                opt.startswith(("--embed-resources", "--self-contained"))
+                for opt in options
+            )
+        ):
+            # Quarto writes supporting files next to html documents.
+            return False
+    return True
+
+
+def compute_key(
+    compilation_steps: list[Callable[..., Any]],
+    path_to_md: Path,
+    path_to_document: Path,
+    path_to_css: Path | None,
+    dependencies: Iterable[Path] = (),
+    renderer_version: str = "",
+) -> str:
+    """Compute the key of a render."""
+    hash_ = hashlib.sha256()
+
+    def _update(*parts: str) -> None:
+        for part in parts:
+            hash_.update(part.encode())
+            hash_.update(b"\0")
+
+    _update(renderer_version)
+    for step in compilation_steps:
+        _update(
+            step.__name__,
+            repr(getattr(step, "options", None)),
+            repr(getattr(step, "cache", None)),
+        )
+
+    _update(path_to_document.name, hash_file(path_to_md))
+    if path_to_css is not None:
+        _update("css", hash_file(path_to_css))
+
+    root = path_to_md.parent
+    for path in sorted(set(dependencies) - {path_to_md, path_to_css}):
+        if path.is_file():
+            _update(os.path.relpath(path, root), hash_file(path))
+
+    return hash_.hexdigest()
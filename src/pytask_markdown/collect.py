@@ -1,10 +1,12 @@
 """Collect tasks."""
 from __future__ import annotations
 
+import contextlib
 import functools
-import warnings
+import inspect
 from pathlib import Path
 from subprocess import CalledProcessError
+from subprocess import TimeoutExpired
 from types import FunctionType
 from typing import Any
 from typing import Callable
@@ -19,31 +21,65 @@ from pytask import produces
 from pytask import remove_marks
 from pytask import Session
 from pytask import Task
+from pybaum.tree_util import tree_just_flatten
 from pytask_markdown import compilation_steps as cs
+from pytask_markdown.batch import get_batch_key
+from pytask_markdown.batch import get_quarto_project_key
+from pytask_markdown.batch import MarpBatch
+from pytask_markdown.batch import QuartoProjectBatch
+from pytask_markdown.cache import compute_key
+from pytask_markdown.cache import is_cacheable
+from pytask_markdown.cache import RenderCache
+from pytask_markdown.metrics import get_path_to_metrics
+from pytask_markdown.metrics import measure_step
+from pytask_markdown.metrics import write_metrics
+from pytask_markdown.nodes import FingerprintNode
+from pytask_markdown.nodes import MarkdownSourceNode
+from pytask_markdown.output import capture_output
+from pytask_markdown.output import OutputBuffer
+from pytask_markdown.processes import deadline
+from pytask_markdown.scanner import ParseIndex
+from pytask_markdown.scanner import scan
+from pytask_markdown.tokens import HEAVY_SUFFIXES
+from pytask_markdown.tokens import is_heavy
+from pytask_markdown.tokens import TokenPool
+from pytask_markdown.utils import keep_unchanged
+from pytask_markdown.utils import move_aside
+from pytask_markdown.utils import remove_previous_documents
 from pytask_markdown.utils import to_list
 
 
+_RENDERERS = ("marp", "quarto", "python_html")
+
+_SCRIPT_SUFFIXES = frozenset((".qmd", ".md"))
+_CSS_SUFFIXES = frozenset((".css", ".scss"))
+_DOCUMENT_SUFFIXES = frozenset((".pdf", ".html", ".png", ".pptx"))
+_SUFFIXES_WITHOUT_NOTES = frozenset((".pdf", ".png"))
+
+
 def markdown(
     *,
     script: str | Path,
-    document: str | Path,
+    document: str | Path | Sequence[str | Path] | dict[Any, str | Path],
     compilation_steps: str
     | Callable[..., Any]
     | Sequence[str | Callable[..., Any]]
     | None = None,
-    css: str | Path = None,
+    css: str | Path | None = None,
 ) -> tuple[
     str | Path,
-    str | Path,
+    str | Path | Sequence[str | Path] | dict[Any, str | Path],
     str | Callable[..., Any] | Sequence[str | Callable[..., Any]] | None,
+    str | Path | None,
 ]:
     """Specify command line options for latexmk.
     Parameters
     ----------
     script : str | Path
         The markdown file that will be rendered.
-    document : str | Path
-        The path to the rendered document.
+    document : str | Path | Sequence[str | Path] | dict[Any, str | Path]
+        The path to the rendered document. Quarto can render multiple documents with
+        different formats from one run if a list or dictionary of paths is passed.
     compilation_steps
         Compilation steps to compile the document.
     css : str | Path
@@ -53,18 +89,120 @@ def markdown(
 
 
 def render_markdown_document(
-    compilation_steps, path_to_md, path_to_document, path_to_css
-):
-    """Replaces the dummy function provided by the user."""
-    for step in compilation_steps:
-        try:
-            step(
-                path_to_md=path_to_md,
-                path_to_document=path_to_document,
-                path_to_css=path_to_css,
-            )
-        except CalledProcessError as e:
-            raise RuntimeError(f"Compilation step {step.__name__} failed.") from e
+    compilation_steps: list[Callable[..., Any]],
+    path_to_md: Path,
+    path_to_document: Path,
+    path_to_css: Path | None,
+    depends_on: Any = None,
+    batch: MarpBatch | QuartoProjectBatch | None = None,
+    render_cache: RenderCache | None = None,
+    renderer_version: str | None = None,
+    paths_to_documents: list[Path] | None = None,
+    path_to_metrics: Path | None = None,
+    max_output_size: int | None = None,
+    live_output: bool = False,
+    timeout: float | None = None,
+    token_pool: TokenPool | None = None,
+    **step_kwargs: Any,
+) -> None:
+    """Replaces the dummy function provided by the user.
+
+    Additional keyword arguments are passed to the compilation steps which accept them.
+    ``paths_to_documents`` is only set for tasks with multiple documents and
+    ``paths_to_dependencies`` holds the dependencies besides the script and the css
+    file. The measurements of the steps are written to ``path_to_metrics``. If
+    ``max_output_size`` is set, the last bytes of the output of the renderers are kept
+    and added to the error of a failed step. ``timeout`` limits the time of steps which
+    do not set their own timeout. Heavy renders wait for a token of ``token_pool``.
+
+    """
+    dependencies = [i for i in tree_just_flatten(depends_on) if isinstance(i, Path)]
+    step_kwargs["paths_to_dependencies"] = [
+        path for path in dependencies if path not in (path_to_md, path_to_css)
+    ]
+    if paths_to_documents is not None:
+        step_kwargs["paths_to_documents"] = paths_to_documents
+    if path_to_metrics is not None:
+        path_to_metrics.unlink(missing_ok=True)
+
+    if batch is not None and batch.has_rendered(path_to_document):
+        return
+
+    key = None
+    if (
+        render_cache is not None
+        and paths_to_documents is None
+        and is_cacheable(compilation_steps, path_to_document)
+    ):
+        key = compute_key(
+            compilation_steps,
+            path_to_md,
+            path_to_document,
+            path_to_css,
+            dependencies,
+            renderer_version or "",
+        )
+        if render_cache.restore(key, path_to_document):
+            return
+
+    capture: contextlib.AbstractContextManager[OutputBuffer | None]
+    if max_output_size is None:
+        capture = contextlib.nullcontext()
+    else:
+        capture = capture_output(
+            max_output_size, path_to_document.name if live_output else None
+        )
+
+    tokens: contextlib.AbstractContextManager[int | None] = (
+        contextlib.nullcontext() if token_pool is None else token_pool.acquire()
+    )
+
+    # Previous documents are moved aside and put back if the render produced the same
+    # content. Their modification time does not change and tasks which depend on them
+    # are not executed again. Moving them also keeps renderers which write into an
+    # existing file from altering documents restored from the render cache, which are
+    # hardlinks to the store.
+    previous_documents = move_aside(paths_to_documents or [path_to_document])
+
+    metrics: list[dict[str, Any]] = []
+    with keep_unchanged(previous_documents), tokens, capture as buffer:
+        for step in compilation_steps:
+            parameters = inspect.signature(step).parameters
+            step_timeout = getattr(step, "timeout", None)
+            if step_timeout is None:
+                step_timeout = timeout
+            with measure_step(
+                step.__name__, paths_to_documents or [path_to_document]
+            ) as record, deadline(step_timeout):
+                try:
+                    step(
+                        path_to_md=path_to_md,
+                        path_to_document=path_to_document,
+                        path_to_css=path_to_css,
+                        **{k: v for k, v in step_kwargs.items() if k in parameters},
+                    )
+                except TimeoutExpired as e:
+                    message = (
+                        f"Compilation step {step.__name__} timed out after "
+                        f"{step_timeout:g} seconds."
+                    )
+                    raise TimeoutError(_add_output(message, buffer)) from e
+                except CalledProcessError as e:
+                    message = f"Compilation step {step.__name__} failed."
+                    raise RuntimeError(_add_output(message, buffer)) from e
+            metrics.append(record)
+
+    if path_to_metrics is not None:
+        write_metrics(path_to_metrics, metrics)
+
+    if render_cache is not None and key is not None and path_to_document.exists():
+        render_cache.store(key, path_to_document)
+
+
+def _add_output(message: str, buffer: OutputBuffer | None) -> str:
+    """Add the captured output of the renderers to an error message."""
+    output = "" if buffer is None else buffer.format_tail()
+    return f"{message}\n\n{output}" if output else message
 
 
 @hookimpl
@@ -96,8 +234,8 @@ def pytask_collect_task(
 
         obj.pytask_meta.markers.append(markdown_mark)
 
-        dependencies = parse_nodes(session, path, name, obj, depends_on)
-        products = parse_nodes(session, path, name, obj, produces)
+        dependencies = _parse_nodes(session, path, name, obj, depends_on)
+        products = _parse_nodes(session, path, name, obj, produces)
 
         markers = obj.pytask_meta.markers if hasattr(obj, "pytask_meta") else []
         kwargs = obj.pytask_meta.kwargs if hasattr(obj, "pytask_meta") else {}
@@ -105,27 +243,31 @@ def pytask_collect_task(
         task = Task(
             base_name=name,
             path=path,
-            function=_copy_func(render_markdown_document),
+            function=_get_function_template(),
             depends_on=dependencies,
             produces=products,
             markers=markers,
             kwargs=kwargs,
-            attributes={"renderer": renderer},
+            attributes={
+                "renderer": renderer,
+                "quarto_cache": any(
+                    getattr(step, "cache", False) for step in parsed_compilation_steps
+                ),
+            },
         )
+        assert task.name is not None
+        assert session.hook is not None
 
-        script_node = session.hook.pytask_collect_node(
-            session=session, path=path, node=script
-        )
-        document_node = session.hook.pytask_collect_node(
-            session=session, path=path, node=document
-        )
-        css_node = session.hook.pytask_collect_node(
-            session=session, path=path, node=css
-        )
+        script_node = _collect_shared_node(session, path, script)
+        document_nodes = {
+            key: session.hook.pytask_collect_node(session=session, path=path, node=doc)
+            for key, doc in _parse_documents(document).items()
+        }
+        css_node = None if css is None else _collect_shared_node(session, path, css)
 
         if not (
             isinstance(script_node, FilePathNode)
-            and script_node.value.suffix in (".qmd", ".md")
+            and script_node.value.suffix in _SCRIPT_SUFFIXES
         ):
             raise ValueError(
                 "The 'script' keyword of the @pytask.mark.markdown decorator must "
@@ -136,7 +278,7 @@ def pytask_collect_task(
             (css_node is None)
             or (
                 isinstance(css_node, FilePathNode)
-                and css_node.value.suffix in (".css", ".scss")
+                and css_node.value.suffix in _CSS_SUFFIXES
             )
         ):
             raise ValueError(
@@ -144,15 +286,42 @@ def pytask_collect_task(
                 "to a css file with the .css or .scss suffix."
             )
 
-        if not (
-            isinstance(document_node, FilePathNode)
-            and document_node.value.suffix in (".pdf", ".html", ".png", ".pptx")
+        if not document_nodes or not all(
+            isinstance(node, FilePathNode) and node.value.suffix in _DOCUMENT_SUFFIXES
+            for node in document_nodes.values()
         ):
             raise ValueError(
                 "The 'document' keyword of the @pytask.mark.markdown decorator must "
                 "point to a .pdf, .html, .png or .pptx file."
             )
 
+        if len(document_nodes) > 1:
+            _verify_multiple_documents(parsed_compilation_steps, document_nodes)
+        document_node = next(iter(document_nodes.values()))
+
+        if session.config["markdown_source_normalization"]:
+            script_node = _get_source_node(session, script_node)
+            if not all(
+                node.path.suffix in _SUFFIXES_WITHOUT_NOTES
+                for node in document_nodes.values()
+            ) or any(
+                "--pdf-notes" in getattr(step, "options", ())
+                for step in parsed_compilation_steps
+            ):
+                script_node.needs_notes = True
+                if renderer == "marp":
+                    script_node.needs_comments = True
+
+        # The fingerprint is not a file and is only added to the DAG. See
+        # :func:`pytask_markdown.nodes.pytask_dag_modify_dag`.
+        fingerprint_nodes = session.config.setdefault("_markdown_fingerprint_nodes", {})
+        fingerprint_nodes[task.name] = FingerprintNode(
+            name=f"{task.name}::markdown-fingerprint",
+            compilation_steps=parsed_compilation_steps,
+            renderer=renderer,
+            cache_dir=session.config["markdown_cache_dir"],
+        )
+
         if isinstance(task.depends_on, dict):
             task.depends_on["__script"] = script_node
             task.depends_on["__css"] = css_node
@@ -163,33 +332,265 @@ def pytask_collect_task(
                 "__css": css_node,
             }
 
+        document_product: Any = (
+            document_node if len(document_nodes) == 1 else document_nodes
+        )
         if isinstance(task.produces, dict):
-            task.produces["__document"] = document_node
+            task.produces["__document"] = document_product
         else:
-            task.produces = {0: task.produces, "__document": document_node}
+            task.produces = {0: task.produces, "__document": document_product}
+
+        path_to_css = None if css_node is None else css_node.path
+
+        token_pool = None
+        if session.config["markdown_max_heavy_renders"]:
+            task.attributes["markdown_heavy"] = is_heavy(
+                parsed_compilation_steps,
+                script_node.path,
+                [node.path for node in document_nodes.values()],
+            )
+            if task.attributes["markdown_heavy"]:
+                token_pool = _get_token_pool(session)
+
+        batch: MarpBatch | QuartoProjectBatch | None = None
+        if session.config["batch_marp_tasks"]:
+            batch = _get_marp_batch(
+                session, parsed_compilation_steps, path_to_css, document_node.path
+            )
+        if (
+            batch is None
+            and session.config["batch_quarto_projects"]
+            and len(document_nodes) == 1
+        ):
+            batch = _get_quarto_project_batch(
+                session,
+                parsed_compilation_steps,
+                script_node.path,
+                document_node.path,
+                token_pool,
+            )
+        if batch is not None:
+            batch.add(task.name, script_node.path, document_node.path)
+            task.attributes["markdown_batch"] = batch
 
         task.function = functools.partial(
             task.function,
             compilation_steps=parsed_compilation_steps,
             path_to_md=script_node.path,
             path_to_document=document_node.path,
-            path_to_css=None if css_node is None else css_node.path,
+            path_to_css=path_to_css,
+            batch=batch,
+            render_cache=_get_render_cache(session),
+            path_to_metrics=get_path_to_metrics(
+                session.config["markdown_cache_dir"], task.name
+            ),
+            max_output_size=session.config["markdown_output_max_size"] * 1024 or None,
+            live_output=session.config["markdown_live_output"],
+            timeout=session.config["markdown_timeout"],
+            token_pool=token_pool,
         )
-
-        if session.config["infer_markdown_dependencies"]:
-            warnings.warn(
-                "Inferring of markdown dependencies is not implemented yet and will be "
-                "ignored."
+        if len(document_nodes) > 1:
+            task.function = functools.partial(
+                task.function,
+                paths_to_documents=[node.path for node in document_nodes.values()],
             )
-            task = _add_markdown_dependencies_retroactively(task, session)
 
         return task
+    return None
+
+
+@hookimpl
+def pytask_collect_modify_tasks(session: Session, tasks: list[Task]) -> None:
+    """Add the dependencies found in the scripts of markdown tasks.
+
+    Dependencies are inferred after all tasks are collected such that references to
+    files which are produced by other tasks are kept even if the files do not exist
+    yet.
 
+    Documents which were moved aside by a render whose process died are removed.
 
-def _add_markdown_dependencies_retroactively(task, session):  # noqa: U100
+    """
+    remove_previous_documents(
+        node.path
+        for task in tasks
+        if has_mark(task, "markdown")
+        for node in tree_just_flatten(task.produces["__document"])
+    )
+
+    if not session.config["infer_markdown_dependencies"]:
+        return
+
+    index = ParseIndex.from_path(
+        session.config["markdown_cache_dir"].joinpath("scanner.json")
+    )
+    products = {
+        node.path
+        for task in tasks
+        for node in tree_just_flatten(task.produces)
+        if isinstance(node, FilePathNode)
+    }
+    for task in tasks:
+        if has_mark(task, "markdown"):
+            _add_markdown_dependencies_retroactively(task, session, index, products)
+    index.save()
+
+
+def _add_markdown_dependencies_retroactively(
+    task: Task, session: Session, index: ParseIndex, products: set[Path]
+) -> Task:
+    """Add dependencies found in the script which exist or are produced by tasks."""
+    known_paths = {
+        node.path
+        for node in tree_just_flatten([task.depends_on, task.produces])
+        if isinstance(node, FilePathNode)
+    }
+    script_node = task.depends_on["__script"]
+    assert isinstance(script_node, FilePathNode)
+    paths = [
+        path
+        for path in scan(
+            script_node.path,
+            index,
+            quarto=task.attributes["renderer"] == "quarto",
+        )
+        if path not in known_paths and (path in products or path.is_file())
+    ]
+    assert session.hook is not None
+    for i, path in enumerate(paths):
+        task.depends_on[f"__inferred_{i}"] = session.hook.pytask_collect_node(
+            session=session, path=task.path, node=path
+        )
     return task
 
 
+def _get_marp_batch(
+    session: Session,
+    compilation_steps: list[Callable[..., Any]],
+    path_to_css: Path | None,
+    path_to_document: Path,
+) -> MarpBatch | None:
+    """Get the batch of compatible marp tasks the task belongs to."""
+    key = get_batch_key(compilation_steps, path_to_css, path_to_document.suffix)
+    if key is None:
+        return None
+
+    batches = session.config.setdefault("_markdown_batches", {})
+    if key not in batches:
+        token_pool = None
+        if (
+            session.config["markdown_max_heavy_renders"]
+            and path_to_document.suffix in HEAVY_SUFFIXES
+        ):
+            token_pool = _get_token_pool(session)
+        batches[key] = MarpBatch(
+            *key,
+            parallel=session.config["marp_batch_parallel"],
+            token_pool=token_pool,
+        )
+    return batches[key]
+
+
+def _get_quarto_project_batch(
+    session: Session,
+    compilation_steps: list[Callable[..., Any]],
+    path_to_md: Path,
+    path_to_document: Path,
+    token_pool: TokenPool | None = None,
+) -> QuartoProjectBatch | None:
+    """Get the batch of quarto tasks in the same project the task belongs to.
+
+    The batch holds a token of ``token_pool`` if any of its members is heavy.
+
+    """
+    key = get_quarto_project_key(compilation_steps, path_to_md, path_to_document.suffix)
+    if key is None:
+        return None
+
+    batches = session.config.setdefault("_markdown_batches", {})
+    if key not in batches:
+        batches[key] = QuartoProjectBatch(*key)
+    if token_pool is not None:
+        batches[key].token_pool = token_pool
+    return batches[key]
+
+
+def _get_render_cache(session: Session) -> RenderCache | None:
+    """Get the store of rendered documents if it is enabled."""
+    path = session.config["markdown_render_cache"]
+    if path is None:
+        return None
+    if "_markdown_render_cache" not in session.config:
+        session.config["_markdown_render_cache"] = RenderCache(
+            path, session.config["markdown_render_cache_max_size"] * 1024**2
+        )
+    return session.config["_markdown_render_cache"]
+
+
+def _get_token_pool(session: Session) -> TokenPool:
+    """Get the pool of tokens which limits the number of heavy renders."""
+    if "_markdown_token_pool" not in session.config:
+        session.config["_markdown_token_pool"] = TokenPool(
+            session.config["markdown_cache_dir"].joinpath("tokens"),
+            session.config["markdown_max_heavy_renders"],
+        )
+    return session.config["_markdown_token_pool"]
+
+
+def _parse_nodes(
+    session: Session, path: Path, name: str, obj: Any, parser: Callable[..., Any]
+) -> Any:
+    """Parse nodes and skip the parser if the task has no such marker."""
+    if not has_mark(obj, parser.__name__):
+        return {}
+    return parse_nodes(session, path, name, obj, parser)
+
+
+def _collect_shared_node(session: Session, path: Path, node: Any) -> Any:
+    """Collect a node which is shared by many tasks like the script or the css file.
+
+    Parametrized tasks often render the same script or use the same css file. The nodes
+    are collected once per directory and value and shared by the tasks.
+
+    """
+    assert session.hook is not None
+    try:
+        key = (path.parent, node)
+        nodes = session.config.setdefault("_markdown_shared_nodes", {})
+        if key not in nodes:
+            nodes[key] = session.hook.pytask_collect_node(
+                session=session, path=path, node=node
+            )
+    except TypeError:
+        return session.hook.pytask_collect_node(session=session, path=path, node=node)
+    return nodes[key]
+
+
+def _get_source_node(session: Session, node: FilePathNode) -> MarkdownSourceNode:
+    """Get the node of a script which is fingerprinted by its normalized content.
+
+    The node is shared by all tasks which render the script.
+
+    """
+    nodes = session.config.setdefault("_markdown_source_nodes", {})
+    if node.name not in nodes:
+        nodes[node.name] = MarkdownSourceNode.from_node(
+            node,
+            session.config["markdown_source_normalization"],
+            session.config["markdown_cache_dir"].joinpath("sources.json"),
+        )
+    return nodes[node.name]
+
+
+@functools.lru_cache(maxsize=None)
+def _get_function_template() -> FunctionType:
+    """Get the copy of :func:`render_markdown_document` which is shared by all tasks.
+
+    The function of every task is a partial of the template with its own arguments.
+
+    """
+    return _copy_func(render_markdown_document)
+
+
 def _copy_func(func: FunctionType) -> FunctionType:
     """Create a copy of a function.
 
@@ -210,35 +611,101 @@ def _copy_func(func: FunctionType) -> FunctionType:
         argdefs=func.__defaults__,
         closure=func.__closure__,
     )
-    new_func = functools.update_wrapper(new_func, func)
+    functools.update_wrapper(new_func, func)
     new_func.__kwdefaults__ = func.__kwdefaults__
     return new_func
 
 
-def _parse_compilation_steps(compilation_steps):
+def _parse_documents(document: Any) -> dict[Any, Any]:
+    """Parse the documents of a task into a dictionary."""
+    if isinstance(document, dict):
+        return document
+    return dict(enumerate(to_list(document)))
+
+
+def _verify_multiple_documents(
+    compilation_steps: list[Callable[..., Any]],
+    document_nodes: dict[Any, FilePathNode],
+) -> None:
+    """Verify that multiple documents can be rendered from one run."""
+    __tracebackhide__ = True
+
+    if not all(
+        "paths_to_documents" in inspect.signature(step).parameters
+        for step in compilation_steps
+    ):
+        raise ValueError(
+            "Multiple documents can only be rendered by compilation steps which accept "
+            "'paths_to_documents' like the quarto step."
+        )
+
+    suffixes = [node.path.suffix for node in document_nodes.values()]
+    if len(set(suffixes)) < len(suffixes):
+        raise ValueError(
+            "The documents of a task must have different suffixes since each format is "
+            f"rendered once, but got {suffixes}."
+        )
+
+
+def _parse_compilation_steps(
+    compilation_steps: Any,
+) -> tuple[list[Callable[..., Any]], str]:
+    """Parse compilation steps.
+
+    Parsed steps are memoized by their specification such that tasks with the same
+    steps share them. Specifications which cannot be hashed are parsed every time.
+
+    """
+    __tracebackhide__ = True
+
+    spec = tuple(to_list(compilation_steps))
+    parsed_compilation_steps: Sequence[Callable[..., Any]]
+    try:
+        hash(spec)
+    except TypeError:
+        parsed_compilation_steps, renderer = _parse_compilation_steps_uncached(spec)
+    else:
+        parsed_compilation_steps, renderer = _parse_compilation_steps_cached(spec)
+    return list(parsed_compilation_steps), renderer
+
+
+@functools.lru_cache(maxsize=None)
+def _parse_compilation_steps_cached(
+    spec: tuple[Any, ...]
+) -> tuple[tuple[Callable[..., Any], ...], str]:
+    """Parse and memoize compilation steps."""
+    __tracebackhide__ = True
+
+    parsed_compilation_steps, renderer = _parse_compilation_steps_uncached(spec)
+    return tuple(parsed_compilation_steps), renderer
+
+
+def _parse_compilation_steps_uncached(
+    spec: tuple[Any, ...]
+) -> tuple[list[Callable[..., Any]], str]:
     """Parse compilation steps."""
     __tracebackhide__ = True
 
-    renderer = set()
+    renderers = set()
     parsed_compilation_steps = []
-    for step in to_list(compilation_steps):
+    for step in spec:
         if isinstance(step, str):
             try:
                 parsed_step = getattr(cs, step)
             except AttributeError:
                 raise ValueError(f"Compilation step {step!r} is unknown.")
             parsed_compilation_steps.append(parsed_step())
-            if step in ("marp", "quarto"):
-                renderer.add(step)
+            if step in _RENDERERS:
+                renderers.add(step)
         elif callable(step):
             parsed_compilation_steps.append(step)
-            if step.__name__.split("run_")[1] in ("marp", "quarto"):
-                renderer.add(step.__name__.split("run_")[1])
+            if step.__name__.split("run_")[1] in _RENDERERS:
+                renderers.add(step.__name__.split("run_")[1])
         else:
             raise ValueError(f"Compilation step {step!r} is not a valid step.")
 
-    if len(renderer) > 1:
-        raise ValueError(f"Cannot combine multiple renderers, but used {renderer}.")
-    renderer = renderer.pop()
+    if len(renderers) > 1:
+        raise ValueError(f"Cannot combine multiple renderers, but used {renderers}.")
+    renderer = renderers.pop()
 
     return parsed_compilation_steps, renderer
@@ -11,94 +11,330 @@ Each compilation step must have the following signature:
 
 A compilation step constructor must yield a function with this signature.
 
+A compilation step may declare additional keyword arguments which are provided by
+pytask-markdown during the execution. They are only passed to steps which have them in
+their signature.
+
+- ``paths_to_documents``: The paths to all documents if a task renders multiple
+  documents. Only steps which accept this argument can be used for such tasks.
+- ``executable``: The path to the executable of the renderer which was resolved once
+  for the session.
+- ``refresh_cache``: Whether dependencies of the task other than the script changed
+  since the last successful render. Cached results of code chunks must not be reused.
+
 """
 from __future__ import annotations
 
+import functools
+import html
+import os
+import re
 import shutil
+import string
 import subprocess
+import tempfile
+from pathlib import Path
+from typing import Any
+from typing import Callable
+from typing import Sequence
 
+from markdown_it import MarkdownIt
+from pytask_markdown.browser import check_connected
+from pytask_markdown.browser import get_browser
+from pytask_markdown.engine import get_engine
+from pytask_markdown.metrics import run_command
+from pytask_markdown.options import parse_options
+from pytask_markdown.slides import FRONT_MATTER
+from pytask_markdown.slides import render_slides
 from pytask_markdown.utils import to_list
+from pytask_markdown.workers import get_pool
+
+
+SUFFIX_TO_QUARTO_FORMAT = {".html": "html", ".pptx": "pptx"}
+
+_TITLE = re.compile(r"^title\s*:\s*[\"']?(.*?)[\"']?\s*$", re.M)
+
+_HTML_TEMPLATE = string.Template(
+    """\
+<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1">
+<title>$title</title>
+$style</head>
+<body>
+$body</body>
+</html>
+"""
+)
 
 
-def quarto(options: str | list[str] | tuple[str, ...] = ()):
-    """Compilation step that calls quarto."""
-    options = [str(i) for i in to_list(options)]
+def quarto(
+    options: str | list[str] | tuple[str, ...] = (),
+    cache: bool = False,
+    timeout: float | None = None,
+) -> Callable[..., None]:
+    """Compilation step that calls quarto.
 
-    _verify_options_validity(options, list_of_valid_quarto_options)
+    Parameters
+    ----------
+    options : str | list[str] | tuple[str, ...]
+        Command line options passed to ``quarto render``. See
+        :data:`pytask_markdown.options.QUARTO_OPTIONS` for the supported options.
+    cache : bool
+        Whether quarto caches the results of code chunks with knitr's cache or
+        jupyter-cache. Chunks are only executed again if their code changed. If other
+        dependencies of the task changed, for example a data set read by a chunk, the
+        cache is refreshed.
+    timeout : float | None
+        The number of seconds after which quarto and its kernels are terminated. It
+        overrides ``markdown_timeout``.
 
-    def run_quarto(path_to_md, path_to_document, path_to_css):  # noqa: U100
-        if path_to_document.suffix == ".pdf":
+    Multiple documents are rendered in one run with ``--to html,pptx`` such that code
+    chunks are executed only once. The formats are derived from the suffixes of the
+    documents unless ``--to`` is among the options.
+
+    """
+    options = tuple(str(i) for i in to_list(options))
+
+    if any(opt.startswith(("--cache", "--no-cache")) for opt in options):
+        raise ValueError(
+            "Caching is controlled by the 'cache' argument of the quarto compilation "
+            "step and not with options."
+        )
+
+    options = parse_options("quarto", options)
+
+    def run_quarto(
+        path_to_md: Path,
+        path_to_document: Path,
+        path_to_css: Path | None,  # noqa: U100
+        executable: str = "quarto",
+        refresh_cache: bool = False,
+        paths_to_documents: list[Path] | None = None,
+    ) -> None:
+        documents = paths_to_documents or [path_to_document]
+        if any(document.suffix == ".pdf" for document in documents):
             raise NotImplementedError(
                 "pytask-markdown does not support rendering to pdf with quarto yet. "
                 "Please use the marp backend."
             )
 
+        if not cache:
+            cache_options = ["--no-cache"]
+        elif refresh_cache:
+            cache_options = ["--cache-refresh"]
+        else:
+            cache_options = ["--cache"]
+
+        # Quarto writes the output to the working directory. Render into a private
+        # directory next to the document to avoid collisions between tasks and to be
+        # able to rename the output into place.
+        scratch = Path(
+            tempfile.mkdtemp(prefix=".pytask-markdown-", dir=path_to_document.parent)
+        )
+
+        if len(documents) == 1:
+            output_options = ["--output", path_to_document.name]
+            outputs = {path_to_document.name: path_to_document}
+        else:
+            output_options = ["--output-dir", scratch.as_posix()]
+            if "--to" not in options:
+                try:
+                    formats = [SUFFIX_TO_QUARTO_FORMAT[d.suffix] for d in documents]
+                except KeyError as e:
+                    raise ValueError(
+                        f"The format of {e.args[0]!r} documents is unknown. Pass it "
+                        "with the '--to' option."
+                    ) from None
+                output_options += ["--to", ",".join(formats)]
+            outputs = {path_to_md.stem + doc.suffix: doc for doc in documents}
+
         cmd = (
-            ["quarto", "render", path_to_md.as_posix(), *options]
-            + ["--no-cache"]
-            + ["--output"]
-            + [path_to_document.name]
+            [executable, "render", path_to_md.as_posix(), *options]
+            + cache_options
+            + output_options
         )
-        subprocess.run(cmd, check=True)
-        shutil.move(path_to_document.name, path_to_document.as_posix())
 
-    return run_quarto
+        try:
+            _run_command(cmd, cwd=scratch)
+            _move_into_place(scratch, outputs)
+        finally:
+            shutil.rmtree(scratch, ignore_errors=True)
 
+    return _set_attributes(run_quarto, options=options, cache=cache, timeout=timeout)
 
-def marp(options: str | list[str] | tuple[str, ...] = ()):
-    """Compilation step that calls marp."""
-    options = [str(i) for i in to_list(options)]
 
-    _verify_options_validity(options, list_of_valid_marp_options)
+def marp(
+    options: str | list[str] | tuple[str, ...] = (),
+    incremental: bool = False,
+    timeout: float | None = None,
+) -> Callable[..., None]:
+    """Compilation step that calls marp.
 
-    def run_marp(path_to_md, path_to_document, path_to_css):
-        cmd = ["marp", path_to_md.as_posix(), *options]
-        if path_to_css is not None:
-            cmd += ["--theme-set", path_to_css.as_posix()]
-        cmd += ["--output", path_to_document.as_posix()]
-        subprocess.run(cmd, check=True)
-
-    return run_marp
-
-
-def _verify_options_validity(options, list_of_valid_options):
-    invalid = []
-    for opt in options:
-        valid = False
-        for val_opt in list_of_valid_options:
-            if val_opt in opt:
-                valid = True
-                break
-        if not valid:
-            invalid.append(opt)
-
-    if invalid:
-        msg = f"Options {invalid} are invalid. Please refer to the documentation."
-        if "--theme-set" in invalid:
-            msg += (
-                "\nTo use a custom css or scss theme please provide the path to the "
-                "pytask.mark.markdown decorator as css=/path/to/css."
+    Parameters
+    ----------
+    options : str | list[str] | tuple[str, ...]
+        Command line options passed to marp. See
+        :data:`pytask_markdown.options.MARP_OPTIONS` for the supported options.
+    incremental : bool
+        Whether only changed slides are rendered again if the slides are converted to
+        images with ``--images``. The document is a copy of the first slide. See
+        :mod:`pytask_markdown.slides` for details.
+    timeout : float | None
+        The number of seconds after which marp and its browser are terminated. It
+        overrides ``markdown_timeout``.
+
+    """
+    options = parse_options("marp", tuple(str(i) for i in to_list(options)))
+
+    def run_marp(
+        path_to_md: Path,
+        path_to_document: Path,
+        path_to_css: Path | None,
+        executable: str = "marp",
+        paths_to_dependencies: Sequence[Path] = (),
+    ) -> None:
+        def _convert(path_to_md: Path, path_to_document: Path) -> None:
+            cmd = [executable, path_to_md.as_posix(), *options]
+            if path_to_css is not None:
+                cmd += ["--theme-set", path_to_css.as_posix()]
+            cmd += ["--output", path_to_document.as_posix()]
+
+            browser = get_browser()
+            if browser is None or not _needs_browser(path_to_document, options):
+                _run_marp(cmd)
+            else:
+                with browser.page():
+                    _run_marp(cmd, browser.environment())
+                check_connected(browser)
+
+        if incremental and "--images" in options:
+            theme = "" if path_to_css is None else path_to_css.read_text("utf-8")
+            render_slides(
+                path_to_md,
+                path_to_document,
+                repr((options, theme)),
+                _convert,
+                paths_to_dependencies,
+            )
+        else:
+            _convert(path_to_md, path_to_document)
+
+    return _set_attributes(
+        run_marp, options=options, incremental=incremental, timeout=timeout
+    )
+
+
+def python_html() -> Callable[..., None]:
+    """Compilation step that renders html documents with Python.
+
+    The document is rendered in-process with markdown-it-py which supports CommonMark,
+    tables and strikethrough. Slide features of marp and code chunks of quarto are not
+    supported. A front matter is removed and its title is used as the title of the
+    document. The css file is embedded into the document.
+
+    """
+
+    def run_python_html(
+        path_to_md: Path, path_to_document: Path, path_to_css: Path | None
+    ) -> None:
+        if path_to_document.suffix != ".html":
+            raise NotImplementedError(
+                "The python_html compilation step only renders .html documents."
             )
-        raise ValueError(msg)
-
-
-list_of_valid_marp_options = [
-    # Basic options:
-    "--config-file",
-    # Converter Options:
-    "--image",  # choices: "png", "jpeg"
-    "--images",  # choices: "png", "jpeg"
-    "--allow-local-files",
-    # Template Options:
-    "--template",  # choices: "bare", "bespoke"
-    # PDF Options:
-    "--pdf-notes",
-    "--pdf-outlines",
-    "--pdf-outline.pages",  # default: True
-    "--pdf-outline.headings",  # default: True
-    # Marp / Marpit Options:
-    "--html",
-    "--engine",
-]
-
-list_of_valid_quarto_options = []
+        if path_to_css is not None and path_to_css.suffix != ".css":
+            raise NotImplementedError(
+                "The python_html compilation step only supports .css files."
+            )
+
+        text = path_to_md.read_text(encoding="utf-8")
+        title = path_to_md.stem
+        front_matter = FRONT_MATTER.match(text)
+        if front_matter is not None:
+            text = text[front_matter.end() :]
+            match = _TITLE.search(front_matter.group(1))
+            if match is not None:
+                title = match.group(1)
+
+        style = ""
+        if path_to_css is not None:
+            css = path_to_css.read_text(encoding="utf-8")
+            style = f"<style>\n{css}\n</style>\n"
+
+        path_to_document.write_text(
+            _HTML_TEMPLATE.substitute(
+                title=html.escape(title),
+                style=style,
+                body=_get_markdown_parser().render(text),
+            ),
+            encoding="utf-8",
+        )
+
+    return _set_attributes(run_python_html, options=())
+
+
+def _set_attributes(
+    step: Callable[..., None], **attributes: Any
+) -> Callable[..., None]:
+    """Attach the arguments of a compilation step constructor to the step."""
+    for name, value in attributes.items():
+        setattr(step, name, value)
+    return step
+
+
+@functools.lru_cache(maxsize=None)
+def _get_markdown_parser() -> MarkdownIt:
+    """Create the markdown parser once per process."""
+    return MarkdownIt("commonmark").enable(["table", "strikethrough"])
+
+
+def _run_marp(cmd: list[str], env: dict[str, str] | None = None) -> None:
+    """Run marp with the pool of workers if it is available or with the CLI."""
+    pool = get_pool()
+    if pool is None:
+        _run_command(cmd, env=env)
+    else:
+        returncode = pool.run(cmd[1:])
+        if returncode != 0:
+            raise subprocess.CalledProcessError(returncode, cmd)
+
+
+def _run_command(
+    cmd: list[str], cwd: Path | None = None, env: dict[str, str] | None = None
+) -> None:
+    """Run a command with the session's render engine if it is running."""
+    engine = get_engine()
+    if engine is None:
+        returncode = run_command(cmd, cwd=cwd, env=env)
+    else:
+        returncode = engine.run(cmd, cwd=cwd, env=env)
+    if returncode != 0:
+        raise subprocess.CalledProcessError(returncode, cmd)
+
+
+def _needs_browser(path_to_document: Path, options: Sequence[str]) -> bool:
+    """Check whether marp converts the document with a browser."""
+    return path_to_document.suffix != ".html" or any(
+        opt.startswith("--image") for opt in options
+    )
+
+
+def _move_into_place(scratch: Path, outputs: dict[str, Path]) -> None:
+    """Move the rendered documents and their supporting files next to the documents.
+
+    ``outputs`` maps the names of the rendered files in the scratch directory to the
+    paths of the documents. The scratch directory is on the same file system as the
+    documents which means they are renamed atomically instead of being copied.
+
+    """
+    for name, path_to_document in outputs.items():
+        os.replace(scratch / name, path_to_document)
+
+    parent = next(iter(outputs.values())).parent
+    for path in scratch.iterdir():
+        target = parent / path.name
+        if path.is_dir() and target.is_dir():
+            shutil.rmtree(target)
+        os.replace(path, target)
@@ -1,12 +1,16 @@
 """Configure pytask."""
 from __future__ import annotations
 
+from pathlib import Path
 from typing import Any
 
 from pytask import hookimpl
+from pytask_markdown import renderers
+from pytask_markdown.sources import NORMALIZERS
 
 
 DEFAULT_RENDERER = "marp"
+DEFAULT_OUTPUT_MAX_SIZE = 64
 
 
 @hookimpl
@@ -17,3 +21,98 @@ def pytask_parse_config(config: dict[str, Any]) -> None:
         config["markdown_renderer"] = DEFAULT_RENDERER
     if "infer_markdown_dependencies" not in config:
         config["infer_markdown_dependencies"] = False
+    if "batch_marp_tasks" not in config:
+        config["batch_marp_tasks"] = False
+    if "marp_batch_parallel" not in config:
+        config["marp_batch_parallel"] = None
+    if "batch_quarto_projects" not in config:
+        config["batch_quarto_projects"] = False
+    if "marp_workers" not in config:
+        config["marp_workers"] = 0
+    if "markdown_max_concurrency" not in config:
+        config["markdown_max_concurrency"] = 1
+    if "marp_shared_browser" not in config:
+        config["marp_shared_browser"] = False
+    if "marp_browser_max_pages" not in config:
+        config["marp_browser_max_pages"] = 4
+    config["markdown_cache_dir"] = _parse_cache_dir(config)
+    config["markdown_render_cache"] = _parse_render_cache(config)
+    if "markdown_render_cache_max_size" not in config:
+        config["markdown_render_cache_max_size"] = 1024
+    if "markdown_live_output" not in config:
+        config["markdown_live_output"] = False
+    config["markdown_timeout"] = _parse_timeout(config)
+    config["markdown_output_max_size"] = _parse_output_max_size(config)
+    if "markdown_max_heavy_renders" not in config:
+        config["markdown_max_heavy_renders"] = 0
+    if "markdown_duration_history" not in config:
+        config["markdown_duration_history"] = False
+    config["markdown_source_normalization"] = _parse_source_normalization(config)
+
+
+@hookimpl
+def pytask_post_parse() -> None:
+    """Forget the renderers resolved by an earlier session in the same process.
+
+    Commands like ``pytask profile`` resolve renderers to compare the fingerprints of
+    tasks, but do not unconfigure the session.
+
+    """
+    renderers.clear()
+
+
+def _parse_cache_dir(config: dict[str, Any]) -> Path:
+    """Parse the directory where pytask-markdown stores its caches."""
+    root = Path(config.get("root") or Path.cwd())
+    path = config.get("markdown_cache_dir")
+    if path is None:
+        return root.joinpath(".pytask", "markdown")
+    return root.joinpath(path).resolve()
+
+
+def _parse_timeout(config: dict[str, Any]) -> float | None:
+    """Parse the timeout of compilation steps in seconds."""
+    timeout = config.get("markdown_timeout")
+    if timeout in (None, False, 0, "0", ""):
+        return None
+    return float(timeout)
+
+
+def _parse_output_max_size(config: dict[str, Any]) -> int:
+    """Parse the size of the captured output of renderers in KiB.
+
+    By default, renderers write to the terminal. Their output is only captured if a
+    timeout is configured, such that the error of a terminated step shows what the
+    renderer printed last.
+
+    """
+    max_size = config.get("markdown_output_max_size")
+    if max_size is None:
+        return 0 if config["markdown_timeout"] is None else DEFAULT_OUTPUT_MAX_SIZE
+    return int(max_size)
+
+
+def _parse_render_cache(config: dict[str, Any]) -> Path | None:
+    """Parse the directory of the store of rendered documents."""
+    path = config.get("markdown_render_cache")
+    if path in (None, False):
+        return None
+    if path is True:
+        return config["markdown_cache_dir"].joinpath("renders")
+    root = Path(config.get("root") or Path.cwd())
+    return root.joinpath(Path(path).expanduser()).resolve()
+
+
+def _parse_source_normalization(config: dict[str, Any]) -> frozenset[str]:
+    """Parse the normalization of markdown scripts."""
+    normalizers = config.get("markdown_source_normalization") or ()
+    if isinstance(normalizers, str):
+        normalizers = normalizers.replace(",", " ").split()
+    normalizers = frozenset(normalizers)
+    unknown = normalizers - NORMALIZERS
+    if unknown:
+        raise ValueError(
+            f"The normalization of markdown sources can use {sorted(NORMALIZERS)}, "
+            f"but got {sorted(unknown)}."
+        )
+    return normalizers
@@ -0,0 +1,186 @@
+"""An asyncio engine which renders many markdown tasks from one process.
+
+pytask executes one task after another. Renders mostly wait on marp or quarto, so the
+engine overlaps them. When a markdown task is executed, all other markdown tasks which
+are ready, meaning they will not be skipped and all their dependencies are produced,
+are submitted to the engine as well. Later, the execution of these tasks only waits for
+their render and reports its result or error.
+
+The compilation steps run in a small pool of threads. The commands of the steps are
+started as asyncio subprocesses on an event loop in a background thread which bounds
+the number of concurrent child processes.
+
+"""
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
+import contextlib
+import subprocess
+import threading
+from typing import Any
+from typing import Callable
+
+from pytask_markdown.output import CHUNK_SIZE
+from pytask_markdown.output import get_buffer
+from pytask_markdown.output import OutputBuffer
+from pytask_markdown.processes import get_timeout
+from pytask_markdown.processes import GRACE_PERIOD
+from pytask_markdown.processes import NEW_PROCESS_GROUP
+from pytask_markdown.processes import signal_process_group
+
+
+_ENGINE: RenderEngine | None = None
+
+
+class RenderEngine:
+    """Run renders concurrently with asyncio subprocesses.
+
+    Parameters
+    ----------
+    max_concurrency : int
+        The maximum number of renders and child processes which run at the same time.
+
+    """
+
+    def __init__(self, max_concurrency: int) -> None:
+        self.max_concurrency = max_concurrency
+        self.futures: dict[str, concurrent.futures.Future[Any]] = {}
+        self.claimed: set[str] = set()
+        self._processes: set[asyncio.subprocess.Process] = set()
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_concurrency, thread_name_prefix="pytask-markdown"
+        )
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._thread.start()
+        self._semaphore = self._call_soon(self._create_semaphore).result()
+
+    def _call_soon(self, coroutine_function: Callable[..., Any], *args: Any) -> Any:
+        return asyncio.run_coroutine_threadsafe(coroutine_function(*args), self._loop)
+
+    async def _create_semaphore(self) -> asyncio.Semaphore:
+        # The semaphore must be created on the loop for Python < 3.10.
+        return asyncio.Semaphore(self.max_concurrency)
+
+    async def _run(
+        self,
+        cmd: list[str],
+        cwd: str | None,
+        env: dict[str, str] | None,
+        buffer: OutputBuffer | None,
+        timeout: float | None,
+    ) -> int:
+        async with self._semaphore:
+            pipes: dict[str, Any] = (
+                {}
+                if buffer is None
+                else {
+                    "stdout": asyncio.subprocess.PIPE,
+                    "stderr": asyncio.subprocess.STDOUT,
+                }
+            )
+            process = await asyncio.create_subprocess_exec(
+                cmd[0], *cmd[1:], cwd=cwd, env=env, **pipes, **NEW_PROCESS_GROUP
+            )
+            self._processes.add(process)
+            try:
+                return await asyncio.wait_for(
+                    self._communicate(process, buffer), timeout
+                )
+            except asyncio.TimeoutError:
+                await self._terminate(process)
+                if timeout is None:
+                    raise
+                raise subprocess.TimeoutExpired(cmd, timeout) from None
+            except BaseException:
+                await self._terminate(process)
+                raise
+            finally:
+                self._processes.discard(process)
+
+    @staticmethod
+    async def _communicate(
+        process: asyncio.subprocess.Process, buffer: OutputBuffer | None
+    ) -> int:
+        if buffer is not None and process.stdout is not None:
+            while chunk := await process.stdout.read(CHUNK_SIZE):
+                buffer.write(chunk)
+        return await process.wait()
+
+    @staticmethod
+    async def _terminate(process: asyncio.subprocess.Process) -> None:
+        async def _wait(timeout: float) -> None:
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(process.wait(), timeout)
+
+        # The grace period is awaited such that the loop keeps running other renders.
+        signal_process_group(process.pid, force=False)
+        await _wait(GRACE_PERIOD)
+        signal_process_group(process.pid, force=True)
+        await process.wait()
+
+    def run(
+        self, cmd: list[str], cwd: Any = None, env: dict[str, str] | None = None
+    ) -> int:
+        """Run a command on the event loop and return its exit code.
+
+        The output is captured if the render which calls the command captures it. The
+        process group of the command is terminated if the deadline of the step passes.
+
+        """
+        return self._call_soon(
+            self._run,
+            [str(i) for i in cmd],
+            None if cwd is None else str(cwd),
+            env,
+            get_buffer(),
+            get_timeout(),
+        ).result()
+
+    def submit(
+        self, task_name: str, function: Callable[..., Any], **kwargs: Any
+    ) -> None:
+        """Start the render of a task."""
+        self.claimed.add(task_name)
+        self.futures[task_name] = self._executor.submit(function, **kwargs)
+
+    def close(self) -> None:
+        """Cancel renders which did not start, wait for the others and stop the loop."""
+        for future in self.futures.values():
+            future.cancel()
+        # Kill renders which are still running, for example, after an interrupt.
+        for process in list(self._processes):
+            signal_process_group(process.pid, force=True)
+        self._executor.shutdown(wait=True)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+
+def wait_for_render(
+    future: concurrent.futures.Future[Any], **kwargs: Any  # noqa: U100
+) -> Any:
+    """Replace the function of a task whose render was started by the engine."""
+    return future.result()
+
+
+def start_engine(max_concurrency: int) -> RenderEngine:
+    """Start the engine of the session if it is not running already."""
+    global _ENGINE  # noqa: PLW0603
+    if _ENGINE is None:
+        _ENGINE = RenderEngine(max_concurrency)
+    return _ENGINE
+
+
+def get_engine() -> RenderEngine | None:
+    """Return the engine of the session if it is running."""
+    return _ENGINE
+
+
+def stop_engine() -> None:
+    """Shut down the engine of the session."""
+    global _ENGINE  # noqa: PLW0603
+    if _ENGINE is not None:
+        _ENGINE.close()
+        _ENGINE = None
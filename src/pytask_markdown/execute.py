@@ -1,11 +1,32 @@
 """Execute tasks."""
 from __future__ import annotations
 
-import shutil
+import functools
+import inspect
+from typing import Any
+from typing import Generator
 
+from pybaum.tree_util import tree_map
+from pytask import console
+from pytask import ExecutionReport
+from pytask import FilePathNode
 from pytask import has_mark
 from pytask import hookimpl
+from pytask import Session
+from pytask import SkippedUnchanged
 from pytask import Task
+from pytask_markdown import browser
+from pytask_markdown import engine
+from pytask_markdown import history
+from pytask_markdown import metrics
+from pytask_markdown import renderers
+from pytask_markdown import workers
+from pytask_markdown.batch import add_unchanged_render
+from pytask_markdown.batch import has_node_changed
+from pytask_markdown.batch import is_ready
+from pytask_markdown.batch import is_skipped_unchanged
+from pytask_markdown.batch import will_be_skipped
+from pytask_markdown.utils import get_dag
 
 
 download_link = {
@@ -14,13 +35,340 @@ download_link = {
 }
 
 
+@hookimpl(trylast=True)
+def pytask_execute_log_start(session: Session) -> None:
+    """Estimate the durations of the markdown tasks which are executed."""
+    if not session.config["markdown_duration_history"]:
+        return
+
+    renders = [
+        _describe_render(task)
+        for task in session.tasks
+        if has_mark(task, "markdown") and not will_be_skipped(task)
+    ]
+    estimates = _get_history(session).estimate(renders)
+    session.config["_markdown_estimates"] = estimates
+    if estimates:
+        console.print(
+            "Estimated render time of markdown tasks: "
+            f"{history.format_duration(sum(estimates.values()))} "
+            f"({len(estimates)} of {len(renders)} tasks with an estimate)."
+        )
+        console.print()
+
+
+@hookimpl(hookwrapper=True)
+def pytask_execute_create_scheduler(session: Session) -> Generator[None, Any, None]:
+    """Schedule the markdown tasks with the longest estimated duration first.
+
+    The markers ``try_first`` and ``try_last`` assign a priority of 1 or -1 to tasks.
+    Among ready tasks with the same priority, longer renders are started earlier.
+
+    """
+    outcome = yield
+    scheduler = outcome.get_result()
+    estimates = session.config.get("_markdown_estimates")
+    if not estimates or not hasattr(scheduler, "priorities"):
+        return
+
+    longest = max(estimates.values()) or 1
+    for name, estimate in estimates.items():
+        scheduler.priorities[name] = (
+            scheduler.priorities.get(name, 0) + estimate / longest / 2
+        )
+
+
 @hookimpl
-def pytask_execute_task_setup(task: Task) -> None:
-    """Check that renderer is found in PATH if a markdown task shall be executed."""
-    if has_mark(task, "markdown"):
+def pytask_execute_task_setup(session: Session, task: Task) -> None:
+    """Skip tasks whose inputs were not changed by a render and check the renderer.
+
+    See :func:`~pytask_markdown.batch.is_skipped_unchanged`. The renderer must be found
+    in the PATH if a markdown task shall be executed.
+
+    """
+    if is_skipped_unchanged(session, task):
+        raise SkippedUnchanged
+
+    if has_mark(task, "markdown") and _is_renderer_missing(task):
         renderer = task.attributes["renderer"]
-        if shutil.which(renderer) is None:
-            raise RuntimeError(
-                f"{renderer} is needed to render markdown documents, but it is not "
-                f"found on your PATH. Install from {download_link[renderer]}."
+        raise RuntimeError(
+            f"{renderer} is needed to render markdown documents, but it is not "
+            f"found on your PATH. Install from {download_link[renderer]}."
+        )
+
+
+@hookimpl(hookwrapper=True)
+def pytask_execute_task(session: Session, task: Task) -> Generator[None, None, None]:
+    """Prepare the execution of markdown tasks.
+
+    Pass the resolved renderer and its version to the task, start the session's shared
+    browser and pool of marp workers and render all ready tasks of a batch before the
+    first member is executed. If the render engine is enabled, all ready markdown
+    tasks are rendered concurrently and tasks which were already submitted only wait
+    for their render.
+
+    """
+    if has_mark(task, "markdown"):
+        assert task.name is not None
+        render_engine = _get_engine(session)
+        if render_engine is not None and task.name in render_engine.futures:
+            task.function = functools.partial(
+                engine.wait_for_render, render_engine.futures.pop(task.name)
+            )
+        else:
+            _prepare_task(session, task)
+            if render_engine is not None:
+                render_engine.claimed.add(task.name)
+
+        if render_engine is not None:
+            _submit_ready_tasks(session, render_engine)
+
+        batch = task.attributes.get("markdown_batch")
+        if batch is not None:
+            batch.render(session, task)
+    yield
+
+
+@hookimpl
+def pytask_execute_task_teardown(session: Session, task: Task) -> None:
+    """Store the measurements of the compilation steps on the task."""
+    if has_mark(task, "markdown"):
+        assert task.name is not None
+        path = metrics.get_path_to_metrics(
+            session.config["markdown_cache_dir"], task.name
+        )
+        task.attributes["markdown_metrics"] = metrics.read_metrics(path)
+        session.config.setdefault("_markdown_metrics", {})[task.name] = task.attributes[
+            "markdown_metrics"
+        ]
+        documents = get_dag(session).successors(task.name)
+        if not any(has_node_changed(session, task, name) for name in documents):
+            add_unchanged_render(session, task)
+
+        # Documents restored from the render cache have no measurements.
+        if session.config["markdown_duration_history"] and (
+            task.attributes["markdown_metrics"]
+        ):
+            duration = sum(s["wall_time"] for s in task.attributes["markdown_metrics"])
+            session.config.setdefault("_markdown_durations", []).append(
+                (_describe_render(task), duration)
+            )
+
+
+@hookimpl
+def pytask_execute_log_end(session: Session) -> None:
+    """Add the measurements of this run to the report and the history.
+
+    Measurements of tasks which were not collected in this session are removed from
+    the report.
+
+    """
+    cache_dir = session.config["markdown_cache_dir"]
+    old_report = metrics.read_report(cache_dir)
+    names = {task.name for task in session.tasks}
+    report = {
+        **{name: steps for name, steps in old_report.items() if name in names},
+        **session.config.get("_markdown_metrics", {}),
+    }
+    if report != old_report:
+        metrics.write_metrics(cache_dir.joinpath(metrics.REPORT_NAME), report)
+
+    durations = session.config.get("_markdown_durations")
+    if durations:
+        _get_history(session).record(durations)
+
+
+@hookimpl
+def pytask_profile_add_info_on_task(
+    session: Session, tasks: list[Task], profile: dict[str, dict[str, Any]]
+) -> None:
+    """Add the measurements of the compilation steps to the profile."""
+    report = metrics.read_report(session.config["markdown_cache_dir"])
+    for task in tasks:
+        assert task.name is not None
+        steps = report.get(task.name)
+        if not steps:
+            continue
+        cpu_times = [s["cpu_time"] for s in steps if s["cpu_time"] is not None]
+        max_rss = [s["max_rss"] for s in steps if s["max_rss"] is not None]
+        profile[task.name]["Render steps (in s)"] = ", ".join(
+            f"{s['name']}: {s['wall_time']:.2f}" for s in steps
+        )
+        if cpu_times:
+            profile[task.name]["Renderer CPU (in s)"] = round(sum(cpu_times), 2)
+        if max_rss:
+            profile[task.name]["Renderer memory (in MB)"] = round(
+                max(max_rss) / 1024**2, 1
             )
+
+
+@hookimpl
+def pytask_execute_task_process_report(
+    session: Session, report: ExecutionReport
+) -> None:
+    """Keep track of finished tasks to know which markdown tasks are ready."""
+    assert report.task.name is not None
+    session.config.setdefault("_markdown_finished_tasks", set()).add(report.task.name)
+
+    candidates = session.config.get("_markdown_ready_candidates")
+    if candidates is not None:
+        dag = get_dag(session)
+        for product in dag.successors(report.task.name):
+            candidates.update(dict.fromkeys(dag.successors(product)))
+
+
+@hookimpl
+def pytask_unconfigure() -> None:
+    """Shut down the session's services and forget the resolved renderers."""
+    engine.stop_engine()
+    workers.stop_pool()
+    browser.stop_browser()
+    renderers.clear()
+
+
+def _prepare_task(session: Session, task: Task) -> None:
+    """Pass the session's state to the function of a markdown task."""
+    executable, version = renderers.describe(
+        task.attributes["renderer"], session.config["markdown_cache_dir"]
+    )
+    task.attributes["renderer_version"] = version
+    task.function = functools.partial(task.function, renderer_version=version)
+    if executable is not None:
+        task.function = functools.partial(task.function, executable=executable)
+
+    if task.attributes["renderer"] == "marp" and not _uses_process_backend(session):
+        shared_browser = None
+        if session.config["marp_shared_browser"]:
+            shared_browser = browser.start_browser(
+                session.config["marp_browser_max_pages"]
+            )
+        if session.config["marp_workers"] > 0 and executable is not None:
+            workers.start_pool(
+                session.config["marp_workers"],
+                executable,
+                env=None if shared_browser is None else shared_browser.environment(),
+            )
+
+    if task.attributes["quarto_cache"] and _have_inputs_changed(session, task):
+        task.function = functools.partial(task.function, refresh_cache=True)
+
+
+def _get_history(session: Session) -> history.DurationHistory:
+    """Get the history of render durations."""
+    return history.DurationHistory(
+        session.config["markdown_cache_dir"].joinpath(history.DATABASE_NAME)
+    )
+
+
+def _describe_render(task: Task) -> history.Render:
+    """Describe the render of a task for the history of durations."""
+    document = task.produces["__document"]
+    if isinstance(document, dict):
+        document = next(iter(document.values()))
+    script = task.depends_on["__script"]
+    assert isinstance(document, FilePathNode)
+    assert isinstance(script, FilePathNode)
+    assert task.name is not None
+    try:
+        source_size = script.path.stat().st_size
+    except OSError:
+        source_size = 0
+    return history.Render(
+        task.name, task.attributes["renderer"], document.path.suffix, source_size
+    )
+
+
+def _get_engine(session: Session) -> engine.RenderEngine | None:
+    """Get the render engine if it is enabled for the session."""
+    if (
+        session.config["markdown_max_concurrency"] > 1
+        and session.config.get("n_workers", 1) == 1
+        and not session.config["dry_run"]
+    ):
+        return engine.start_engine(session.config["markdown_max_concurrency"])
+    return None
+
+
+def _submit_ready_tasks(session: Session, render_engine: engine.RenderEngine) -> None:
+    """Submit all markdown tasks which are ready to the render engine.
+
+    At first, all markdown tasks are candidates. Afterwards, only tasks which depend on
+    the products of a finished task become candidates again, see
+    :func:`pytask_execute_task_process_report`. Members of batches are rendered by
+    their batch.
+
+    """
+    candidates = session.config.setdefault(
+        "_markdown_ready_candidates", dict.fromkeys(t.name for t in session.tasks)
+    )
+    names = list(candidates)
+    candidates.clear()
+
+    dag = get_dag(session)
+    for name in names:
+        task = dag.nodes[name]["task"]
+        if (
+            not has_mark(task, "markdown")
+            or "markdown_batch" in task.attributes
+            or name in render_engine.claimed
+            or not is_ready(session, name)
+            or not _passes_setup(session, task)
+        ):
+            continue
+        _prepare_task(session, task)
+
+        # Mirror pytask's setup and execution of the task.
+        for product in dag.successors(task.name):
+            node = dag.nodes[product]["node"]
+            if isinstance(node, FilePathNode):
+                node.path.parent.mkdir(parents=True, exist_ok=True)
+        kwargs = {**task.kwargs}
+        parameters = inspect.signature(task.function).parameters
+        for arg_name in ("depends_on", "produces"):
+            if arg_name in parameters:
+                kwargs[arg_name] = tree_map(lambda x: x.value, getattr(task, arg_name))
+        render_engine.submit(task.name, task.function, **kwargs)
+
+
+def _is_renderer_missing(task: Task) -> bool:
+    """Check whether the renderer of a markdown task cannot be found."""
+    renderer = task.attributes["renderer"]
+    return (
+        renderer not in renderers.IN_PROCESS_RENDERERS
+        and renderers.resolve(renderer) is None
+    )
+
+
+def _passes_setup(session: Session, task: Task) -> bool:
+    """Check whether the setup of a task by pytask and this plugin would pass.
+
+    Skipped tasks are already excluded by :func:`~pytask_markdown.batch.is_ready`.
+    Tasks which would fail are left to pytask which reports the errors.
+
+    """
+    dag = get_dag(session)
+    return not _is_renderer_missing(task) and all(
+        dag.nodes[name]["node"].state() for name in dag.predecessors(task.name)
+    )
+
+
+def _have_inputs_changed(session: Session, task: Task) -> bool:
+    """Check whether dependencies other than the script and css file changed."""
+    ignored = {
+        task.depends_on[key].name
+        for key in ("__script", "__css")
+        if task.depends_on.get(key) is not None
+    }
+    return any(
+        has_node_changed(session, task, name)
+        for name in get_dag(session).predecessors(task.name)
+        if name not in ignored
+    )
+
+
+def _uses_process_backend(session: Session) -> bool:
+    """Check whether tasks are executed in other processes by pytask-parallel."""
+    backend = session.config.get("parallel_backend")
+    return session.config.get("n_workers", 1) > 1 and (
+        getattr(backend, "value", backend) != "threads"
+    )
@@ -0,0 +1,134 @@
+"""A history of render durations to schedule long renders first.
+
+After a markdown task was rendered, the duration of its compilation steps is stored in
+a SQLite database in the cache directory together with the renderer, the suffix of the
+document and the size of the script. Only the last records of every task are kept.
+
+Before the execution, the duration of every markdown task is estimated. It is the mean
+of the recorded durations of the task. For tasks without a record, the duration is
+extrapolated from the seconds per byte of script of other tasks with the same renderer
+and suffix. The estimates are used to start the longest renders first such that they
+do not finish last and prolong the build, and to show the expected render time.
+
+"""
+from __future__ import annotations
+
+import contextlib
+import sqlite3
+import time
+from pathlib import Path
+from typing import Generator
+from typing import Iterable
+from typing import NamedTuple
+
+
+DATABASE_NAME = "durations.sqlite3"
+
+MAX_RECORDS_PER_TASK = 10
+
+
+class Render(NamedTuple):
+    """The description of the render of a task."""
+
+    task: str
+    renderer: str
+    suffix: str
+    source_size: int
+
+
+class DurationHistory:
+    """The render durations of markdown tasks.
+
+    Parameters
+    ----------
+    path : Path
+        The path to the database.
+
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+
+    @contextlib.contextmanager
+    def _connect(self) -> Generator[sqlite3.Connection, None, None]:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=30)
+        try:
+            with connection:
+                connection.execute(
+                    "CREATE TABLE IF NOT EXISTS durations ("
+                    "id INTEGER PRIMARY KEY, task TEXT NOT NULL, renderer TEXT, "
+                    "suffix TEXT, source_size INTEGER, duration REAL, timestamp REAL)"
+                )
+                connection.execute(
+                    "CREATE INDEX IF NOT EXISTS durations_task ON durations (task)"
+                )
+                yield connection
+        finally:
+            connection.close()
+
+    def record(self, records: Iterable[tuple[Render, float]]) -> None:
+        """Store the durations of renders and drop the oldest records of the tasks."""
+        rows = [(*render, duration, time.time()) for render, duration in records]
+        if not rows:
+            return
+        with self._connect() as connection:
+            connection.executemany(
+                "INSERT INTO durations (task, renderer, suffix, source_size, duration, "
+                "timestamp) VALUES (?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            connection.executemany(
+                "DELETE FROM durations WHERE task = ? AND id NOT IN (SELECT id FROM "
+                "durations WHERE task = ? ORDER BY id DESC LIMIT ?)",
+                [(row[0], row[0], MAX_RECORDS_PER_TASK) for row in rows],
+            )
+
+    def estimate(self, renders: Iterable[Render]) -> dict[str, float]:
+        """Estimate the durations of renders in seconds.
+
+        Renders without an estimate are missing from the result.
+
+        """
+        renders = list(renders)
+        if not renders or not self.path.exists():
+            return {}
+        with self._connect() as connection:
+            per_task = dict(
+                connection.execute(
+                    "SELECT task, AVG(duration) FROM durations GROUP BY task"
+                )
+            )
+            per_kind = {
+                (renderer, suffix): (duration, size)
+                for renderer, suffix, duration, size in connection.execute(
+                    "SELECT renderer, suffix, AVG(duration), AVG(source_size) "
+                    "FROM durations GROUP BY renderer, suffix"
+                )
+            }
+
+        estimates = {}
+        for render in renders:
+            if render.task in per_task:
+                estimates[render.task] = per_task[render.task]
+            elif (render.renderer, render.suffix) in per_kind:
+                duration, size = per_kind[render.renderer, render.suffix]
+                estimates[render.task] = (
+                    duration * render.source_size / size if size else duration
+                )
+        return estimates
+
+
+def format_duration(seconds: float) -> str:
+    """Format a duration for humans.
+
+    Examples
+    --------
+    >>> format_duration(5.2)
+    '5s'
+    >>> format_duration(130)
+    '2m 10s'
+
+    """
+    minutes, seconds = divmod(round(seconds), 60)
+    return f"{minutes}m {seconds}s" if minutes else f"{seconds}s"
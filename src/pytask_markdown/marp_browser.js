@@ -0,0 +1,43 @@
+// Attach marp to the browser which is shared by pytask-markdown.
+//
+// The script is preloaded into marp processes with NODE_OPTIONS="--require ...". If
+// PYTASK_MARKDOWN_BROWSER_WS holds the remote-debugging endpoint of a browser,
+// puppeteer's launch() connects to this browser instead of starting a new one and
+// closing the browser only disconnects from it. Every connection touches the file in
+// PYTASK_MARKDOWN_BROWSER_MARKER, which tells pytask-markdown that the patch applies.
+"use strict";
+
+const fs = require("fs");
+const Module = require("module");
+
+const endpoint = process.env.PYTASK_MARKDOWN_BROWSER_WS;
+const marker = process.env.PYTASK_MARKDOWN_BROWSER_MARKER;
+
+function patch(puppeteer) {
+  if (!puppeteer || typeof puppeteer.connect !== "function" || puppeteer.__shared) {
+    return;
+  }
+  const connect = puppeteer.connect.bind(puppeteer);
+  const launch = async () => {
+    const browser = await connect({ browserWSEndpoint: endpoint });
+    if (marker) {
+      fs.closeSync(fs.openSync(marker, "a"));
+    }
+    browser.close = async () => browser.disconnect();
+    return browser;
+  };
+  Object.defineProperty(puppeteer, "launch", { value: launch, writable: true });
+  Object.defineProperty(puppeteer, "__shared", { value: true });
+}
+
+if (endpoint) {
+  const load = Module._load;
+  Module._load = function (request, ...args) {
+    const exports = load.call(this, request, ...args);
+    if (request === "puppeteer-core" || request === "puppeteer") {
+      patch(exports);
+      patch(exports && exports.default);
+    }
+    return exports;
+  };
+}
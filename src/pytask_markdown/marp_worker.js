@@ -0,0 +1,72 @@
+// A long-running marp worker which is driven by pytask-markdown.
+//
+// The worker loads marp-cli once and afterwards reads jobs as JSON lines from stdin.
+// Each job is {"id": ..., "args": [...], "max_output": ...} where args are the command
+// line arguments for marp. For every job, a JSON line
+// {"id": ..., "code": ..., "error": ..., "output": ...} is written to stdout. Jobs are
+// processed one after another.
+//
+// If max_output is set, the last max_output characters which marp logs during the job
+// are returned as output. Otherwise, marp logs to stderr.
+//
+// Usage: node marp_worker.js <path-to-marp-cli-package>
+"use strict";
+
+const readline = require("readline");
+
+const { marpCli } = require(process.argv[2]);
+
+// Keep stdout reserved for the protocol.
+const writeResult = process.stdout.write.bind(process.stdout);
+const writeStderr = process.stderr.write.bind(process.stderr);
+
+let output = null;
+let maxOutput = 0;
+
+function writeLog(chunk, encoding, callback) {
+  if (output === null) {
+    return writeStderr(chunk, encoding, callback);
+  }
+  output += typeof chunk === "string" ? chunk : Buffer.from(chunk).toString();
+  if (output.length > maxOutput) {
+    output = output.slice(-maxOutput);
+  }
+  const done = typeof encoding === "function" ? encoding : callback;
+  if (typeof done === "function") {
+    done();
+  }
+  return true;
+}
+
+process.stdout.write = writeLog;
+process.stderr.write = writeLog;
+console.log = console.error;
+
+let queue = Promise.resolve();
+
+async function runJob(job) {
+  output = job.max_output ? "" : null;
+  maxOutput = job.max_output || 0;
+  try {
+    const code = await marpCli(job.args);
+    return { id: job.id, code: code, error: null, output: output };
+  } catch (e) {
+    return { id: job.id, code: 1, error: String((e && e.stack) || e), output: output };
+  } finally {
+    output = null;
+  }
+}
+
+readline.createInterface({ input: process.stdin }).on("line", (line) => {
+  if (!line.trim()) {
+    return;
+  }
+  const job = JSON.parse(line);
+  queue = queue.then(async () => {
+    writeResult(JSON.stringify(await runJob(job)) + "\n");
+  });
+});
+
+process.stdin.on("end", () => {
+  queue.then(() => process.exit(0));
+});
@@ -0,0 +1,175 @@
+"""Measure the compilation steps of markdown tasks.
+
+For every compilation step, the wall time, the CPU time and the peak memory of the
+renderer processes and the size of the documents are recorded. The resource usage of a
+process is read with ``os.wait4`` when the process is reaped. It is not available on
+Windows and for renders which are run by the render engine or the pool of marp workers
+because these processes are not reaped by the step.
+
+The measurements of a render are written to a file next to the other caches because
+the render may run in another process. They are moved to ``task.attributes`` after the
+task finished and collected in ``metrics.json`` in ``markdown_cache_dir`` which is read
+by ``pytask profile``.
+
+"""
+from __future__ import annotations
+
+import contextlib
+import contextvars
+import functools
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any
+from typing import Generator
+from typing import Sequence
+
+from pytask_markdown.output import get_buffer
+from pytask_markdown.processes import get_timeout
+from pytask_markdown.processes import NEW_PROCESS_GROUP
+from pytask_markdown.processes import terminate_process_group
+from pytask_markdown.processes import wait_for_process
+from pytask_markdown.processes import Watchdog
+
+
+REPORT_NAME = "metrics.json"
+
+_USAGES: contextvars.ContextVar[
+    list[tuple[float, int]] | None
+] = contextvars.ContextVar("_USAGES", default=None)
+
+
+def run_command(
+    cmd: list[str], cwd: Any = None, env: dict[str, str] | None = None
+) -> int:
+    """Run a command, record the resource usage of the process and return its code.
+
+    If the output of renderers is captured, stdout and stderr of the process are
+    streamed into the buffer. The process is started in its own process group which is
+    terminated if the deadline of the step passes or the call is interrupted.
+
+    Raises
+    ------
+    subprocess.TimeoutExpired
+        If the deadline of the step passed.
+
+    """
+    buffer = get_buffer()
+    pipes: dict[str, Any] = (
+        {}
+        if buffer is None
+        else {"stdout": subprocess.PIPE, "stderr": subprocess.STDOUT}
+    )
+    timeout = get_timeout()
+    process = subprocess.Popen(cmd, cwd=cwd, env=env, **pipes, **NEW_PROCESS_GROUP)
+    watchdog = Watchdog(process.pid, timeout)
+    try:
+        if buffer is not None and process.stdout is not None:
+            with process.stdout:
+                buffer.read_from(process.stdout)
+        if hasattr(os, "wait4"):
+            _, status, usage = os.wait4(process.pid, 0)
+        else:
+            process.wait()
+    except BaseException:
+        terminate_process_group(
+            process.pid, functools.partial(wait_for_process, process)
+        )
+        process.wait()
+        raise
+    finally:
+        watchdog.stop()
+
+    if watchdog.expired and timeout is not None:
+        raise subprocess.TimeoutExpired(cmd, timeout)
+    if not hasattr(os, "wait4"):
+        return process.returncode
+
+    returncode = (
+        -os.WTERMSIG(status) if os.WIFSIGNALED(status) else os.WEXITSTATUS(status)
+    )
+    process.returncode = returncode
+
+    # ru_maxrss is measured in bytes on macOS and in kilobytes elsewhere.
+    max_rss = usage.ru_maxrss if sys.platform == "darwin" else usage.ru_maxrss * 1024
+    add_child_usage(usage.ru_utime + usage.ru_stime, max_rss)
+    return returncode
+
+
+def add_child_usage(cpu_time: float, max_rss: int) -> None:
+    """Add the resource usage of a process to the step which is measured."""
+    usages = _USAGES.get()
+    if usages is not None:
+        usages.append((cpu_time, max_rss))
+
+
+@contextlib.contextmanager
+def measure_step(
+    name: str, paths_to_documents: Sequence[Path]
+) -> Generator[dict[str, Any], None, None]:
+    """Measure a compilation step.
+
+    Parameters
+    ----------
+    name : str
+        The name of the compilation step.
+    paths_to_documents : Sequence[Path]
+        The documents whose size is recorded after the step.
+
+    Yields
+    ------
+    dict[str, Any]
+        The record of the step which is filled after the step finished. CPU time and
+        peak memory are ``None`` if no process was measured.
+
+    """
+    record: dict[str, Any] = {"name": name}
+    usages: list[tuple[float, int]] = []
+    token = _USAGES.set(usages)
+    start = time.perf_counter()
+    try:
+        yield record
+    finally:
+        record["wall_time"] = time.perf_counter() - start
+        _USAGES.reset(token)
+        record["cpu_time"] = sum(u[0] for u in usages) if usages else None
+        record["max_rss"] = max(u[1] for u in usages) if usages else None
+        record["output_size"] = sum(
+            path.stat().st_size for path in paths_to_documents if path.exists()
+        )
+
+
+def get_path_to_metrics(cache_dir: Path, task_name: str) -> Path:
+    """Get the path where the measurements of a render are stored temporarily."""
+    name = hashlib.sha256(task_name.encode()).hexdigest()
+    return cache_dir.joinpath("metrics", f"{name}.json")
+
+
+def read_metrics(path: Path) -> list[dict[str, Any]]:
+    """Read and remove the measurements of a render."""
+    try:
+        metrics = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return []
+    path.unlink()
+    return metrics
+
+
+def write_metrics(path: Path, metrics: Any) -> None:
+    """Write measurements atomically."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    tmp.write_text(json.dumps(metrics), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def read_report(cache_dir: Path) -> dict[str, list[dict[str, Any]]]:
+    """Read the measurements of all markdown tasks."""
+    try:
+        return json.loads(cache_dir.joinpath(REPORT_NAME).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
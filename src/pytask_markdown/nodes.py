@@ -0,0 +1,285 @@
+"""Nodes which are added to markdown tasks.
+
+pytask only tracks files. The options of the compilation steps and the version of the
+renderer are not files, and changing them did not execute a task again. Every markdown
+task has a fingerprint node instead whose state is a hash of the normalized compilation
+steps, their options and the resolved version of the renderer. pytask only compares the
+states of files and tasks with its database. The fingerprint of the last successful
+execution of every task is stored in ``fingerprints.json`` in ``markdown_cache_dir``
+instead, and the task is executed again when the state differs.
+
+Fingerprint nodes are only added to the DAG and not to the dependencies of tasks
+because commands like ``pytask collect --nodes`` expect all dependencies to be files.
+
+If the normalization of sources is enabled, scripts are :class:`MarkdownSourceNode`
+whose state is the fingerprint of their normalized content instead of their
+modification time. See :mod:`pytask_markdown.sources`.
+
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Any
+from typing import Callable
+from typing import Generator
+from typing import Iterable
+from typing import Sequence
+
+import networkx as nx
+from attrs import define
+from attrs import field
+from pytask import ExecutionReport
+from pytask import FilePathNode
+from pytask import hookimpl
+from pytask import MetaNode
+from pytask import Session
+from pytask import TaskOutcome
+from pytask_markdown import renderers
+from pytask_markdown import sources
+
+
+_STEP_ATTRIBUTES = ("options", "cache", "incremental")
+"""The attributes of compilation steps which change the document.
+
+The timeout of a step does not change the document and is left out.
+
+"""
+
+FINGERPRINTS_NAME = "fingerprints.json"
+
+
+class FingerprintNode(MetaNode):
+    """The fingerprint of the compilation steps and the renderer of a task.
+
+    Parameters
+    ----------
+    name : str
+        The name of the node which must be unique.
+    compilation_steps : Sequence[Callable[..., Any]]
+        The parsed compilation steps of the task.
+    renderer : str
+        The renderer of the task.
+    cache_dir : Path | None
+        The directory where probed versions of renderers are stored.
+
+    """
+
+    def __init__(
+        self,
+        name: str,
+        compilation_steps: Sequence[Callable[..., Any]],
+        renderer: str,
+        cache_dir: Path | None = None,
+    ) -> None:
+        self.name = name
+        self.compilation_steps = compilation_steps
+        self.renderer = renderer
+        self.cache_dir = cache_dir
+        self._fingerprint: str | None = None
+
+    def __repr__(self) -> str:
+        return f"FingerprintNode(name={self.name!r})"
+
+    @property
+    def value(self) -> str:
+        """The fingerprint."""
+        return self.state()
+
+    def state(self) -> str:
+        """Return the fingerprint.
+
+        The version of the renderer is resolved on the first call and kept for the
+        session.
+
+        """
+        if self._fingerprint is None:
+            _, version = renderers.describe(self.renderer, self.cache_dir)
+            self._fingerprint = compute_fingerprint(
+                self.compilation_steps, self.renderer, version
+            )
+        return self._fingerprint
+
+
+def _to_frozenset(normalizers: Iterable[str]) -> frozenset[str]:
+    return frozenset(normalizers)
+
+
+@define(kw_only=True)
+class MarkdownSourceNode(FilePathNode):
+    """A markdown script whose state is the fingerprint of its normalized content.
+
+    Scripts are shared by all tasks which render them. Speaker notes are only ignored
+    if none of these tasks produces documents with notes. Comments are kept as well if
+    marp renders the script to such a document because its speaker notes are HTML
+    comments.
+
+    """
+
+    normalizers: frozenset[str] = field(converter=_to_frozenset)
+    """The normalizers which are applied to the content."""
+    path_to_index: Path | None = None
+    """The path to the index of fingerprints. If it is ``None``, fingerprints are only
+    kept in memory."""
+    needs_notes: bool = field(default=False, init=False)
+    """Whether a task renders the script to a document with speaker notes."""
+    needs_comments: bool = field(default=False, init=False)
+    """Whether marp renders the script to a document with speaker notes."""
+
+    @classmethod
+    def from_node(
+        cls,
+        node: FilePathNode,
+        normalizers: Iterable[str],
+        path_to_index: Path | None = None,
+    ) -> MarkdownSourceNode:
+        """Instantiate the class from the node of a script."""
+        return cls(
+            name=node.name,
+            value=node.value,
+            path=node.path,
+            normalizers=normalizers,
+            path_to_index=path_to_index,
+        )
+
+    def state(self) -> str | None:
+        """Return the fingerprint or ``None`` if the script does not exist."""
+        normalizers = self.normalizers
+        if self.needs_notes:
+            normalizers = normalizers - {"notes"}
+        if self.needs_comments:
+            normalizers = normalizers - {"comments"}
+        index = (
+            sources.SourceIndex()
+            if self.path_to_index is None
+            else sources.get_index(self.path_to_index)
+        )
+        try:
+            return sources.fingerprint(self.path, normalizers, index)
+        except FileNotFoundError:
+            return None
+
+
+def compute_fingerprint(
+    compilation_steps: Sequence[Callable[..., Any]],
+    renderer: str,
+    renderer_version: str,
+) -> str:
+    """Compute the fingerprint of compilation steps and a renderer.
+
+    Examples
+    --------
+    >>> from pytask_markdown.compilation_steps import marp
+    >>> a = compute_fingerprint([marp("--html")], "marp", "1.0")
+    >>> a == compute_fingerprint([marp(["--html"], timeout=5)], "marp", "1.0")
+    True
+    >>> a == compute_fingerprint([marp("--html")], "marp", "2.0")
+    False
+
+    """
+    spec = {
+        "renderer": renderer,
+        "version": renderer_version,
+        "steps": [
+            {
+                "name": step.__name__,
+                **{
+                    attribute: getattr(step, attribute)
+                    for attribute in _STEP_ATTRIBUTES
+                    if hasattr(step, attribute)
+                },
+            }
+            for step in compilation_steps
+        ],
+    }
+    normalized = json.dumps(spec, sort_keys=True, default=repr)
+    return hashlib.sha256(normalized.encode()).hexdigest()
+
+
+def _get_fingerprints(session: Session) -> dict[str, str]:
+    """Get the fingerprints of the last successful executions of tasks."""
+    if "_markdown_fingerprints" not in session.config:
+        path = session.config["markdown_cache_dir"].joinpath(FINGERPRINTS_NAME)
+        try:
+            fingerprints = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            fingerprints = {}
+        session.config["_markdown_fingerprints"] = fingerprints
+    return session.config["_markdown_fingerprints"]
+
+
+@hookimpl
+def pytask_dag_has_node_changed(
+    session: Session, node: MetaNode, task_name: str
+) -> bool | None:
+    """Compare the fingerprint of a markdown task with the one of its last execution.
+
+    Other nodes are handled by pytask.
+
+    """
+    if not isinstance(node, FingerprintNode):
+        return None
+    return node.state() != _get_fingerprints(session).get(task_name)
+
+
+@hookimpl
+def pytask_dag_modify_dag(session: Session, dag: nx.DiGraph) -> None:
+    """Add the fingerprint nodes and use the source nodes for scripts.
+
+    pytask keeps the last node which was added for a name, which may be the plain node
+    of the task producing the script.
+
+    """
+    fingerprint_nodes = session.config.get("_markdown_fingerprint_nodes", {})
+    for task_name, node in fingerprint_nodes.items():
+        if task_name in dag.nodes:
+            dag.add_node(node.name, node=node)
+            dag.add_edge(node.name, task_name)
+
+    for node in session.config.get("_markdown_source_nodes", {}).values():
+        if node.name in dag.nodes:
+            dag.nodes[node.name]["node"] = node
+
+
+@hookimpl(hookwrapper=True)
+def pytask_dag_select_execution_dag() -> Generator[None, None, None]:
+    """Store the fingerprints of scripts which were computed to select tasks."""
+    yield
+    sources.save_indexes()
+
+
+@hookimpl(tryfirst=True)
+def pytask_execute_task_process_report(
+    session: Session, report: ExecutionReport
+) -> None:
+    """Remember the fingerprint of a markdown task which was executed successfully."""
+    name = report.task.name
+    assert name is not None
+    node = session.config.get("_markdown_fingerprint_nodes", {}).get(name)
+    if node is not None and report.outcome == TaskOutcome.SUCCESS:
+        _get_fingerprints(session)[name] = node.state()
+
+
+@hookimpl
+def pytask_execute_log_end(session: Session) -> None:
+    """Store the fingerprints of tasks and scripts after the execution.
+
+    Fingerprints of tasks which were not collected in this session are removed.
+
+    """
+    sources.save_indexes()
+
+    fingerprints = session.config.get("_markdown_fingerprints")
+    if fingerprints is None:
+        return
+    names = {task.name for task in session.tasks}
+    path = session.config["markdown_cache_dir"].joinpath(FINGERPRINTS_NAME)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    tmp.write_text(
+        json.dumps({k: v for k, v in fingerprints.items() if k in names}),
+        encoding="utf-8",
+    )
+    os.replace(tmp, path)
@@ -0,0 +1,197 @@
+"""Validate and normalize the command line options of the renderers.
+
+Every renderer has a schema of the options which can be passed to its compilation step.
+An option is a flag or takes a value which may be restricted to some choices. Options
+are parsed into a canonical form. Aliases are replaced with the long name, values
+passed with ``--option=value`` are split into two arguments and the options are sorted
+by name. Options which mean the same produce the same canonical options which are used
+in the keys of batches and of the render cache.
+
+"""
+from __future__ import annotations
+
+import functools
+from typing import NamedTuple
+
+
+class Option(NamedTuple):
+    """An option of a renderer.
+
+    Parameters
+    ----------
+    takes_value : bool
+        Whether the option takes a value.
+    choices : tuple[str, ...] | None
+        The allowed values. ``None`` allows any value.
+    value_is_optional : bool
+        Whether the value can be omitted.
+    repeatable : bool
+        Whether the option can be passed multiple times.
+    aliases : tuple[str, ...]
+        Other names of the option like short names.
+
+    """
+
+    takes_value: bool = False
+    choices: tuple[str, ...] | None = None
+    value_is_optional: bool = False
+    repeatable: bool = False
+    aliases: tuple[str, ...] = ()
+
+
+_IMAGE_FORMATS = ("png", "jpeg")
+
+MARP_OPTIONS = {
+    # Basic options:
+    "--config-file": Option(takes_value=True, aliases=("-c",)),
+    # Converter options:
+    "--image": Option(takes_value=True, choices=_IMAGE_FORMATS, value_is_optional=True),
+    "--images": Option(
+        takes_value=True, choices=_IMAGE_FORMATS, value_is_optional=True
+    ),
+    "--allow-local-files": Option(),
+    # Template options:
+    "--template": Option(takes_value=True, choices=("bare", "bespoke")),
+    # PDF options:
+    "--pdf-notes": Option(),
+    "--pdf-outlines": Option(),
+    "--pdf-outlines.pages": Option(),
+    "--no-pdf-outlines.pages": Option(),
+    "--pdf-outlines.headings": Option(),
+    "--no-pdf-outlines.headings": Option(),
+    # Marp / Marpit options:
+    "--html": Option(),
+    "--no-html": Option(),
+    "--engine": Option(takes_value=True),
+}
+
+QUARTO_OPTIONS = {
+    # Render options:
+    "--to": Option(takes_value=True, aliases=("-t",)),
+    "--metadata": Option(takes_value=True, repeatable=True, aliases=("-M",)),
+    "--toc": Option(),
+    "--number-sections": Option(),
+    "--embed-resources": Option(),
+    "--self-contained": Option(),
+    "--profile": Option(takes_value=True),
+    "--quiet": Option(),
+    # Execution options:
+    "--execute": Option(),
+    "--no-execute": Option(),
+    "--execute-param": Option(takes_value=True, repeatable=True, aliases=("-P",)),
+    "--execute-params": Option(takes_value=True),
+    "--execute-dir": Option(takes_value=True),
+    "--execute-daemon": Option(takes_value=True, value_is_optional=True),
+    "--no-execute-daemon": Option(),
+    "--execute-daemon-restart": Option(),
+    "--execute-debug": Option(),
+}
+
+_SCHEMAS = {"marp": MARP_OPTIONS, "quarto": QUARTO_OPTIONS}
+
+
+def parse_options(renderer: str, options: tuple[str, ...]) -> tuple[str, ...]:
+    """Validate options and return them in canonical form.
+
+    Parameters
+    ----------
+    renderer : str
+        The name of the renderer whose schema is used.
+    options : tuple[str, ...]
+        The options passed to the compilation step.
+
+    Returns
+    -------
+    tuple[str, ...]
+        The canonical options.
+
+    Raises
+    ------
+    ValueError
+        If an option is unknown, passed multiple times or misses a valid value.
+
+    Examples
+    --------
+    >>> parse_options("marp", ("--images=png", "--html"))
+    ('--html', '--images', 'png')
+    >>> parse_options("quarto", ("-M", "title:Talk", "--toc"))
+    ('--metadata', 'title:Talk', '--toc')
+
+    """
+    return _parse_options(renderer, tuple(options))
+
+
+@functools.lru_cache(maxsize=None)
+def _parse_options(renderer: str, options: tuple[str, ...]) -> tuple[str, ...]:
+    schema = _SCHEMAS[renderer]
+    aliases = {alias: name for name, opt in schema.items() for alias in opt.aliases}
+
+    parsed: list[tuple[str, str | None]] = []
+    invalid = []
+    tokens = list(options)
+    while tokens:
+        token = tokens.pop(0)
+        name, has_value, raw_value = token.partition("=")
+        value: str | None = raw_value
+        if not name.startswith("-"):
+            invalid.append(token)
+            continue
+        name = aliases.get(name, name)
+        option = schema.get(name)
+        if option is None or (has_value and not option.takes_value):
+            invalid.append(token)
+            continue
+
+        if not option.takes_value:
+            parsed.append((name, None))
+            continue
+
+        if not has_value:
+            if tokens and _is_value(tokens[0], option):
+                value = tokens.pop(0)
+            elif option.value_is_optional:
+                value = None
+            else:
+                raise ValueError(f"Option {name!r} of {renderer} requires a value.")
+
+        if value is not None and option.choices and value not in option.choices:
+            raise ValueError(
+                f"Option {name!r} of {renderer} must be one of {option.choices}, but "
+                f"got {value!r}."
+            )
+        parsed.append((name, value))
+
+    if invalid:
+        msg = f"Options {invalid} are invalid. Please refer to the documentation."
+        if any(opt.startswith("--theme-set") for opt in invalid):
+            msg += (
+                "\nTo use a custom css or scss theme please provide the path to the "
+                "pytask.mark.markdown decorator as css=/path/to/css."
+            )
+        raise ValueError(msg)
+
+    names = [name for name, _ in parsed]
+    duplicated = sorted(
+        {
+            name
+            for name in names
+            if names.count(name) > 1 and not schema[name].repeatable
+        }
+    )
+    if duplicated:
+        raise ValueError(f"Options {duplicated} of {renderer} are passed repeatedly.")
+
+    # The sort is stable which keeps the order of values of repeatable options.
+    canonical: list[str] = []
+    for name, value in sorted(parsed, key=lambda item: item[0]):
+        canonical.append(name)
+        if value is not None:
+            canonical.append(value)
+    return tuple(canonical)
+
+
+def _is_value(token: str, option: Option) -> bool:
+    """Check whether the next token is the value of an option."""
+    if option.choices is not None:
+        return token in option.choices
+    return not token.startswith("-")
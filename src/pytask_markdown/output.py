@@ -0,0 +1,121 @@
+"""Capture the output of renderers.
+
+By default, renderers write to the terminal of pytask. When many documents are rendered
+in parallel, their output is interleaved and the output of a failed render is hard to
+find. If ``markdown_output_max_size`` or ``markdown_timeout`` is configured, the
+combined stdout and stderr of the renderer processes of a task are streamed into a
+ring buffer which keeps the last bytes instead. Its memory is constant no
+matter how much a renderer writes. If a compilation step fails, the content of the
+buffer is added to the error of the task.
+
+Optionally, complete lines of the output are also printed while the renderer runs with
+the name of the document as a prefix.
+
+"""
+from __future__ import annotations
+
+import contextlib
+import contextvars
+import sys
+from collections import deque
+from typing import IO
+from typing import Generator
+
+
+CHUNK_SIZE = 64 * 1024
+
+_BUFFER: contextvars.ContextVar[OutputBuffer | None] = contextvars.ContextVar(
+    "_BUFFER", default=None
+)
+
+
+class OutputBuffer:
+    """A ring buffer which keeps the last bytes of the output of renderers.
+
+    Parameters
+    ----------
+    max_size : int
+        The number of bytes which are kept.
+    live_prefix : str | None
+        If not ``None``, complete lines are printed to stdout with this prefix.
+
+    """
+
+    def __init__(self, max_size: int, live_prefix: str | None = None) -> None:
+        self.max_size = max_size
+        self.live_prefix = live_prefix
+        self.n_bytes = 0
+        self._chunks: deque[bytes] = deque()
+        self._size = 0
+        self._line = b""
+
+    def write(self, data: bytes) -> None:
+        """Add output to the buffer and drop the oldest output if it is full."""
+        if not data:
+            return
+        if self.live_prefix is not None:
+            self._print_lines(data)
+        self.n_bytes += len(data)
+        data = data[-self.max_size :]
+        self._chunks.append(data)
+        self._size += len(data)
+        while self._size - len(self._chunks[0]) >= self.max_size:
+            self._size -= len(self._chunks.popleft())
+
+    def read_from(self, stream: IO[bytes]) -> None:
+        """Read a stream until it is closed."""
+        read = getattr(stream, "read1", stream.read)
+        for chunk in iter(lambda: read(CHUNK_SIZE), b""):
+            self.write(chunk)
+
+    def getvalue(self) -> str:
+        """Return the kept output."""
+        return b"".join(self._chunks)[-self.max_size :].decode(errors="replace")
+
+    def format_tail(self) -> str:
+        """Format the kept output for an error message."""
+        output = self.getvalue().rstrip()
+        if not output:
+            return ""
+        if self.n_bytes > self.max_size:
+            header = f"The last {self.max_size // 1024} KiB of the renderer's output:"
+        else:
+            header = "The output of the renderer:"
+        return f"{header}\n\n{output}"
+
+    def flush(self) -> None:
+        """Print the last incomplete line."""
+        if self.live_prefix is not None and self._line:
+            self._print_line(self._line)
+            self._line = b""
+
+    def _print_lines(self, data: bytes) -> None:
+        *lines, self._line = (self._line + data).split(b"\n")
+        for line in lines:
+            self._print_line(line)
+        if len(self._line) > self.max_size:
+            self.flush()
+
+    def _print_line(self, line: bytes) -> None:
+        text = line.decode(errors="replace").rstrip("\r")
+        sys.stdout.write(f"[{self.live_prefix}] {text}\n")
+        sys.stdout.flush()
+
+
+@contextlib.contextmanager
+def capture_output(
+    max_size: int, live_prefix: str | None = None
+) -> Generator[OutputBuffer, None, None]:
+    """Capture the output of all renderers which are started in the context."""
+    buffer = OutputBuffer(max_size, live_prefix)
+    token = _BUFFER.set(buffer)
+    try:
+        yield buffer
+    finally:
+        _BUFFER.reset(token)
+        buffer.flush()
+
+
+def get_buffer() -> OutputBuffer | None:
+    """Return the buffer which captures the output of the current render."""
+    return _BUFFER.get()
@@ -6,6 +6,7 @@ from pytask import hookimpl
 from pytask_markdown import collect
 from pytask_markdown import config
 from pytask_markdown import execute
+from pytask_markdown import nodes
 from pytask_markdown import parametrize
 
 
@@ -15,4 +16,5 @@ def pytask_add_hooks(pm: PluginManager) -> None:
     pm.register(collect)
     pm.register(config)
     pm.register(execute)
+    pm.register(nodes)
     pm.register(parametrize)
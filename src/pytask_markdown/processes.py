@@ -0,0 +1,137 @@
+"""Run renderers in their own process group and enforce timeouts.
+
+Renderers start child processes. Marp launches Chromium for pdf, png and pptx documents
+and quarto starts kernels for code chunks. If only the renderer is killed, its children
+keep running and hold memory. Therefore, every renderer is started as the leader of a
+new process group, or of a new console process group on Windows, and the whole group is
+terminated if a compilation step times out or pytask is interrupted. The group receives
+``SIGTERM`` first and ``SIGKILL`` after a grace period.
+
+While a compilation step runs, its deadline is stored in a context variable. All
+commands which are started by the step share the remaining time.
+
+"""
+from __future__ import annotations
+
+import contextlib
+import contextvars
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+from typing import Any
+from typing import Callable
+from typing import Generator
+
+
+GRACE_PERIOD = 5.0
+
+if sys.platform == "win32":  # pragma: no cover
+    NEW_PROCESS_GROUP: dict[str, Any] = {
+        "creationflags": subprocess.CREATE_NEW_PROCESS_GROUP
+    }
+else:
+    NEW_PROCESS_GROUP: dict[str, Any] = {"start_new_session": True}
+
+_DEADLINE: contextvars.ContextVar[float | None] = contextvars.ContextVar(
+    "_DEADLINE", default=None
+)
+
+
+@contextlib.contextmanager
+def deadline(timeout: float | None) -> Generator[None, None, None]:
+    """Limit the time of all commands which are started in the context."""
+    if timeout is None:
+        yield
+        return
+    token = _DEADLINE.set(time.monotonic() + timeout)
+    try:
+        yield
+    finally:
+        _DEADLINE.reset(token)
+
+
+def get_timeout() -> float | None:
+    """Return the time until the deadline of the current step in seconds."""
+    deadline_ = _DEADLINE.get()
+    if deadline_ is None:
+        return None
+    return max(deadline_ - time.monotonic(), 0.0)
+
+
+def terminate_process_group(pid: int, wait: Callable[[float], Any]) -> None:
+    """Terminate a process group.
+
+    Parameters
+    ----------
+    pid : int
+        The id of the process which leads the group.
+    wait : Callable[[float], Any]
+        A function which waits at most the given number of seconds for the leader of
+        the group to exit. Processes which are left afterwards are killed.
+
+    """
+    signal_process_group(pid, force=False)
+    wait(GRACE_PERIOD)
+    signal_process_group(pid, force=True)
+
+
+def wait_for_process(process: subprocess.Popen[Any], timeout: float) -> None:
+    """Wait for a process and return when it exited or the timeout expired."""
+    with contextlib.suppress(subprocess.TimeoutExpired):
+        process.wait(timeout)
+
+
+class Watchdog:
+    """Terminate a process group when a timeout expires.
+
+    Parameters
+    ----------
+    pid : int
+        The id of the process which leads the group.
+    timeout : float | None
+        The timeout in seconds. If it is ``None``, the group is never terminated.
+
+    """
+
+    def __init__(self, pid: int, timeout: float | None) -> None:
+        self.pid = pid
+        self.timeout = timeout
+        self.expired = False
+        self._exited = threading.Event()
+        self._timer = None
+        if timeout is not None:
+            self._timer = threading.Timer(timeout, self._expire)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _expire(self) -> None:
+        self.expired = True
+        terminate_process_group(self.pid, self._exited.wait)
+
+    def stop(self) -> None:
+        """Stop the watchdog after the process exited."""
+        self._exited.set()
+        if self._timer is not None:
+            self._timer.cancel()
+
+
+def signal_process_group(pid: int, force: bool) -> None:
+    """Ask a process group to terminate or, if ``force`` is true, kill it."""
+    if sys.platform == "win32":  # pragma: no cover
+        if force:
+            subprocess.run(
+                ["taskkill", "/F", "/T", "/PID", str(pid)],
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                check=False,
+            )
+        else:
+            with contextlib.suppress(OSError):
+                os.kill(pid, signal.CTRL_BREAK_EVENT)
+        return
+
+    with contextlib.suppress(ProcessLookupError, PermissionError):
+        os.killpg(pid, signal.SIGKILL if force else signal.SIGTERM)
@@ -0,0 +1,122 @@
+"""Resolve renderer executables and their versions.
+
+The executables of the renderers are looked up on the ``PATH`` once per process and the
+resolved paths are handed to the compilation steps. The versions are needed to
+invalidate stored renders when a renderer is updated. Asking ``marp --version`` or
+``quarto --version`` takes up to a second, so the versions are stored on disk and only
+probed again if the resolved executable or its modification time changes. Renderers
+which run in-process have no executable and the version of their Python package.
+
+"""
+from __future__ import annotations
+
+import importlib.metadata
+import json
+import os
+import shutil
+import subprocess
+from pathlib import Path
+from typing import Any
+
+
+_FILE_NAME = "renderers.json"
+
+IN_PROCESS_RENDERERS = {"python_html": "markdown-it-py"}
+
+_EXECUTABLES: dict[str, str] = {}
+_VERSIONS: dict[str, str] = {}
+
+
+def resolve(renderer: str) -> str | None:
+    """Resolve the executable of a renderer or return ``None`` if it is not found."""
+    if renderer not in _EXECUTABLES:
+        executable = shutil.which(renderer)
+        if executable is None:
+            return None
+        _EXECUTABLES[renderer] = executable
+    return _EXECUTABLES[renderer]
+
+
+def describe(renderer: str, cache_dir: Path | None = None) -> tuple[str | None, str]:
+    """Return the executable and the version of a renderer."""
+    if renderer in IN_PROCESS_RENDERERS:
+        return None, importlib.metadata.version(IN_PROCESS_RENDERERS[renderer])
+    executable = resolve(renderer)
+    if executable is None:
+        return None, "unknown"
+    return executable, get_version(executable, cache_dir)
+
+
+def get_version(executable: str, cache_dir: Path | None = None) -> str:
+    """Get the version of a renderer executable.
+
+    Parameters
+    ----------
+    executable : str
+        The path to the executable.
+    cache_dir : Path | None
+        The directory where probed versions are stored. If it is ``None``, versions are
+        only kept in memory.
+
+    Returns
+    -------
+    str
+        The version or ``"unknown"`` if the executable cannot report it.
+
+    """
+    real_path = os.path.realpath(executable)
+    try:
+        mtime_ns = os.stat(real_path).st_mtime_ns
+    except OSError:
+        return "unknown"
+
+    memory_key = f"{real_path}:{mtime_ns}"
+    if memory_key in _VERSIONS:
+        return _VERSIONS[memory_key]
+
+    path = None if cache_dir is None else cache_dir.joinpath(_FILE_NAME)
+    entries = _read_entries(path)
+    entry = entries.get(real_path)
+    if entry is not None and entry["mtime_ns"] == mtime_ns:
+        version = entry["version"]
+    else:
+        version = _probe_version(executable)
+        entries[real_path] = {"mtime_ns": mtime_ns, "version": version}
+        _write_entries(path, entries)
+
+    _VERSIONS[memory_key] = version
+    return version
+
+
+def clear() -> None:
+    """Forget resolved executables and versions at the end of the session."""
+    _EXECUTABLES.clear()
+    _VERSIONS.clear()
+
+
+def _probe_version(executable: str) -> str:
+    try:
+        process = subprocess.run(
+            [executable, "--version"], capture_output=True, text=True, check=True
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+    return process.stdout.strip() or "unknown"
+
+
+def _read_entries(path: Path | None) -> dict[str, dict[str, Any]]:
+    if path is None:
+        return {}
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_entries(path: Path | None, entries: dict[str, dict[str, Any]]) -> None:
+    if path is None:
+        return
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    tmp.write_text(json.dumps(entries), encoding="utf-8")
+    os.replace(tmp, path)
@@ -0,0 +1,353 @@
+"""Scan markdown documents for files they depend on.
+
+The scanner finds local files referenced by a markdown document, for example images,
+backgrounds set with ``url(...)`` in directives or style blocks, themes and images
+embedded with HTML tags. Remote resources are ignored.
+
+Quarto documents are followed recursively through ``{{< include >}}`` and
+``{{< embed >}}`` shortcodes. The project files ``_quarto.yml`` and ``_metadata.yml``,
+bibliographies and citation styles, and files read by code chunks are dependencies as
+well.
+
+Parsing thousands of documents on every run is slow. The direct references and includes
+of every file are stored in a :class:`ParseIndex` on disk and are reused as long as the
+size and modification time of the file do not change. The include graph is rebuilt
+from the index and only changed files are parsed again.
+
+"""
+from __future__ import annotations
+
+import json
+import os
+import re
+from pathlib import Path
+from typing import Any
+from typing import TypeVar
+from urllib.parse import unquote
+
+
+_FENCED_CODE_BLOCK = re.compile(r"^(`{3,}|~{3,}).*?^\1[ \t]*$", re.M | re.S)
+_MARKDOWN_IMAGE = re.compile(r"!\[[^\]]*\]\(\s*<?([^)\s>]+)>?(?:\s+[\"'(][^)]*)?\)")
+_CSS_URL = re.compile(r"url\(\s*[\"']?([^\"')]+?)[\"']?\s*\)")
+_HTML_SOURCE = re.compile(
+    r"<(?:img|source|video|audio)\b[^>]*?\bsrc\s*=\s*[\"']([^\"']+)[\"']", re.I
+)
+_THEME_DIRECTIVE = re.compile(r"^(?:\s*<!--)?\s*theme\s*:\s*([^\s>]+)", re.M)
+_SCHEME = re.compile(r"^[a-zA-Z][a-zA-Z0-9+.-]*:")
+
+_SHORTCODE = re.compile(r"\{\{<\s*(include|embed)\s+([^\s>]+)[^>]*>\}\}")
+_FRONT_MATTER = re.compile(r"\A\s*---[ \t]*\n(.*?)^(?:---|\.\.\.)[ \t]*$", re.M | re.S)
+_YAML_FILE_KEY = re.compile(
+    r"^[ \t]*(?:bibliography|csl)[ \t]*:[ \t]*(.*)\n((?:[ \t]*-[ \t].*\n?)*)", re.M
+)
+_CODE_CHUNK = re.compile(
+    r"^(`{3,})[ \t]*\{[a-zA-Z]+[^}]*\}[ \t]*\n(.*?)^\1[ \t]*$", re.M | re.S
+)
+_STRING_WITH_FILE_SUFFIX = re.compile(r"[\"']([^\"'\n]+\.[a-zA-Z0-9]{1,5})[\"']")
+_CALL_NAME = re.compile(r"([A-Za-z_][\w.$]*)\s*$")
+_WRITING_CALL = re.compile(r"^(?:save|write|to_|export|dump|ggsave|sink)", re.I)
+_OPEN_FOR_WRITING = re.compile(r"\s*,\s*(?:mode\s*=\s*)?[\"'][rbt+]*[wax]")
+
+_MARKDOWN_SUFFIXES = (".md", ".qmd", ".markdown")
+_PROJECT_FILES = ("_quarto.yml", "_quarto.yaml")
+_METADATA_FILES = ("_metadata.yml", "_metadata.yaml")
+
+
+_T = TypeVar("_T", bound="FileIndex")
+
+
+class FileIndex:
+    """An index of values derived from files which is stored on disk.
+
+    An entry is valid as long as the size and the modification time of the file match.
+    Subclasses define the values of the entries and bump :attr:`version` when they
+    change.
+
+    Parameters
+    ----------
+    path : Path | None
+        The path to the file which stores the index. If it is ``None``, the index is
+        only kept in memory.
+
+    """
+
+    version = 1
+
+    def __init__(self, path: Path | None = None) -> None:
+        self.path = path
+        self.entries: dict[str, dict[str, Any]] = {}
+        self._changed = False
+
+    @classmethod
+    def from_path(cls: type[_T], path: Path) -> _T:
+        """Load the index from a file."""
+        index = cls(path)
+        try:
+            content = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return index
+        if content.get("version") == cls.version:
+            index.entries = content["entries"]
+        return index
+
+    def get_entry(self, path: Path, stat: os.stat_result) -> dict[str, Any] | None:
+        """Get the entry of a file if it is still valid."""
+        entry = self.entries.get(path.as_posix())
+        if (
+            entry is not None
+            and entry["size"] == stat.st_size
+            and entry["mtime_ns"] == stat.st_mtime_ns
+        ):
+            return entry
+        return None
+
+    def set_entry(self, path: Path, stat: os.stat_result, **values: Any) -> None:
+        """Store the values of a file."""
+        self.entries[path.as_posix()] = {
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            **values,
+        }
+        self._changed = True
+
+    def save(self) -> None:
+        """Write the index to disk if it changed."""
+        if self.path is None or not self._changed:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        tmp.write_text(
+            json.dumps({"version": self.version, "entries": self.entries}),
+            encoding="utf-8",
+        )
+        os.replace(tmp, self.path)
+        self._changed = False
+
+
+class ParseIndex(FileIndex):
+    """An index of the references found in documents which is stored on disk."""
+
+    version = 3
+
+    def get(
+        self, path: Path, stat: os.stat_result
+    ) -> tuple[list[str], list[str]] | None:
+        """Get the references and includes of a file if its entry is still valid."""
+        entry = self.get_entry(path, stat)
+        if entry is None:
+            return None
+        return entry["references"], entry["includes"]
+
+    def set(
+        self,
+        path: Path,
+        stat: os.stat_result,
+        references: list[str],
+        includes: list[str],
+    ) -> None:
+        """Store the references and includes of a file."""
+        self.set_entry(path, stat, references=references, includes=includes)
+
+
+def scan(
+    path: Path, index: ParseIndex | None = None, quarto: bool = False
+) -> list[Path]:
+    """Scan a markdown document for files it depends on.
+
+    Parameters
+    ----------
+    path : Path
+        The path to the markdown document.
+    index : ParseIndex | None
+        An index with the results of previous scans.
+    quarto : bool
+        Whether the document is rendered with quarto. Then, the project and metadata
+        files which apply to the document are dependencies as well.
+
+    Returns
+    -------
+    list[Path]
+        The paths of referenced local files. The files do not need to exist.
+
+    """
+    dependencies: dict[Path, None] = {}
+    queue = [path]
+    if quarto:
+        project_files = _find_project_files(path.parent)
+        dependencies.update(dict.fromkeys(project_files))
+        queue += project_files
+
+    visited = set(queue)
+    while queue:
+        references, includes = _get_references(queue.pop(0), index)
+        dependencies.update(dict.fromkeys(Path(i) for i in references))
+        for include in map(Path, includes):
+            dependencies[include] = None
+            if include not in visited:
+                visited.add(include)
+                queue.append(include)
+
+    dependencies.pop(path, None)
+    return list(dependencies)
+
+
+def _get_references(
+    path: Path, index: ParseIndex | None
+) -> tuple[list[str], list[str]]:
+    """Get the references and includes of a file from the index or by parsing it."""
+    try:
+        stat = path.stat()
+    except OSError:
+        return [], []
+
+    result = None if index is None else index.get(path, stat)
+    if result is None:
+        if path.name in _PROJECT_FILES + _METADATA_FILES:
+            text = path.read_text(encoding="utf-8", errors="replace")
+            references = _parse_yaml_files(text, path.parent)
+            includes: list[Path] = []
+        elif path.suffix in _MARKDOWN_SUFFIXES:
+            text = path.read_text(encoding="utf-8", errors="replace")
+            references, includes = _parse_markdown(text, path.parent)
+        else:
+            references, includes = [], []
+        result = (
+            [p.as_posix() for p in references],
+            [p.as_posix() for p in includes],
+        )
+        if index is not None:
+            index.set(path, stat, *result)
+    return result
+
+
+def _parse_markdown(text: str, root: Path) -> tuple[list[Path], list[Path]]:
+    """Parse the references and includes of a markdown document."""
+    front_matter = _FRONT_MATTER.match(text)
+    chunks = [code for _, code in _CODE_CHUNK.findall(text)]
+    text = _FENCED_CODE_BLOCK.sub("", text)
+
+    candidates = [
+        *_MARKDOWN_IMAGE.findall(text),
+        *_CSS_URL.findall(text),
+        *_HTML_SOURCE.findall(text),
+    ]
+    paths = [path for c in candidates if (path := _to_local_path(c, root))]
+
+    # Themes are referenced by name. They are only a dependency if a css file with the
+    # same name lies next to the document.
+    for theme in _THEME_DIRECTIVE.findall(text):
+        for suffix in ("", ".css", ".scss"):
+            path = _to_local_path(theme + suffix, root)
+            if path is not None and path.is_file():
+                paths.append(path)
+                break
+
+    if front_matter is not None:
+        paths += _parse_yaml_files(front_matter.group(1), root)
+
+    # Files read by code chunks are only guessed from string literals and are later
+    # filtered by whether they exist or are produced by a task.
+    for code in chunks:
+        candidates = [
+            match.group(1)
+            for match in _STRING_WITH_FILE_SUFFIX.finditer(code)
+            if not _is_written(code, match)
+        ]
+        paths += [path for c in candidates if (path := _to_local_path(c, root))]
+
+    includes = []
+    for kind, target in _SHORTCODE.findall(text):
+        path = _to_local_path(target, root)
+        if path is None:
+            continue
+        if kind == "include" or path.suffix in _MARKDOWN_SUFFIXES:
+            includes.append(path)
+        else:
+            paths.append(path)
+
+    return list(dict.fromkeys(paths)), list(dict.fromkeys(includes))
+
+
+def _is_written(code: str, match: re.Match[str]) -> bool:
+    """Check whether a string literal is the path of a file written by code.
+
+    The literal is written if it is passed to a call like ``savefig``, ``to_csv``,
+    ``write.csv`` or ``ggsave``, or to ``open`` with a mode for writing.
+
+    Examples
+    --------
+    >>> code = 'plt.savefig("fig.png"); open("out.txt", "w"); read("in.csv")'
+    >>> [_is_written(code, m) for m in _STRING_WITH_FILE_SUFFIX.finditer(code)]
+    [True, True, False]
+
+    """
+    depth = 0
+    for position in range(match.start() - 1, -1, -1):
+        char = code[position]
+        if char == ")":
+            depth += 1
+        elif char == "(" and depth:
+            depth -= 1
+        elif char == "(":
+            call = _CALL_NAME.search(code, 0, position)
+            if call is None:
+                return False
+            name = re.split(r"[.$]", call.group(1))[-1]
+            if name == "open":
+                return _OPEN_FOR_WRITING.match(code, match.end()) is not None
+            return _WRITING_CALL.match(name) is not None or call.group(
+                1
+            ).lower().startswith("write.")
+        elif char == ";" and not depth:
+            return False
+    return False
+
+
+def _parse_yaml_files(text: str, root: Path) -> list[Path]:
+    """Parse bibliographies and citation styles from YAML."""
+    values = []
+    for value, items in _YAML_FILE_KEY.findall(text):
+        value = value.split(" #")[0].strip()
+        if value.startswith("[") and value.endswith("]"):
+            values += value[1:-1].split(",")
+        elif value:
+            values.append(value)
+        values += [item.strip()[1:] for item in items.splitlines()]
+
+    paths = [_to_local_path(value.strip().strip("\"'"), root) for value in values]
+    return [path for path in paths if path is not None]
+
+
+def _find_project_files(directory: Path) -> list[Path]:
+    """Find the quarto project and metadata files which apply to a directory.
+
+    Metadata files are collected from the directory upwards until the directory with
+    the project file is found. Without a project, metadata files do not apply.
+
+    """
+    metadata_files = []
+    for candidate in (directory, *directory.parents):
+        metadata_files += [
+            path
+            for name in _METADATA_FILES
+            if (path := candidate.joinpath(name)).is_file()
+        ]
+        project_files = [
+            path
+            for name in _PROJECT_FILES
+            if (path := candidate.joinpath(name)).is_file()
+        ]
+        if project_files:
+            return project_files + metadata_files
+    return []
+
+
+def _to_local_path(reference: str, root: Path) -> Path | None:
+    """Convert a reference to a path or return ``None`` for remote resources."""
+    reference = reference.strip()
+    if not reference or reference.startswith(("#", "//")) or _SCHEME.match(reference):
+        return None
+    reference = unquote(reference.split("#")[0].split("?")[0])
+    if not reference:
+        return None
+    return Path(os.path.normpath(root / reference))
@@ -0,0 +1,399 @@
+"""Render the slides of a marp deck to images incrementally.
+
+With ``--images``, marp converts every slide of a deck into a numbered image like
+``deck.001.png``. In the incremental mode, the deck is split at the slide boundaries and
+every slide gets a hash of its content and of its context, meaning the front matter,
+global directives and style blocks of the deck and the local directives inherited from
+previous slides. The hashes of the last render are stored next to the document.
+
+The hash of a slide also covers the content of the dependencies of the task, like
+images, which the slide, its front matter or its directives mention by path or name.
+Dependencies which no slide mentions are part of the hash of every slide.
+
+Only slides whose hash changed are converted again. They are put into a smaller deck
+with the same front matter and global directives, and the inherited local directives
+are repeated at the top of every slide. Images of slides which only moved are reused.
+
+The whole deck is rendered if there is no record of the last render, if page numbers
+are shown with ``paginate`` or slides are split at headings with ``headingDivider``, or
+if marp produced a different number of images than there are slides.
+
+"""
+from __future__ import annotations
+
+import functools
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Callable
+from typing import Iterable
+from typing import NamedTuple
+
+from markdown_it import MarkdownIt
+from pytask_markdown.utils import hash_file
+
+
+FRONT_MATTER = re.compile(
+    r"\A\s*---[ \t]*\n(.*?)^(?:---|\.\.\.)[ \t]*$\n?", re.M | re.S
+)
+
+_COMMENT = re.compile(r"<!--(.*?)-->", re.S)
+_DIRECTIVE = re.compile(r"^\s*(_?)([A-Za-z]+)\s*:", re.M)
+_SPOT_DIRECTIVE_LINE = re.compile(r"^\s*_[A-Za-z]+\s*:.*$\n?", re.M)
+
+_GLOBAL_DIRECTIVES = frozenset(
+    (
+        "theme",
+        "style",
+        "headingDivider",
+        "lang",
+        "size",
+        "math",
+        "title",
+        "description",
+        "author",
+        "image",
+        "keywords",
+        "url",
+        "marp",
+    )
+)
+_LOCAL_DIRECTIVES = frozenset(
+    (
+        "paginate",
+        "header",
+        "footer",
+        "class",
+        "backgroundColor",
+        "backgroundImage",
+        "backgroundPosition",
+        "backgroundRepeat",
+        "backgroundSize",
+        "color",
+        "transition",
+    )
+)
+_UNSUPPORTED_DIRECTIVES = frozenset(("paginate", "headingDivider"))
+
+_SEPARATOR = "\n\n---\n\n"
+
+
+class Deck(NamedTuple):
+    """A deck split into its parts."""
+
+    front_matter: str
+    global_context: str
+    slides: list[str]
+    inherited_contexts: list[str]
+    supported: bool
+
+
+def split_deck(text: str) -> Deck:
+    """Split a deck into the front matter, the slides and their contexts.
+
+    Examples
+    --------
+    >>> deck = split_deck("# One\\n\\n---\\n\\n<!-- class: lead -->\\n# Two\\n")
+    >>> deck.slides
+    ['# One\\n', '<!-- class: lead -->\\n# Two\\n']
+    >>> deck.inherited_contexts
+    ['', '']
+
+    """
+    match = FRONT_MATTER.match(text)
+    front_matter = "" if match is None else match.group(0)
+    body = text[len(front_matter) :]
+    lines = body.splitlines(keepends=True)
+
+    boundaries = [0]
+    slide_of_line = [0] * (len(lines) + 1)
+    comments: list[tuple[int, str]] = []
+    styles: list[str] = []
+    for token in _get_parser().parse(body):
+        if token.map is None:
+            continue
+        start = token.map[0]
+        if token.type == "hr" and token.level == 0:
+            boundaries.append(start)
+        elif token.type == "html_block":
+            comments.extend((start, c) for c in _COMMENT.findall(token.content))
+            if token.content.lstrip().startswith("<style") and (
+                "scoped" not in token.content.split(">", 1)[0]
+            ):
+                styles.append(token.content)
+        elif token.type == "inline":
+            comments.extend(
+                (start, c)
+                for child in token.children or []
+                if child.type == "html_inline"
+                for c in _COMMENT.findall(child.content)
+            )
+
+    slides = []
+    for i, start in enumerate(boundaries):
+        content_start = start if i == 0 else start + 1
+        end = boundaries[i + 1] if i + 1 < len(boundaries) else len(lines)
+        slides.append("".join(lines[content_start:end]).strip("\n") + "\n")
+        for line in range(start, end):
+            slide_of_line[line] = i
+
+    directives = set(_DIRECTIVE.findall(front_matter))
+    global_comments = []
+    local_comments: list[list[str]] = [[] for _ in slides]
+    for line, comment in comments:
+        keys = _DIRECTIVE.findall(comment)
+        directives.update(keys)
+        if any(name in _GLOBAL_DIRECTIVES for _, name in keys):
+            global_comments.append(f"<!--{comment}-->")
+        if any(not spot and name in _LOCAL_DIRECTIVES for spot, name in keys):
+            local = _SPOT_DIRECTIVE_LINE.sub("", comment)
+            local_comments[slide_of_line[line]].append(f"<!--{local}-->")
+
+    inherited_contexts = []
+    inherited: list[str] = []
+    for comments_of_slide in local_comments:
+        inherited_contexts.append("\n".join(inherited))
+        inherited.extend(comments_of_slide)
+
+    supported = not any(name in _UNSUPPORTED_DIRECTIVES for _, name in directives)
+    global_context = "\n".join(global_comments + styles)
+    return Deck(front_matter, global_context, slides, inherited_contexts, supported)
+
+
+def render_slides(
+    path_to_md: Path,
+    path_to_document: Path,
+    key: str,
+    convert: Callable[[Path, Path], None],
+    paths_to_dependencies: Iterable[Path] = (),
+) -> None:
+    """Render the slides of a deck to numbered images and skip unchanged slides.
+
+    Parameters
+    ----------
+    path_to_md : Path
+        The path to the deck.
+    path_to_document : Path
+        The path to the document. The slides are written to numbered images next to it
+        and the document is a copy of the first slide.
+    key : str
+        A key of everything else which affects all slides, like the options and the
+        theme set.
+    convert : Callable[[Path, Path], None]
+        A function which converts a deck to numbered images named after the output.
+    paths_to_dependencies : Iterable[Path]
+        The paths to other dependencies of the deck like images.
+
+    """
+    deck = split_deck(path_to_md.read_text(encoding="utf-8"))
+    hashes = [
+        _hash(key, deck.front_matter, deck.global_context, context, slide, *assets)
+        for context, slide, assets in zip(
+            deck.inherited_contexts,
+            deck.slides,
+            _hash_assets(deck, path_to_md, paths_to_dependencies),
+        )
+    ]
+    path_to_manifest = get_path_to_manifest(path_to_document)
+    old_hashes = _read_manifest(path_to_manifest) if deck.supported else []
+
+    if not old_hashes or not _render_changed_slides(
+        deck, hashes, old_hashes, path_to_md, path_to_document, convert
+    ):
+        _render_deck(path_to_md, path_to_document, hashes, convert)
+
+    if get_path_to_slide(path_to_document, 1).exists():
+        shutil.copyfile(get_path_to_slide(path_to_document, 1), path_to_document)
+
+
+def get_path_to_slide(path_to_document: Path, number: int) -> Path:
+    """Get the path to the image of a slide like marp names it."""
+    return path_to_document.with_name(
+        f"{path_to_document.stem}.{number:03d}{path_to_document.suffix}"
+    )
+
+
+def get_path_to_manifest(path_to_document: Path) -> Path:
+    """Get the path to the hashes of the slides of the last render."""
+    return path_to_document.with_name(f".{path_to_document.stem}.slides.json")
+
+
+def _render_deck(
+    path_to_md: Path,
+    path_to_document: Path,
+    hashes: list[str],
+    convert: Callable[[Path, Path], None],
+) -> None:
+    """Render the whole deck and record the hashes of the slides."""
+    path_to_manifest = get_path_to_manifest(path_to_document)
+    path_to_manifest.unlink(missing_ok=True)
+    convert(path_to_md, path_to_document)
+
+    n_images = _remove_stale_slides(path_to_document, len(hashes))
+    if n_images == len(hashes):
+        _write_manifest(path_to_manifest, hashes)
+
+
+def _render_changed_slides(
+    deck: Deck,
+    hashes: list[str],
+    old_hashes: list[str],
+    path_to_md: Path,
+    path_to_document: Path,
+    convert: Callable[[Path, Path], None],
+) -> bool:
+    """Render only the slides which changed and return whether it succeeded."""
+    old_numbers: dict[str, int] = {}
+    for number, hash_ in enumerate(old_hashes, start=1):
+        if get_path_to_slide(path_to_document, number).exists():
+            old_numbers.setdefault(hash_, number)
+
+    moves = {}
+    changed = []
+    for number, hash_ in enumerate(hashes, start=1):
+        old_number = old_numbers.get(hash_)
+        if old_number is None:
+            changed.append(number)
+        elif old_number != number:
+            moves[number] = old_number
+
+    if len(changed) == len(hashes):
+        return False
+
+    path_to_manifest = get_path_to_manifest(path_to_document)
+    scratch = Path(tempfile.mkdtemp(dir=path_to_document.parent, prefix=".slides-"))
+    try:
+        if changed:
+            partial_md = path_to_md.with_name(f".{path_to_md.stem}.partial.md")
+            partial_md.write_text(
+                _create_partial_deck(deck, [n - 1 for n in changed]), encoding="utf-8"
+            )
+            try:
+                convert(partial_md, scratch / path_to_document.name)
+            finally:
+                partial_md.unlink(missing_ok=True)
+            rendered = sorted(
+                scratch.glob(f"{path_to_document.stem}.*{path_to_document.suffix}")
+            )
+            if len(rendered) != len(changed):
+                return False
+
+        # The record is removed while images are moved such that an interrupted render
+        # does not leave a record of images which do not exist.
+        path_to_manifest.unlink(missing_ok=True)
+        # Images are copied since identical slides share the image of the last render.
+        staged = {}
+        for number, old_number in moves.items():
+            staged[number] = scratch / f"moved.{number}"
+            shutil.copyfile(
+                get_path_to_slide(path_to_document, old_number), staged[number]
+            )
+        for number, path in staged.items():
+            os.replace(path, get_path_to_slide(path_to_document, number))
+        for i, number in enumerate(changed, start=1):
+            os.replace(
+                get_path_to_slide(scratch / path_to_document.name, i),
+                get_path_to_slide(path_to_document, number),
+            )
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    _remove_stale_slides(path_to_document, len(hashes))
+    _write_manifest(path_to_manifest, hashes)
+    return True
+
+
+def _create_partial_deck(deck: Deck, indices: list[int]) -> str:
+    """Create a deck with the given slides and their context."""
+    slides = []
+    for i in indices:
+        context = deck.inherited_contexts[i]
+        slides.append(f"{context}\n\n{deck.slides[i]}" if context else deck.slides[i])
+    if deck.global_context:
+        slides[0] = f"{deck.global_context}\n\n{slides[0]}"
+    return deck.front_matter + _SEPARATOR.join(slides)
+
+
+def _remove_stale_slides(path_to_document: Path, n_slides: int) -> int:
+    """Remove images of slides beyond the end of the deck and count the others."""
+    pattern = re.compile(
+        re.escape(path_to_document.stem)
+        + r"\.(\d{3,})"
+        + re.escape(path_to_document.suffix)
+    )
+    n_images = 0
+    for path in path_to_document.parent.iterdir():
+        match = pattern.fullmatch(path.name)
+        if match is None:
+            continue
+        if int(match.group(1)) > n_slides:
+            path.unlink()
+        else:
+            n_images += 1
+    return n_images
+
+
+def _hash_assets(
+    deck: Deck, path_to_md: Path, paths_to_dependencies: Iterable[Path]
+) -> list[list[str]]:
+    """Hash the dependencies which are mentioned by each slide.
+
+    A dependency is mentioned if its path relative to the deck or its name occurs in
+    the slide or its context.
+
+    """
+    digests = {}
+    for path in sorted(set(paths_to_dependencies) - {path_to_md}):
+        if path.is_file():
+            relative = os.path.relpath(path, path_to_md.parent).replace(os.sep, "/")
+            digests[(relative, path.name)] = hash_file(path)
+
+    texts = [
+        "\n".join((deck.front_matter, deck.global_context, context, slide))
+        for context, slide in zip(deck.inherited_contexts, deck.slides)
+    ]
+    mentioned = [
+        [
+            f"{relative}:{digest}"
+            for (relative, name), digest in digests.items()
+            if relative in text or name in text
+        ]
+        for text in texts
+    ]
+    unmentioned = [
+        f"{relative}:{digest}"
+        for (relative, name), digest in digests.items()
+        if not any(relative in text or name in text for text in texts)
+    ]
+    return [unmentioned + assets for assets in mentioned]
+
+
+def _hash(*parts: str) -> str:
+    hash_ = hashlib.sha256()
+    for part in parts:
+        hash_.update(part.encode())
+        hash_.update(b"\0")
+    return hash_.hexdigest()
+
+
+def _read_manifest(path: Path) -> list[str]:
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return []
+
+
+def _write_manifest(path: Path, hashes: list[str]) -> None:
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    tmp.write_text(json.dumps(hashes), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+@functools.lru_cache(maxsize=None)
+def _get_parser() -> MarkdownIt:
+    """Create the markdown parser once per process."""
+    return MarkdownIt("commonmark")
@@ -0,0 +1,205 @@
+"""Fingerprint markdown scripts by their normalized content.
+
+pytask executes a task again whenever the modification time of its script changes,
+even if the edit cannot change the document. If the normalization of sources is
+enabled, the state of a script is the hash of a normalized form of its content.
+
+The normalization is configurable:
+
+- ``"whitespace"`` removes trailing whitespace from lines, except two spaces which mark
+  a hard line break, collapses runs of blank lines and unifies line endings.
+- ``"comments"`` removes HTML comments. Comments which look like marp directives, for
+  example ``<!-- paginate: true -->``, are kept. Scripts which marp renders to
+  documents with speaker notes keep all comments since the notes are comments.
+- ``"notes"`` removes speaker notes from scripts which are only rendered to pdf or png
+  documents. Speaker notes are HTML comments in marp and ``::: notes`` divs in quarto.
+
+Fenced code blocks and the front matter are never changed.
+
+Reading and hashing thousands of scripts on every run is slow. The fingerprints are
+stored in a :class:`SourceIndex` on disk and are reused as long as the size and
+modification time of the script do not change.
+
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import re
+from pathlib import Path
+from typing import Iterable
+
+from pytask_markdown.scanner import FileIndex
+
+
+NORMALIZERS = frozenset(("whitespace", "comments", "notes"))
+
+_CODE_FENCE = re.compile(r"^[ \t]{0,3}(`{3,}|~{3,})")
+_FRONT_MATTER_END = re.compile(r"^(---|\.\.\.)[ \t]*$")
+_DIV_FENCE = re.compile(r"^[ \t]*:{3,}(.*)$")
+_NOTES_DIV = re.compile(r"^[ \t]*:{3,}[ \t]*(?:notes|\{[^}]*\.notes\b[^}]*\})[ \t]*$")
+_COMMENT = re.compile(
+    r"^[ \t]*<!--((?:(?!-->).)*)-->[ \t]*(?:\n|\Z)|<!--(.*?)-->", re.M | re.S
+)
+_DIRECTIVE = re.compile(r"^[ \t]*_?[A-Za-z][\w-]*[ \t]*:")
+
+
+class SourceIndex(FileIndex):
+    """An index of the fingerprints of scripts which is stored on disk.
+
+    An entry is only valid if the normalization matches as well.
+
+    """
+
+    version = 1
+
+    def get(self, path: Path, stat: os.stat_result, normalization: str) -> str | None:
+        """Get the fingerprint of a script if its entry is still valid."""
+        entry = self.get_entry(path, stat)
+        if entry is None or entry["normalization"] != normalization:
+            return None
+        return entry["fingerprint"]
+
+    def set(
+        self, path: Path, stat: os.stat_result, normalization: str, fingerprint: str
+    ) -> None:
+        """Store the fingerprint of a script."""
+        self.set_entry(path, stat, normalization=normalization, fingerprint=fingerprint)
+
+
+_INDEXES: dict[Path, SourceIndex] = {}
+
+
+def get_index(path: Path) -> SourceIndex:
+    """Get the index stored at a path which is loaded once per process."""
+    if path not in _INDEXES:
+        _INDEXES[path] = SourceIndex.from_path(path)
+    return _INDEXES[path]
+
+
+def save_indexes() -> None:
+    """Write all loaded indexes which changed to disk."""
+    for index in _INDEXES.values():
+        index.save()
+
+
+def fingerprint(path: Path, normalizers: Iterable[str], index: SourceIndex) -> str:
+    """Compute the fingerprint of the normalized content of a script."""
+    normalization = ",".join(sorted(normalizers))
+    stat = path.stat()
+    fingerprint_ = index.get(path, stat, normalization)
+    if fingerprint_ is None:
+        text = path.read_text(encoding="utf-8", errors="surrogateescape")
+        normalized = normalize(text, normalizers)
+        fingerprint_ = hashlib.sha256(
+            normalized.encode("utf-8", errors="surrogateescape")
+        ).hexdigest()
+        index.set(path, stat, normalization, fingerprint_)
+    return fingerprint_
+
+
+def normalize(text: str, normalizers: Iterable[str]) -> str:
+    """Normalize the content of a markdown script.
+
+    Examples
+    --------
+    >>> text = "# Title  \\n\\n\\n<!-- todo -->\\nText \\n"
+    >>> normalize(text, ["whitespace", "comments"])
+    '# Title  \\n\\nText\\n'
+    >>> normalize("<!-- _class: lead -->\\n# Title\\n", ["comments"])
+    '<!-- _class: lead -->\\n# Title\\n'
+
+    """
+    normalizers = frozenset(normalizers)
+    if "whitespace" in normalizers:
+        text = text.replace("\r\n", "\n")
+
+    parts = []
+    for is_code, block in _split_blocks(text, drop_notes="notes" in normalizers):
+        if not is_code:
+            if normalizers & {"comments", "notes"}:
+                block = _COMMENT.sub(_remove_comment, block)
+            if "whitespace" in normalizers:
+                block = _normalize_whitespace(block)
+        parts.append(block)
+    text = "".join(parts)
+
+    if "whitespace" in normalizers:
+        text = text.rstrip() + "\n"
+    return text
+
+
+def _split_blocks(text: str, drop_notes: bool) -> list[tuple[bool, str]]:
+    """Split a script into prose and verbatim blocks and drop quarto's notes.
+
+    The front matter and fenced code blocks are verbatim.
+
+    """
+    blocks: list[tuple[bool, list[str]]] = []
+
+    def _append(is_code: bool, line: str) -> None:
+        if blocks and blocks[-1][0] is is_code:
+            blocks[-1][1].append(line)
+        else:
+            blocks.append((is_code, [line]))
+
+    lines = text.splitlines(keepends=True)
+    start = 0
+    if lines and lines[0].rstrip() == "---":
+        for i, line in enumerate(lines[1:], start=1):
+            if _FRONT_MATTER_END.match(line):
+                for front_matter_line in lines[: i + 1]:
+                    _append(True, front_matter_line)
+                start = i + 1
+                break
+
+    fence = None
+    notes_depth = 0
+    for line in lines[start:]:
+        if fence is not None:
+            stripped = line.strip()
+            if stripped.startswith(fence) and not stripped.strip(fence[0]):
+                fence = None
+            if not notes_depth:
+                _append(True, line)
+            continue
+
+        match = _CODE_FENCE.match(line)
+        if match:
+            fence = match.group(1)
+            if not notes_depth:
+                _append(True, line)
+        elif notes_depth:
+            div = _DIV_FENCE.match(line)
+            if div:
+                notes_depth += 1 if div.group(1).strip() else -1
+        elif drop_notes and _NOTES_DIV.match(line):
+            notes_depth = 1
+        else:
+            _append(False, line)
+
+    return [(is_code, "".join(block)) for is_code, block in blocks]
+
+
+def _remove_comment(match: re.Match[str]) -> str:
+    """Remove an HTML comment unless it is a marp directive."""
+    body = match.group(1) if match.group(1) is not None else match.group(2)
+    lines = [line for line in body.strip().splitlines() if line.strip()]
+    if lines and all(_DIRECTIVE.match(line) for line in lines):
+        return match.group(0)
+    return ""
+
+
+def _normalize_whitespace(block: str) -> str:
+    """Remove trailing whitespace and collapse blank lines of a prose block."""
+    lines = []
+    previous_is_blank = False
+    for line in block.splitlines(keepends=True):
+        stripped = line.rstrip(" \t\n")
+        if not stripped and previous_is_blank:
+            continue
+        if stripped and line[len(stripped) :].count(" ") >= 2:  # noqa: PLR2004
+            stripped += "  "
+        lines.append(stripped + "\n" if line.endswith("\n") else stripped)
+        previous_is_blank = not stripped
+    return "".join(lines)
@@ -0,0 +1,126 @@
+"""Limit the number of heavy renders which run at the same time.
+
+Converting documents to pdf, pptx and png with marp launches a headless Chromium and
+quarto documents with code chunks start a kernel. Both need far more memory than
+rendering html. With many workers of pytask-parallel, too many of these renders start
+at once and the machine begins to swap.
+
+Markdown tasks are classified as heavy or light during the collection. Heavy renders
+take a token from a pool which is shared by all processes of the session before they
+start. The tokens are files in the cache directory which are locked with ``flock`` or
+``msvcrt.locking``. The locks are released by the operating system if a process dies.
+Light renders do not need a token.
+
+"""
+from __future__ import annotations
+
+import contextlib
+import random
+import re
+import sys
+import time
+from pathlib import Path
+from typing import Any
+from typing import BinaryIO
+from typing import Callable
+from typing import Generator
+from typing import Sequence
+
+if sys.platform == "win32":  # pragma: no cover
+    import msvcrt
+else:
+    import fcntl
+
+
+HEAVY_SUFFIXES = frozenset((".pdf", ".pptx", ".png"))
+
+_EXECUTABLE_CHUNK = re.compile(r"^[ \t]*```+[ \t]*\{[A-Za-z]", re.M)
+
+_MAX_DELAY = 0.5
+
+
+class TokenPool:
+    """A pool of tokens which is shared by processes.
+
+    Parameters
+    ----------
+    path : Path
+        The directory of the lock files.
+    n_tokens : int
+        The number of tokens.
+
+    """
+
+    def __init__(self, path: Path, n_tokens: int) -> None:
+        self.path = path
+        self.n_tokens = n_tokens
+
+    @contextlib.contextmanager
+    def acquire(self) -> Generator[int, None, None]:
+        """Wait for a free token and hold it in the context."""
+        self.path.mkdir(parents=True, exist_ok=True)
+        delay = 0.01
+        while True:
+            # Start at a random token such that waiting processes spread over tokens.
+            offset = random.randrange(self.n_tokens)  # noqa: S311
+            for i in range(self.n_tokens):
+                token = (offset + i) % self.n_tokens
+                with self.path.joinpath(f"token-{token}.lock").open("a+b") as f:
+                    if _try_lock(f):
+                        try:
+                            yield token
+                        finally:
+                            _unlock(f)
+                        return
+            time.sleep(delay)
+            delay = min(delay * 2, _MAX_DELAY)
+
+
+def is_heavy(
+    compilation_steps: Sequence[Callable[..., Any]],
+    path_to_md: Path,
+    paths_to_documents: Sequence[Path],
+) -> bool:
+    """Check whether the render of a task launches a browser or a kernel.
+
+    Marp is heavy if it converts to pdf, pptx or images. Quarto is heavy if the script
+    has executable code chunks and execution is not disabled. A script which cannot be
+    read yet is assumed to have code chunks.
+
+    """
+    for step in compilation_steps:
+        options = getattr(step, "options", ())
+        if step.__name__ == "run_marp" and (
+            any(path.suffix in HEAVY_SUFFIXES for path in paths_to_documents)
+            or any(opt.startswith("--image") for opt in options)
+        ):
+            return True
+        if step.__name__ == "run_quarto" and "--no-execute" not in options:
+            try:
+                text = path_to_md.read_text(encoding="utf-8")
+            except OSError:
+                return True
+            if _EXECUTABLE_CHUNK.search(text):
+                return True
+    return False
+
+
+def _try_lock(f: BinaryIO) -> bool:
+    """Lock a file without blocking and return whether it succeeded."""
+    try:
+        if sys.platform == "win32":  # pragma: no cover
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+        else:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        return False
+    return True
+
+
+def _unlock(f: BinaryIO) -> None:
+    if sys.platform == "win32":  # pragma: no cover
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+    else:
+        fcntl.flock(f, fcntl.LOCK_UN)
@@ -1,8 +1,30 @@
 from __future__ import annotations
 
+import contextlib
+import hashlib
+import os
+import re
+from collections import defaultdict
+from pathlib import Path
 from typing import Any
+from typing import Generator
+from typing import Iterable
 from typing import Sequence
 
+import networkx as nx
+from pytask import Session
+
+
+_CHUNK_SIZE = 1024**2
+_PREVIOUS_DOCUMENT = re.compile(r"^\.(.+)\.\d+\.previous$")
+
+
+def get_dag(session: Session) -> nx.DiGraph:
+    """Return the DAG of a session which is built before the execution."""
+    if session.dag is None:
+        raise RuntimeError("The DAG of the session is not built yet.")
+    return session.dag
+
 
 def to_list(scalar_or_iter: Any) -> list[Any]:
     """Convert scalars and iterables to list.
@@ -28,3 +50,91 @@ def to_list(scalar_or_iter: Any) -> list[Any]:
         if isinstance(scalar_or_iter, str) or not isinstance(scalar_or_iter, Sequence)
         else list(scalar_or_iter)
     )
+
+
+def hash_file(path: Path) -> str:
+    """Compute the sha256 hash of the content of a file."""
+    hash_ = hashlib.sha256()
+    with path.open("rb") as f:
+        for chunk in iter(lambda: f.read(_CHUNK_SIZE), b""):
+            hash_.update(chunk)
+    return hash_.hexdigest()
+
+
+def have_same_content(path: Path, other: Path) -> bool:
+    """Check whether two files have the same content.
+
+    The sizes are compared first and the contents are read in chunks until the first
+    difference.
+
+    """
+    if path.stat().st_size != other.stat().st_size:
+        return False
+    with path.open("rb") as f, other.open("rb") as g:
+        while True:
+            chunk = f.read(_CHUNK_SIZE)
+            if chunk != g.read(_CHUNK_SIZE):
+                return False
+            if not chunk:
+                return True
+
+
+def move_aside(paths: Iterable[Path]) -> dict[Path, Path]:
+    """Move existing documents aside and return their new paths."""
+    moved = {}
+    for path in paths:
+        if path.exists():
+            moved[path] = path.with_name(f".{path.name}.{os.getpid()}.previous")
+            os.replace(path, moved[path])
+    return moved
+
+
+@contextlib.contextmanager
+def keep_unchanged(previous_documents: dict[Path, Path]) -> Generator[None, None, None]:
+    """Put previous documents back if the render failed or did not change them."""
+    try:
+        yield
+    except BaseException:
+        for path, previous in previous_documents.items():
+            os.replace(previous, path)
+        raise
+
+    for path, previous in previous_documents.items():
+        if path.exists() and have_same_content(path, previous):
+            os.replace(previous, path)
+        else:
+            previous.unlink()
+
+
+def replace_if_changed(source: Path, target: Path) -> None:
+    """Move a file to the target unless the target has the same content.
+
+    An unchanged target is kept with its modification time.
+
+    """
+    if target.exists() and have_same_content(source, target):
+        source.unlink()
+    else:
+        target.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(source, target)
+
+
+def remove_previous_documents(paths: Iterable[Path]) -> None:
+    """Remove documents which were moved aside by processes which died.
+
+    Each directory is scanned once.
+
+    """
+    names_by_directory = defaultdict(set)
+    for path in paths:
+        names_by_directory[path.parent].add(path.name)
+
+    for directory, names in names_by_directory.items():
+        try:
+            entries = list(os.scandir(directory))
+        except OSError:
+            continue
+        for entry in entries:
+            match = _PREVIOUS_DOCUMENT.match(entry.name)
+            if match and match.group(1) in names:
+                Path(entry.path).unlink(missing_ok=True)
@@ -0,0 +1,191 @@
+"""A pool of long-running marp workers.
+
+Every call of the marp CLI boots Node.js and loads marp-cli again which dominates the
+render time of small decks. The pool keeps a few Node.js processes alive which run
+``marp_worker.js`` and render documents through the marp-cli API. Jobs and results are
+exchanged as JSON lines over stdin and stdout. If the output of the render is captured,
+the worker returns what marp logged during the job with the result.
+
+The pool is started by the main pytask process and closed at the end of the session.
+Processes which do not have access to the pool, for example the workers of
+pytask-parallel's process backend, fall back to calling the marp CLI.
+
+"""
+from __future__ import annotations
+
+import itertools
+import json
+import queue
+import shutil
+import subprocess
+from pathlib import Path
+from typing import Any
+
+from pytask_markdown.output import get_buffer
+from pytask_markdown.processes import get_timeout
+from pytask_markdown.processes import NEW_PROCESS_GROUP
+from pytask_markdown.processes import signal_process_group
+from pytask_markdown.processes import Watchdog
+
+
+_DRIVER = Path(__file__).parent / "marp_worker.js"
+
+_POOL: MarpWorkerPool | None = None
+
+
+class MarpWorkerPool:
+    """A pool of Node.js processes which render documents with marp-cli.
+
+    Parameters
+    ----------
+    n_workers : int
+        The number of worker processes.
+    path_to_package : Path
+        The path to the installed marp-cli package.
+    node : str
+        The Node.js executable.
+    env : dict[str, str] | None
+        The environment of the worker processes.
+
+    """
+
+    def __init__(
+        self,
+        n_workers: int,
+        path_to_package: Path,
+        node: str = "node",
+        env: dict[str, str] | None = None,
+    ):
+        self.path_to_package = path_to_package
+        self.node = node
+        self.env = env
+        self._ids = itertools.count()
+        self._idle: queue.Queue[subprocess.Popen[str]] = queue.Queue()
+        self._workers = [self._start_worker() for _ in range(n_workers)]
+        for worker in self._workers:
+            self._idle.put(worker)
+
+    def _start_worker(self) -> subprocess.Popen[str]:
+        return subprocess.Popen(
+            [self.node, _DRIVER.as_posix(), self.path_to_package.as_posix()],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+            bufsize=1,
+            env=self.env,
+            **NEW_PROCESS_GROUP,
+        )
+
+    def run(self, args: list[str]) -> int:
+        """Render a document with the marp arguments and return the exit code.
+
+        If the deadline of the step passes, the worker and its children are terminated
+        and replaced.
+
+        """
+        buffer = get_buffer()
+        job = {"id": next(self._ids), "args": args}
+        if buffer is not None:
+            job["max_output"] = buffer.max_size
+
+        worker = self._idle.get()
+        watchdog = Watchdog(worker.pid, get_timeout())
+        try:
+            result = self._send(worker, job)
+        except (OSError, ValueError):
+            # The worker died. Replace it and report the failure of the job.
+            self._workers.remove(worker)
+            worker.kill()
+            worker.wait()
+            worker = self._start_worker()
+            self._workers.append(worker)
+            if watchdog.expired and watchdog.timeout is not None:
+                raise subprocess.TimeoutExpired(
+                    ["marp", *args], watchdog.timeout
+                ) from None
+            raise RuntimeError("The marp worker terminated unexpectedly.") from None
+        finally:
+            watchdog.stop()
+            self._idle.put(worker)
+
+        if buffer is not None and result.get("output"):
+            buffer.write(result["output"].encode())
+        if result.get("error"):
+            raise RuntimeError(f"The marp worker failed with:\n\n{result['error']}")
+        return result["code"]
+
+    @staticmethod
+    def _send(worker: subprocess.Popen[str], job: dict[str, Any]) -> dict[str, Any]:
+        assert worker.stdin is not None
+        assert worker.stdout is not None
+        worker.stdin.write(json.dumps(job) + "\n")
+        worker.stdin.flush()
+        line = worker.stdout.readline()
+        if not line:
+            raise OSError("The marp worker closed its output.")
+        return json.loads(line)
+
+    def close(self) -> None:
+        """Shut down all workers."""
+        for worker in self._workers:
+            if worker.stdin is None:  # pragma: no cover
+                continue
+            try:
+                worker.stdin.close()
+            except OSError:  # pragma: no cover
+                pass
+        for worker in self._workers:
+            try:
+                worker.wait(timeout=5)
+            except subprocess.TimeoutExpired:  # pragma: no cover
+                signal_process_group(worker.pid, force=True)
+                worker.wait()
+        self._workers = []
+
+
+def find_marp_package(executable: str) -> Path | None:
+    """Find the marp-cli package behind the resolved marp executable."""
+    path = shutil.which(executable)
+    if path is None:
+        return None
+
+    # npm links the executable to ``marp-cli.js`` at the root of the package.
+    for candidate in Path(path).resolve().parents:
+        manifest = candidate.joinpath("package.json")
+        if manifest.exists():
+            try:
+                name = json.loads(manifest.read_text(encoding="utf-8")).get("name")
+            except ValueError:
+                return None
+            return candidate if name == "@marp-team/marp-cli" else None
+    return None
+
+
+def start_pool(
+    n_workers: int, executable: str, env: dict[str, str] | None = None
+) -> MarpWorkerPool | None:
+    """Start the pool of the session if it is not running already.
+
+    The workers load the marp-cli package of the executable which was resolved for the
+    session.
+
+    """
+    global _POOL  # noqa: PLW0603
+    if _POOL is None:
+        path_to_package = find_marp_package(executable)
+        if path_to_package is not None and shutil.which("node") is not None:
+            _POOL = MarpWorkerPool(n_workers, path_to_package, env=env)
+    return _POOL
+
+
+def get_pool() -> MarpWorkerPool | None:
+    """Return the pool of the session if it is available in this process."""
+    return _POOL
+
+
+def stop_pool() -> None:
+    """Shut down the pool of the session."""
+    global _POOL  # noqa: PLW0603
+    if _POOL is not None:
+        _POOL.close()
+        _POOL = None
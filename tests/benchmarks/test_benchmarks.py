@@ -0,0 +1,230 @@
+"""Benchmarks for the collection and execution of markdown tasks.
+
+The benchmarks do not need marp or quarto. Stub executables simulate the renderers and
+their startup and render latency can be configured with the environment variables
+``PYTASK_MARKDOWN_FAKE_STARTUP`` and ``PYTASK_MARKDOWN_FAKE_RENDER`` in seconds.
+
+The benchmarks are skipped unless ``PYTASK_MARKDOWN_BENCHMARKS=1`` is set. Run them with
+
+.. code-block:: console
+
+    $ PYTASK_MARKDOWN_BENCHMARKS=1 pytest tests/benchmarks
+
+The timings are written to ``.benchmarks/latest.json`` or the file in
+``PYTASK_MARKDOWN_BENCHMARK_OUTPUT``. To detect regressions, pass the timings of a
+previous run with ``PYTASK_MARKDOWN_BENCHMARK_BASELINE``. A benchmark fails if it is
+slower than the baseline by more than ``PYTASK_MARKDOWN_BENCHMARK_TOLERANCE``, by
+default 0.2.
+
+"""
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import sys
+import textwrap
+import time
+from pathlib import Path
+
+import pytest
+from pytask import ExitCode
+from pytask import main
+from pytask_markdown.collect import _parse_compilation_steps
+from pytask_markdown.compilation_steps import marp
+
+
+pytestmark = [
+    pytest.mark.skipif(
+        os.environ.get("PYTASK_MARKDOWN_BENCHMARKS") != "1",
+        reason="Benchmarks run with PYTASK_MARKDOWN_BENCHMARKS=1.",
+    ),
+    pytest.mark.skipif(sys.platform == "win32", reason="Stubs are shell scripts."),
+]
+
+
+FAKE_RENDERER = """\
+#!{executable}
+import os
+import sys
+import time
+from pathlib import Path
+
+time.sleep(float(os.environ.get("PYTASK_MARKDOWN_FAKE_STARTUP", "0")))
+args = sys.argv[1:]
+if args == ["--version"]:
+    print("fake {name} 1.0.0")
+    sys.exit(0)
+time.sleep(float(os.environ.get("PYTASK_MARKDOWN_FAKE_RENDER", "0")))
+
+if "--output" in args:
+    output = Path(args[args.index("--output") + 1])
+else:
+    output = Path(args[1] if args[0] == "render" else args[0]).with_suffix(".html")
+output.write_text("rendered")
+"""
+
+
+TASK_SOURCE = """
+import pytask
+
+for i in range({n_tasks}):
+
+    @pytask.mark.task(id=str(i))
+    @pytask.mark.markdown(script="document.md", document=f"out/document_{{i}}.html")
+    def task_render_document():
+        pass
+"""
+
+
+_RESULTS: dict[str, float] = {}
+
+
+@pytest.fixture(scope="module", autouse=True)
+def _write_results():
+    yield
+    path = Path(
+        os.environ.get("PYTASK_MARKDOWN_BENCHMARK_OUTPUT", ".benchmarks/latest.json")
+    )
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(_RESULTS, indent=4))
+
+
+@pytest.fixture()
+def benchmark(request):
+    """Measure the fastest of multiple rounds and compare it with the baseline."""
+
+    def _benchmark(func, rounds=3):
+        timings = []
+        for _ in range(rounds):
+            start = time.perf_counter()
+            duration = func()
+            timings.append(
+                time.perf_counter() - start if duration is None else duration
+            )
+        result = min(timings)
+        _RESULTS[request.node.name] = result
+
+        baseline = os.environ.get("PYTASK_MARKDOWN_BENCHMARK_BASELINE")
+        if baseline:
+            expected = json.loads(Path(baseline).read_text()).get(request.node.name)
+            tolerance = float(
+                os.environ.get("PYTASK_MARKDOWN_BENCHMARK_TOLERANCE", "0.2")
+            )
+            if expected is not None:
+                assert result <= expected * (1 + tolerance), (
+                    f"{request.node.name} took {result:.3f}s, but the baseline is "
+                    f"{expected:.3f}s."
+                )
+        return result
+
+    return _benchmark
+
+
+@pytest.fixture()
+def fake_renderers(tmp_path, monkeypatch):
+    """Put stub marp and quarto executables on the PATH."""
+    bin_dir = tmp_path.joinpath("bin")
+    bin_dir.mkdir()
+    for name in ("marp", "quarto"):
+        executable = bin_dir.joinpath(name)
+        executable.write_text(
+            FAKE_RENDERER.format(executable=sys.executable, name=name)
+        )
+        executable.chmod(0o755)
+    monkeypatch.setenv("PATH", bin_dir.as_posix() + os.pathsep + os.environ["PATH"])
+    return bin_dir
+
+
+def _create_project(path, n_tasks):
+    path.mkdir()
+    path.joinpath("task_documents.py").write_text(
+        textwrap.dedent(TASK_SOURCE.format(n_tasks=n_tasks))
+    )
+    path.joinpath("document.md").write_text("## Slide")
+    return path
+
+
+def _reset_project(path):
+    path.joinpath(".pytask.sqlite3").unlink(missing_ok=True)
+    shutil.rmtree(path.joinpath("out"), ignore_errors=True)
+    shutil.rmtree(path.joinpath(".pytask"), ignore_errors=True)
+
+
+def _collect(path):
+    """Collect the tasks of a project without executing them.
+
+    All tasks are deselected because even a dry run of many tasks is dominated by
+    updating the live table of pytask.
+
+    """
+    session = main({"paths": path, "marker_expression": "not markdown"})
+    assert session.exit_code == ExitCode.OK
+    return session
+
+
+def test_collect_10k_parametrized_tasks(tmp_path, benchmark, fake_renderers):
+    project = _create_project(tmp_path.joinpath("project"), n_tasks=10_000)
+
+    def _collect_tasks():
+        session = _collect(project)
+        assert len(session.tasks) == 10_000  # noqa: PLR2004
+        return session.collection_end - session.collection_start
+
+    benchmark(_collect_tasks, rounds=1)
+
+
+def test_collection_scales_linearly(tmp_path, fake_renderers):
+    projects = {
+        n_tasks: _create_project(tmp_path.joinpath(f"project_{n_tasks}"), n_tasks)
+        for n_tasks in (1_000, 10_000)
+    }
+    # Warm up imports and caches before measuring.
+    _collect(projects[1_000])
+
+    durations = {}
+    for n_tasks, project in projects.items():
+        session = _collect(project)
+        durations[n_tasks] = session.collection_end - session.collection_start
+
+    # The ratio of the time per task with 10,000 and 1,000 tasks.
+    ratio = (durations[10_000] / 10_000) / (durations[1_000] / 1_000)
+    assert ratio < 1.5, f"The time per task grows by {ratio:.2f}."  # noqa: PLR2004
+
+
+@pytest.mark.parametrize(
+    "steps", [["marp"], [marp("--html")], ["quarto"]], ids=["name", "step", "quarto"]
+)
+def test_parse_compilation_steps(benchmark, steps):
+    def _parse():
+        for _ in range(10_000):
+            _parse_compilation_steps(steps)
+
+    benchmark(_parse)
+
+
+@pytest.mark.parametrize(
+    "config",
+    [
+        {},
+        {"n_workers": 4},
+        {"n_workers": 4, "parallel_backend": "threads"},
+        {"markdown_max_concurrency": 4},
+    ],
+    ids=["sequential", "processes", "threads", "engine"],
+)
+def test_execute_tasks(tmp_path, monkeypatch, benchmark, fake_renderers, config):
+    if "n_workers" in config:
+        pytest.importorskip("pytask_parallel")
+    monkeypatch.setenv("PYTASK_MARKDOWN_FAKE_STARTUP", "0.05")
+    monkeypatch.setenv("PYTASK_MARKDOWN_FAKE_RENDER", "0.05")
+    project = _create_project(tmp_path.joinpath("project"), n_tasks=20)
+
+    def _execute():
+        _reset_project(project)
+        start = time.perf_counter()
+        session = main({"paths": project, **config})
+        assert session.exit_code == ExitCode.OK
+        return time.perf_counter() - start
+
+    benchmark(_execute)
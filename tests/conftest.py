@@ -1,7 +1,9 @@
 """Configuration file for pytest."""
 from __future__ import annotations
 
+import os
 import shutil
+import sys
 from pathlib import Path
 
 import pytest
@@ -16,8 +18,74 @@ needs_marp = pytest.mark.skipif(
 needs_quarto = pytest.mark.skipif(
     shutil.which("quarto") is None, reason="quarto needs to be installed."
 )
+needs_node = pytest.mark.skipif(
+    shutil.which("node") is None, reason="node needs to be installed."
+)
 
 
 @pytest.fixture()
 def runner():
     return CliRunner()
+
+
+FAKE_MARP = """\
+#!{executable}
+import sys
+import time
+from pathlib import Path
+
+args = sys.argv[1:]
+if args == ["--version"]:
+    print("@marp-team/marp-cli v2.2.0 (w/ @marp-team/marp-core v3.4.0)")
+    sys.exit(0)
+
+with open({log!r}, "a") as f:
+    f.write(" ".join(args) + "\\n")
+
+suffix = ".html"
+for flag, value in (("--pdf", ".pdf"), ("--pptx", ".pptx"), ("--image", ".png")):
+    if flag in args:
+        suffix = value
+
+output = None
+files = []
+skip_next = False
+for i, arg in enumerate(args):
+    if skip_next:
+        skip_next = False
+    elif arg in ("--output", "--theme-set", "--parallel", "--image"):
+        skip_next = True
+        if arg == "--output":
+            output = args[i + 1]
+    elif not arg.startswith("--"):
+        files.append(Path(arg))
+
+if any(file.read_text().strip() == "HANG" for file in files):
+    print("Converting...", flush=True)
+    time.sleep(60)
+
+if any(file.read_text().strip() == "FAIL" for file in files):
+    print("[  ERROR ] Failed converting the markdown.", file=sys.stderr)
+    sys.exit(1)
+
+if output is not None:
+    Path(output).write_text("rendered")
+else:
+    for file in files:
+        file.with_suffix(suffix).write_text("rendered")
+"""
+
+
+@pytest.fixture()
+def fake_marp(tmp_path, monkeypatch):
+    """Put a fake marp executable on the PATH which logs its invocations."""
+    bin_dir = tmp_path.joinpath("bin")
+    bin_dir.mkdir()
+    log = tmp_path.joinpath("marp.log")
+    executable = bin_dir.joinpath("marp")
+    executable.write_text(
+        FAKE_MARP.format(executable=sys.executable, log=log.as_posix())
+    )
+    executable.chmod(0o755)
+    monkeypatch.setenv("PATH", bin_dir.as_posix() + os.pathsep + os.environ["PATH"])
+    return log
@@ -0,0 +1,326 @@
+from __future__ import annotations
+
+import os
+import sys
+import textwrap
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+from pytask import ExitCode
+from pytask import main
+from pytask_markdown import batch
+from pytask_markdown.batch import get_batch_key
+from pytask_markdown.batch import get_quarto_project_key
+from pytask_markdown.batch import MarpBatch
+from pytask_markdown.batch import QuartoProjectBatch
+from pytask_markdown.compilation_steps import marp
+from pytask_markdown.compilation_steps import quarto
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize(
+    "steps, expected",
+    [
+        ([marp("--html")], (("--html",), None, ".pdf")),
+        ([marp("--images=png")], None),
+        ([quarto()], None),
+        ([marp(), marp()], None),
+    ],
+)
+def test_get_batch_key(steps, expected):
+    assert get_batch_key(steps, None, ".pdf") == expected
+
+
+@pytest.mark.end_to_end
+@pytest.mark.skipif(sys.platform == "win32", reason="Fake marp is a shell script.")
+@pytest.mark.parametrize("batch, n_invocations", [(True, 1), (False, 3)])
+def test_batch_renders_compatible_tasks_at_once(
+    tmp_path, fake_marp, batch, n_invocations
+):
+    task_source = """
+    import pytask
+
+    for i in range(3):
+
+        @pytask.mark.task
+        @pytask.mark.markdown(
+            script=f"document_{i}.md", document=f"bld/document_{i}.html"
+        )
+        def task_render_document():
+            pass
+    """
+    tmp_path.joinpath("task_dummy.py").write_text(textwrap.dedent(task_source))
+    for i in range(3):
+        tmp_path.joinpath(f"document_{i}.md").write_text("## Test")
+
+    session = main({"paths": tmp_path, "batch_marp_tasks": batch})
+
+    assert session.exit_code == ExitCode.OK
+    assert len(Path(fake_marp).read_text().splitlines()) == n_invocations
+    for i in range(3):
+        assert tmp_path.joinpath("bld", f"document_{i}.html").exists()
+        assert not tmp_path.joinpath(f"document_{i}.html").exists()
+
+
+@pytest.mark.unit
+def test_claims_leave_out_rendered_members(tmp_path, monkeypatch):
+    monkeypatch.setattr(batch, "is_ready", lambda session, name: True)  # noqa: ARG005
+    session = SimpleNamespace(config={"dry_run": False})
+    marp_batch = MarpBatch(options=(), path_to_css=None, suffix=".html")
+    for name in ("a", "b"):
+        marp_batch.add(name, tmp_path / f"{name}.md", tmp_path / f"{name}.html")
+
+    names = marp_batch._claim_ready_members(session, SimpleNamespace(name="a"))
+    assert names == ["a", "b"]
+    marp_batch.claimed.update(names)
+    marp_batch.rendered.update([tmp_path / "a.html", tmp_path / "b.html"])
+
+    marp_batch.add("c", tmp_path / "c.md", tmp_path / "c.html")
+    names = marp_batch._claim_ready_members(session, SimpleNamespace(name="b"))
+    assert names == ["c"]
+
+
+@pytest.mark.end_to_end
+@pytest.mark.skipif(sys.platform == "win32", reason="Fake marp is a shell script.")
+@pytest.mark.parametrize("directory", ["bld", "."])
+def test_batch_keeps_unchanged_documents(tmp_path, fake_marp, directory):
+    task_source = f"""
+    import pytask
+
+    for i in range(2):
+
+        @pytask.mark.task
+        @pytask.mark.markdown(
+            script=f"document_{{i}}.md", document=f"{directory}/document_{{i}}.html"
+        )
+        def task_render_document():
+            pass
+    """
+    tmp_path.joinpath("task_dummy.py").write_text(textwrap.dedent(task_source))
+    for i in range(2):
+        tmp_path.joinpath(f"document_{i}.md").write_text("## Test")
+
+    session = main({"paths": tmp_path, "batch_marp_tasks": True})
+    assert session.exit_code == ExitCode.OK
+
+    documents = [tmp_path.joinpath(directory, f"document_{i}.html") for i in range(2)]
+    for document in documents:
+        os.utime(document, ns=(0, 10**9))
+        document.parent.joinpath(f".{document.name}.1.previous").write_text("stale")
+    for i in range(2):
+        tmp_path.joinpath(f"document_{i}.md").write_text("## Changed")
+
+    session = main({"paths": tmp_path, "batch_marp_tasks": True})
+
+    assert session.exit_code == ExitCode.OK
+    assert len(fake_marp.read_text().splitlines()) == 2  # noqa: PLR2004
+    for document in documents:
+        assert document.read_text() == "rendered"
+        assert document.stat().st_mtime_ns == 10**9
+    assert not list(tmp_path.rglob("*.previous"))
+
+
+FAKE_QUARTO = """\
+#!{executable}
+import sys
+from pathlib import Path
+
+args = sys.argv[1:]
+if args == ["--version"]:
+    print("1.3.450")
+    sys.exit(0)
+
+with open({log!r}, "a") as f:
+    f.write(" ".join(args) + "\\n")
+
+path = Path(args[1])
+if path.is_dir():
+    website = "website" in (path / "_quarto.yml").read_text()
+    for script in path.rglob("*.qmd"):
+        output = (path / "_site" if website else path) / script.relative_to(path)
+        output = output.with_suffix(".html")
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text("rendered")
+else:
+    Path(args[args.index("--output") + 1]).write_text("rendered")
+"""
+
+
+@pytest.fixture()
+def fake_quarto(tmp_path, monkeypatch):
+    bin_dir = tmp_path.joinpath("bin")
+    bin_dir.mkdir()
+    log = tmp_path.joinpath("quarto.log")
+    executable = bin_dir.joinpath("quarto")
+    executable.write_text(
+        FAKE_QUARTO.format(executable=sys.executable, log=log.as_posix())
+    )
+    executable.chmod(0o755)
+    monkeypatch.setenv("PATH", bin_dir.as_posix() + os.pathsep + os.environ["PATH"])
+    return log
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize(
+    "steps, suffix, in_project, expected",
+    [
+        ([quarto()], ".html", True, ((), ".html")),
+        ([quarto("--toc")], ".pptx", True, (("--toc",), ".pptx")),
+        ([quarto()], ".html", False, None),
+        ([quarto(cache=True)], ".html", True, None),
+        ([quarto()], ".pdf", True, None),
+        ([marp()], ".html", True, None),
+    ],
+)
+def test_get_quarto_project_key(tmp_path, steps, suffix, in_project, expected):
+    tmp_path.joinpath("project", "chapters").mkdir(parents=True)
+    if in_project:
+        tmp_path.joinpath("project", "_quarto.yml").write_text("project:\n")
+    path_to_md = tmp_path.joinpath("project", "chapters", "document.qmd")
+
+    key = get_quarto_project_key(steps, path_to_md, suffix)
+
+    if expected is None:
+        assert key is None
+    else:
+        assert key == (tmp_path.joinpath("project"), *expected)
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize(
+    "config, expected",
+    [
+        ("project:\n  type: default\n", "."),
+        ("project:\n  output-dir: 'output'  # comment\n", "output"),
+        ("project:\n  type: website\n", "_site"),
+        ("project:\n  type: book\n  output-dir: docs\n", "docs"),
+    ],
+)
+def test_quarto_project_batch_output_dir(tmp_path, config, expected):
+    tmp_path.joinpath("_quarto.yml").write_text(config)
+    batch = QuartoProjectBatch(tmp_path, (), ".html")
+    assert batch.output_dir == tmp_path.joinpath(expected)
+
+
+@pytest.mark.end_to_end
+@pytest.mark.skipif(sys.platform == "win32", reason="Fake quarto is a script.")
+@pytest.mark.parametrize("batch, n_invocations", [(True, 1), (False, 3)])
+def test_batch_renders_quarto_project_at_once(
+    tmp_path, fake_quarto, batch, n_invocations
+):
+    task_source = """
+    import pytask
+
+    for i in range(3):
+
+        @pytask.mark.task
+        @pytask.mark.markdown(
+            script=f"project/document_{i}.qmd",
+            document=f"bld/document_{i}.html",
+            compilation_steps="quarto",
+        )
+        def task_render_document():
+            pass
+    """
+    tmp_path.joinpath("task_dummy.py").write_text(textwrap.dedent(task_source))
+    tmp_path.joinpath("project").mkdir()
+    tmp_path.joinpath("project", "_quarto.yml").write_text(
+        "project:\n  type: website\n"
+    )
+    for i in range(3):
+        tmp_path.joinpath("project", f"document_{i}.qmd").write_text("## Test")
+
+    session = main({"paths": tmp_path, "batch_quarto_projects": batch})
+
+    assert session.exit_code == ExitCode.OK
+    assert len(fake_quarto.read_text().splitlines()) == n_invocations
+    for i in range(3):
+        assert tmp_path.joinpath("bld", f"document_{i}.html").read_text() == "rendered"
+
+
+@pytest.mark.end_to_end
+@pytest.mark.skipif(sys.platform == "win32", reason="Fake quarto is a script.")
+@pytest.mark.parametrize("has_code, expected", [(True, True), (False, False)])
+def test_quarto_project_batch_holds_token_if_a_member_is_heavy(
+    tmp_path, fake_quarto, has_code, expected
+):
+    task_source = """
+    import pytask
+
+    for i in range(2):
+
+        @pytask.mark.task
+        @pytask.mark.markdown(
+            script=f"project/document_{i}.qmd",
+            document=f"bld/document_{i}.html",
+            compilation_steps="quarto",
+        )
+        def task_render_document():
+            pass
+    """
+    tmp_path.joinpath("task_dummy.py").write_text(textwrap.dedent(task_source))
+    tmp_path.joinpath("project").mkdir()
+    tmp_path.joinpath("project", "_quarto.yml").write_text(
+        "project:\n  type: website\n"
+    )
+    tmp_path.joinpath("project", "document_0.qmd").write_text("## Test")
+    code = "```{python}\n1 + 1\n```\n" if has_code else "## Test"
+    tmp_path.joinpath("project", "document_1.qmd").write_text(code)
+
+    session = main(
+        {
+            "paths": tmp_path,
+            "batch_quarto_projects": True,
+            "markdown_max_heavy_renders": 1,
+        }
+    )
+
+    assert session.exit_code == ExitCode.OK
+    assert len(fake_quarto.read_text().splitlines()) == 1
+    (batch,) = session.config["_markdown_batches"].values()
+    assert (batch.token_pool is not None) is expected
+
+
+@pytest.mark.end_to_end
+@pytest.mark.skipif(sys.platform == "win32", reason="Fake quarto is a script.")
+def test_quarto_project_batch_puts_back_documents_of_other_members(
+    tmp_path, fake_quarto
+):
+    task_source = """
+    import pytask
+
+    for i in range(3):
+
+        @pytask.mark.task
+        @pytask.mark.markdown(
+            script=f"project/document_{i}.qmd",
+            document=f"project/document_{i}.html",
+            compilation_steps="quarto",
+        )
+        def task_render_document():
+            pass
+    """
+    tmp_path.joinpath("task_dummy.py").write_text(textwrap.dedent(task_source))
+    tmp_path.joinpath("project").mkdir()
+    tmp_path.joinpath("project", "_quarto.yml").write_text("project:\n")
+    for i in range(3):
+        tmp_path.joinpath("project", f"document_{i}.qmd").write_text("## Test")
+    config = {"paths": tmp_path, "batch_quarto_projects": True}
+
+    session = main({**config})
+    assert session.exit_code == ExitCode.OK
+
+    unchanged = tmp_path.joinpath("project", "document_2.html")
+    modified = unchanged.stat().st_mtime_ns
+    for i in range(2):
+        tmp_path.joinpath("project", f"document_{i}.qmd").write_text("## Changed")
+    session = main({**config})
+
+    assert session.exit_code == ExitCode.OK
+    assert len(fake_quarto.read_text().splitlines()) == 2  # noqa: PLR2004
+    assert unchanged.stat().st_mtime_ns == modified
+
+    session = main({**config})
+    assert session.exit_code == ExitCode.OK
+    assert len(fake_quarto.read_text().splitlines()) == 2  # noqa: PLR2004
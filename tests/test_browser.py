@@ -0,0 +1,198 @@
+from __future__ import annotations
+
+import json
+import os
+import subprocess
+import sys
+import textwrap
+import time
+from pathlib import Path
+
+import pytest
+import pytask_markdown.browser
+from conftest import needs_node
+from pytask import ExitCode
+from pytask import main
+from pytask_markdown.browser import ENDPOINT_VARIABLE
+from pytask_markdown.browser import MARKER_VARIABLE
+from pytask_markdown.browser import SharedBrowser
+from pytask_markdown.compilation_steps import marp
+
+
+FAKE_CHROME = """\
+#!{executable}
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+user_data_dir = next(
+    arg.split("=", 1)[1] for arg in sys.argv if arg.startswith("--user-data-dir=")
+)
+Path(user_data_dir, "DevToolsActivePort").write_text("9222\\n/devtools/browser/abc\\n")
+child = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(60)"])
+Path(user_data_dir).with_name(Path(user_data_dir).name + ".child").write_text(
+    str(child.pid)
+)
+time.sleep(60)
+"""
+
+
+FAKE_PUPPETEER = """
+exports.launch = async () => ({ kind: "launched" });
+exports.connect = async (options) => ({
+  kind: "connected",
+  endpoint: options.browserWSEndpoint,
+  disconnect: async () => {},
+});
+"""
+
+
+@pytest.fixture()
+def fake_chrome(tmp_path):
+    executable = tmp_path.joinpath("chrome")
+    executable.write_text(FAKE_CHROME.format(executable=sys.executable))
+    executable.chmod(0o755)
+    return executable
+
+
+@pytest.mark.unit
+@pytest.mark.skipif(sys.platform == "win32", reason="Fake chrome is a script.")
+def test_shared_browser_exposes_endpoint(fake_chrome):
+    browser = SharedBrowser(fake_chrome.as_posix(), max_pages=2)
+    user_data_dir = Path(browser._user_data_dir)
+    try:
+        assert browser.endpoint == "ws://127.0.0.1:9222/devtools/browser/abc"
+        env = browser.environment()
+        assert env[ENDPOINT_VARIABLE] == browser.endpoint
+        assert "marp_browser.js" in env["NODE_OPTIONS"]
+    finally:
+        browser.close()
+    assert not user_data_dir.exists()
+
+
+@pytest.mark.unit
+@pytest.mark.skipif(sys.platform == "win32", reason="Fake chrome is a script.")
+def test_shared_browser_terminates_its_child_processes(fake_chrome):
+    browser = SharedBrowser(fake_chrome.as_posix(), max_pages=1)
+    path_to_pid = Path(f"{browser._user_data_dir}.child")
+    try:
+        for _ in range(100):
+            if path_to_pid.exists() and path_to_pid.read_text():
+                break
+            time.sleep(0.05)
+        pid = int(path_to_pid.read_text())
+    finally:
+        browser.close()
+
+    for _ in range(100):
+        if _is_gone(pid):
+            break
+        time.sleep(0.05)
+    assert _is_gone(pid)
+    path_to_pid.unlink()
+
+
+def _is_gone(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return True
+    # The child is a zombie until init reaps it.
+    status = Path(f"/proc/{pid}/status")
+    return status.exists() and "zombie" in status.read_text()
+
+
+@pytest.mark.unit
+def test_shared_browser_fails_if_browser_terminates():
+    with pytest.raises(RuntimeError, match="terminated while starting"):
+        SharedBrowser(sys.executable, max_pages=1, timeout=5)
+
+
+@pytest.mark.unit
+@pytest.mark.skipif(sys.platform == "win32", reason="Fake chrome is a script.")
+@pytest.mark.parametrize(
+    "document, uses_browser", [("document.pdf", True), ("document.html", False)]
+)
+def test_marp_attaches_to_shared_browser(
+    tmp_path, monkeypatch, fake_chrome, document, uses_browser
+):
+    calls = []
+
+    def _run_command(cmd, env=None, **kwargs):  # noqa: ARG001
+        # Connect like the preload does.
+        if env is not None:
+            Path(env[MARKER_VARIABLE]).touch()
+        calls.append(env)
+        return 0
+
+    monkeypatch.setattr("pytask_markdown.compilation_steps.run_command", _run_command)
+    browser = SharedBrowser(fake_chrome.as_posix(), max_pages=1)
+    monkeypatch.setattr("pytask_markdown.browser._BROWSER", browser)
+    try:
+        marp()(
+            path_to_md=tmp_path / "document.md",
+            path_to_document=tmp_path / document,
+            path_to_css=None,
+        )
+    finally:
+        browser.close()
+
+    assert (calls[0] is not None) is uses_browser
+
+
+@pytest.mark.end_to_end
+@pytest.mark.skipif(sys.platform == "win32", reason="Fake marp is a shell script.")
+def test_shared_browser_is_shut_down_if_marp_does_not_connect(
+    tmp_path, monkeypatch, fake_chrome, fake_marp
+):
+    task_source = """
+    import pytask
+
+    for suffix in ("pdf", "png"):
+
+        @pytask.mark.task(id=suffix)
+        @pytask.mark.markdown(script="document.md", document=f"document.{suffix}")
+        def task_render_document():
+            pass
+    """
+    tmp_path.joinpath("task_dummy.py").write_text(textwrap.dedent(task_source))
+    tmp_path.joinpath("document.md").write_text("## Slide")
+    monkeypatch.setenv("CHROME_PATH", fake_chrome.as_posix())
+
+    session = main({"paths": tmp_path, "marp_shared_browser": True})
+
+    assert session.exit_code == ExitCode.OK
+    messages = [str(report.message) for report in session.warnings]
+    assert sum("did not connect to the shared browser" in m for m in messages) == 1
+    assert ENDPOINT_VARIABLE not in fake_marp.read_text().splitlines()[-1]
+
+
+@needs_node
+@pytest.mark.unit
+def test_preload_connects_instead_of_launching(tmp_path):
+    package = tmp_path.joinpath("node_modules", "puppeteer-core")
+    package.mkdir(parents=True)
+    package.joinpath("package.json").write_text(
+        json.dumps({"name": "puppeteer-core", "main": "index.js"})
+    )
+    package.joinpath("index.js").write_text(textwrap.dedent(FAKE_PUPPETEER))
+    script = """
+    const puppeteer = require("puppeteer-core");
+    puppeteer.launch().then((browser) => console.log(browser.kind, browser.endpoint));
+    """
+    preload = Path(pytask_markdown.browser.__file__).with_name("marp_browser.js")
+
+    result = subprocess.run(
+        ["node", "--require", preload.as_posix(), "-e", textwrap.dedent(script)],
+        cwd=tmp_path,
+        env={
+            ENDPOINT_VARIABLE: "ws://127.0.0.1:9222/abc",
+            MARKER_VARIABLE: tmp_path.joinpath("connected").as_posix(),
+        },
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    assert result.stdout.strip() == "connected ws://127.0.0.1:9222/abc"
+    assert tmp_path.joinpath("connected").exists()
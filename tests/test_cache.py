@@ -0,0 +1,180 @@
+from __future__ import annotations
+
+import os
+import shutil
+import sys
+import textwrap
+
+import pytest
+from pytask import ExitCode
+from pytask import main
+from pytask_markdown.cache import compute_key
+from pytask_markdown.cache import is_cacheable
+from pytask_markdown.cache import RenderCache
+from pytask_markdown.compilation_steps import marp
+from pytask_markdown.compilation_steps import quarto
+
+
+@pytest.mark.unit
+def test_store_and_restore_documents(tmp_path):
+    cache = RenderCache(tmp_path / "store", max_size=10)
+    document = tmp_path.joinpath("document.html")
+
+    assert not cache.restore("a" * 64, document)
+
+    document.write_text("12345")
+    cache.store("a" * 64, document)
+    document.unlink()
+
+    assert cache.restore("a" * 64, document)
+    assert document.read_text() == "12345"
+
+
+@pytest.mark.unit
+def test_least_recently_used_documents_are_evicted(tmp_path):
+    cache = RenderCache(tmp_path / "store", max_size=10)
+    document = tmp_path.joinpath("document.html")
+
+    for key in ("a", "b", "c"):
+        document.write_text("12345")
+        cache.store(key * 64, document)
+
+    assert not cache.restore("a" * 64, document)
+    assert cache.restore("b" * 64, document)
+    assert cache.restore("c" * 64, document)
+
+
+@pytest.mark.unit
+def test_restore_does_not_touch_documents(tmp_path):
+    cache = RenderCache(tmp_path / "store", max_size=10)
+    document = tmp_path.joinpath("document.html")
+    other = tmp_path.joinpath("other.html")
+    document.write_text("12345")
+    cache.store("a" * 64, document)
+    document.unlink()
+
+    assert cache.restore("a" * 64, document)
+    os.utime(document, ns=(0, 10**9))
+    assert cache.restore("a" * 64, other)
+    assert cache.restore("a" * 64, document)
+
+    assert document.stat().st_mtime_ns == 10**9
+
+
+@pytest.mark.unit
+def test_restored_documents_are_recently_used(tmp_path):
+    cache = RenderCache(tmp_path / "store", max_size=10)
+    document = tmp_path.joinpath("document.html")
+
+    for key in ("a", "b"):
+        document.write_text("12345")
+        cache.store(key * 64, document)
+    assert cache.restore("a" * 64, document)
+    document.write_text("12345")
+    cache.store("c" * 64, document)
+
+    assert cache.restore("a" * 64, document)
+    assert not cache.restore("b" * 64, document)
+
+
+@pytest.mark.unit
+def test_store_is_only_scanned_when_it_is_full(tmp_path, monkeypatch):
+    cache = RenderCache(tmp_path / "store", max_size=20)
+    document = tmp_path.joinpath("document.html")
+    scans = []
+    scan = cache._scan
+    monkeypatch.setattr(cache, "_scan", lambda: scans.append(None) or scan())
+
+    for key in ("a", "b", "c", "d"):
+        document.write_text("12345")
+        cache.store(key * 64, document)
+    assert len(scans) == 1
+
+    document.write_text("12345")
+    cache.store("e" * 64, document)
+    assert len(scans) == 2  # noqa: PLR2004
+    assert not cache.restore("a" * 64, document)
+    assert cache.restore("e" * 64, document)
+
+
+@pytest.mark.unit
+def test_key_is_independent_of_location(tmp_path):
+    for name in ("checkout_1", "checkout_2"):
+        tmp_path.joinpath(name, "images").mkdir(parents=True)
+        tmp_path.joinpath(name, "document.md").write_text("![](images/image.png)")
+        tmp_path.joinpath(name, "images", "image.png").write_text("image")
+
+    keys = [
+        compute_key(
+            [marp("--html")],
+            tmp_path / name / "document.md",
+            tmp_path / name / "document.html",
+            None,
+            [tmp_path / name / "images" / "image.png"],
+        )
+        for name in ("checkout_1", "checkout_2")
+    ]
+    assert keys[0] == keys[1]
+
+    tmp_path.joinpath("checkout_2", "images", "image.png").write_text("changed")
+    changed_dependency = compute_key(
+        [marp("--html")],
+        tmp_path / "checkout_2" / "document.md",
+        tmp_path / "checkout_2" / "document.html",
+        None,
+        [tmp_path / "checkout_2" / "images" / "image.png"],
+    )
+    changed_options = compute_key(
+        [marp()],
+        tmp_path / "checkout_1" / "document.md",
+        tmp_path / "checkout_1" / "document.html",
+        None,
+        [tmp_path / "checkout_1" / "images" / "image.png"],
+    )
+    assert len({keys[0], changed_dependency, changed_options}) == 3
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize(
+    "steps, document, expected",
+    [
+        ([marp()], "document.html", True),
+        ([marp("--images=png")], "document.png", False),
+        ([quarto()], "document.html", False),
+        ([quarto("--embed-resources")], "document.html", True),
+        ([quarto()], "document.pptx", True),
+        ([lambda **kwargs: None], "document.html", False),  # noqa: ARG005
+    ],
+)
+def test_is_cacheable(tmp_path, steps, document, expected):
+    assert is_cacheable(steps, tmp_path / document) is expected
+
+
+@pytest.mark.end_to_end
+@pytest.mark.skipif(sys.platform == "win32", reason="Fake marp is a shell script.")
+def test_render_is_restored_from_store(tmp_path, fake_marp):
+    task_source = """
+    import pytask
+
+    @pytask.mark.markdown(script="document.md", document="document.html")
+    def task_render_document():
+        pass
+    """
+    project = tmp_path.joinpath("project")
+    project.mkdir()
+    project.joinpath("task_dummy.py").write_text(textwrap.dedent(task_source))
+    project.joinpath("document.md").write_text("## Test")
+    store = tmp_path.joinpath("store")
+
+    session = main({"paths": project, "markdown_render_cache": store.as_posix()})
+    assert session.exit_code == ExitCode.OK
+
+    # A fresh checkout restores the document instead of rendering it.
+    checkout = tmp_path.joinpath("checkout")
+    shutil.copytree(project, checkout, ignore=shutil.ignore_patterns("document.html"))
+    checkout.joinpath(".pytask.sqlite3").unlink(missing_ok=True)
+
+    session = main({"paths": checkout, "markdown_render_cache": store.as_posix()})
+    assert session.exit_code == ExitCode.OK
+    assert checkout.joinpath("document.html").read_text() == "rendered"
+    assert len(fake_marp.read_text().splitlines()) == 1
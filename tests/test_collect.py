@@ -3,6 +3,7 @@ from __future__ import annotations
 from contextlib import ExitStack as does_not_raise  # noqa: N813
 
 import pytest
+from pytask_markdown.collect import _parse_compilation_steps
 from pytask_markdown.collect import markdown
 
 
@@ -44,3 +45,47 @@ def test_marp(kwargs, expectation, expected):
     with expectation:
         result = markdown(**kwargs)
         assert result == expected
+
+
+@pytest.mark.unit
+def test_parse_compilation_steps_is_memoized():
+    steps, renderer = _parse_compilation_steps("marp")
+    other_steps, _ = _parse_compilation_steps(["marp"])
+
+    assert renderer == "marp"
+    assert steps[0] is other_steps[0]
+    assert steps is not other_steps
+
+
+@pytest.mark.unit
+def test_parse_compilation_steps_with_unhashable_spec():
+    class _Step:
+        __name__ = "run_quarto"
+        __hash__ = None
+
+        def __call__(self):
+            pass
+
+    step = _Step()
+    steps, renderer = _parse_compilation_steps([step])
+
+    assert steps == [step]
+    assert renderer == "quarto"
+
+
+@pytest.mark.unit
+def test_parse_compilation_steps_does_not_parse_again_after_type_error():
+    calls = []
+
+    class _Step:
+        def __call__(self):
+            pass
+
+        @property
+        def __name__(self):
+            calls.append(None)
+            raise TypeError("Broken step.")
+
+    with pytest.raises(TypeError, match="Broken step."):
+        _parse_compilation_steps([_Step()])
+    assert len(calls) == 1
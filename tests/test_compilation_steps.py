@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import textwrap
+from pathlib import Path
+
+import pytest
+from pytask_markdown.compilation_steps import python_html
+from pytask_markdown.compilation_steps import quarto
+
+
+@pytest.fixture()
+def recorded_commands(monkeypatch):
+    commands = []
+
+    def _run(cmd, cwd=None, **kwargs):  # noqa: ARG001
+        commands.append(cmd)
+        if cwd is None:
+            pass
+        elif "--output" in cmd:
+            Path(cwd, cmd[cmd.index("--output") + 1]).write_text("rendered")
+        else:
+            output_dir = Path(cmd[cmd.index("--output-dir") + 1])
+            stem = Path(cmd[2]).stem
+            for format_ in cmd[cmd.index("--to") + 1].split(","):
+                output_dir.joinpath(f"{stem}.{format_}").write_text("rendered")
+        return 0
+
+    monkeypatch.setattr("pytask_markdown.compilation_steps.run_command", _run)
+    return commands
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize(
+    "cache, refresh_cache, expected",
+    [
+        (False, False, "--no-cache"),
+        (False, True, "--no-cache"),
+        (True, False, "--cache"),
+        (True, True, "--cache-refresh"),
+    ],
+)
+def test_quarto_cache_options(
+    tmp_path, recorded_commands, cache, refresh_cache, expected
+):
+    step = quarto(cache=cache)
+    step(
+        path_to_md=tmp_path / "document.qmd",
+        path_to_document=tmp_path / "document.html",
+        path_to_css=None,
+        refresh_cache=refresh_cache,
+    )
+    assert expected in recorded_commands[0]
+
+
+@pytest.mark.unit
+def test_quarto_cache_cannot_be_set_with_options():
+    with pytest.raises(ValueError, match="Caching is controlled"):
+        quarto("--cache")
+
+
+@pytest.mark.unit
+def test_quarto_renders_in_isolated_directory(tmp_path, recorded_commands):
+    tmp_path.joinpath("document.html").write_text("old")
+
+    quarto()(
+        path_to_md=tmp_path / "document.qmd",
+        path_to_document=tmp_path / "document.html",
+        path_to_css=None,
+    )
+
+    assert tmp_path.joinpath("document.html").read_text() == "rendered"
+    assert [p.name for p in tmp_path.iterdir()] == ["document.html"]
+
+
+@pytest.mark.unit
+def test_quarto_renders_multiple_documents_at_once(tmp_path, recorded_commands):
+    tmp_path.joinpath("slides").mkdir()
+    documents = [tmp_path / "report.html", tmp_path / "slides" / "report.pptx"]
+
+    quarto()(
+        path_to_md=tmp_path / "report.qmd",
+        path_to_document=documents[0],
+        path_to_css=None,
+        paths_to_documents=documents,
+    )
+
+    assert len(recorded_commands) == 1
+    assert recorded_commands[0][-2:] == ["--to", "html,pptx"]
+    assert all(document.read_text() == "rendered" for document in documents)
+
+
+@pytest.mark.unit
+def test_python_html(tmp_path):
+    source = """\
+    ---
+    title: Notes & more
+    marp: true
+    ---
+    # Heading
+
+    | a | b |
+    |---|---|
+    | 1 | 2 |
+    """
+    tmp_path.joinpath("notes.md").write_text(textwrap.dedent(source))
+    tmp_path.joinpath("custom.css").write_text("h1 { color: red; }")
+
+    python_html()(
+        path_to_md=tmp_path / "notes.md",
+        path_to_document=tmp_path / "notes.html",
+        path_to_css=tmp_path / "custom.css",
+    )
+
+    document = tmp_path.joinpath("notes.html").read_text()
+    assert "<title>Notes &amp; more</title>" in document
+    assert "<style>\nh1 { color: red; }\n</style>" in document
+    assert "<h1>Heading</h1>" in document
+    assert "<table>" in document
+    assert "marp: true" not in document
+
+
+@pytest.mark.unit
+def test_python_html_only_renders_html(tmp_path):
+    with pytest.raises(NotImplementedError, match="only renders .html"):
+        python_html()(
+            path_to_md=tmp_path / "notes.md",
+            path_to_document=tmp_path / "notes.pdf",
+            path_to_css=None,
+        )
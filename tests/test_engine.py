@@ -0,0 +1,167 @@
+from __future__ import annotations
+
+import sys
+import textwrap
+import threading
+import time
+
+import pytest
+from pytask import ExitCode
+from pytask import main
+from pytask import TaskOutcome
+from pytask_markdown.engine import RenderEngine
+
+
+@pytest.mark.unit
+def test_engine_runs_commands_concurrently():
+    engine = RenderEngine(max_concurrency=4)
+    sleep = [sys.executable, "-c", "import time; time.sleep(0.5)"]
+    codes = []
+    try:
+        start = time.monotonic()
+        threads = [
+            threading.Thread(target=lambda: codes.append(engine.run(sleep)))
+            for _ in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        duration = time.monotonic() - start
+
+        failing = [sys.executable, "-c", "raise SystemExit(3)"]
+        assert engine.run(failing) == 3  # noqa: PLR2004
+    finally:
+        engine.close()
+
+    assert codes == [0, 0, 0, 0]
+    assert duration < 1.5  # noqa: PLR2004
+
+
+@pytest.mark.end_to_end
+@pytest.mark.skipif(sys.platform == "win32", reason="Fake marp is a shell script.")
+def test_engine_reports_results_per_task(tmp_path, fake_marp):
+    task_source = """
+    import pytask
+
+    for name in ("a", "b", "c"):
+
+        @pytask.mark.task(id=name)
+        @pytask.mark.markdown(script=f"{name}.md", document=f"{name}.html")
+        def task_render_document():
+            pass
+    """
+    tmp_path.joinpath("task_dummy.py").write_text(textwrap.dedent(task_source))
+    tmp_path.joinpath("a.md").write_text("## A")
+    tmp_path.joinpath("b.md").write_text("FAIL")
+    tmp_path.joinpath("c.md").write_text("## C")
+
+    session = main(
+        {
+            "paths": tmp_path,
+            "markdown_max_concurrency": 3,
+            "markdown_output_max_size": 64,
+        }
+    )
+
+    assert session.exit_code == ExitCode.FAILED
+    reports = {
+        report.task.name.split("[")[-1][:-1]: report
+        for report in session.execution_reports
+    }
+    assert reports["a"].outcome == TaskOutcome.SUCCESS
+    assert reports["b"].outcome == TaskOutcome.FAIL
+    assert reports["c"].outcome == TaskOutcome.SUCCESS
+    assert "Compilation step run_marp failed" in str(reports["b"].exc_info[1])
+    assert "Failed converting the markdown" in str(reports["b"].exc_info[1])
+    assert tmp_path.joinpath("c.html").read_text() == "rendered"
+    assert len(fake_marp.read_text().splitlines()) == 3  # noqa: PLR2004
+
+
+@pytest.mark.end_to_end
+@pytest.mark.skipif(sys.platform == "win32", reason="Fake marp is a shell script.")
+def test_engine_skips_tasks_downstream_of_unchanged_renders(tmp_path, fake_marp):
+    task_source = """
+    import pytask
+
+    @pytask.mark.markdown(script="a.md", document="a.html")
+    def task_render_a():
+        pass
+
+    @pytask.mark.depends_on("a.html")
+    @pytask.mark.markdown(script="b.md", document="b.html")
+    def task_render_b():
+        pass
+
+    @pytask.mark.try_first
+    @pytask.mark.depends_on("a.html")
+    @pytask.mark.markdown(script="c.md", document="c.html")
+    def task_render_c():
+        pass
+    """
+    tmp_path.joinpath("task_dummy.py").write_text(textwrap.dedent(task_source))
+    for name in ("a", "b", "c"):
+        tmp_path.joinpath(f"{name}.md").write_text(f"## {name}")
+    config = {"paths": tmp_path, "markdown_max_concurrency": 2}
+
+    session = main({**config})
+    assert session.exit_code == ExitCode.OK
+    assert len(fake_marp.read_text().splitlines()) == 3  # noqa: PLR2004
+
+    tmp_path.joinpath("a.md").write_text("## a")
+    tmp_path.joinpath("c.md").write_text("## c changed")
+    session = main({**config})
+
+    assert session.exit_code == ExitCode.OK
+    outcomes = {
+        report.task.name.split("::")[-1]: report.outcome
+        for report in session.execution_reports
+    }
+    assert outcomes["task_render_b"] == TaskOutcome.SKIP_UNCHANGED
+    assert outcomes["task_render_c"] == TaskOutcome.SUCCESS
+    calls = fake_marp.read_text().splitlines()[3:]
+    assert len(calls) == 2  # noqa: PLR2004
+    assert not any("b.md" in call for call in calls)
+
+
+@pytest.mark.end_to_end
+def test_engine_leaves_tasks_without_renderer_to_pytask(tmp_path, monkeypatch):
+    monkeypatch.setenv("PATH", tmp_path.joinpath("bin").as_posix())
+    task_source = """
+    import pytask
+
+    @pytask.mark.try_first
+    @pytask.mark.markdown(
+        script="a.md", document="a.html", compilation_steps="python_html"
+    )
+    def task_render_a():
+        pass
+
+    @pytask.mark.markdown(script="b.md", document="b.html")
+    def task_render_b():
+        pass
+    """
+    tmp_path.joinpath("task_dummy.py").write_text(textwrap.dedent(task_source))
+    for name in ("a", "b"):
+        tmp_path.joinpath(f"{name}.md").write_text(f"## {name}")
+
+    submitted = []
+    submit = RenderEngine.submit
+
+    def _submit(self, task_name, *args, **kwargs):
+        submitted.append(task_name)
+        return submit(self, task_name, *args, **kwargs)
+
+    monkeypatch.setattr(RenderEngine, "submit", _submit)
+    session = main({"paths": tmp_path, "markdown_max_concurrency": 2})
+
+    assert session.exit_code == ExitCode.FAILED
+    assert submitted == []
+    reports = {
+        report.task.name.split("::")[-1]: report for report in session.execution_reports
+    }
+    assert reports["task_render_a"].outcome == TaskOutcome.SUCCESS
+    assert reports["task_render_b"].outcome == TaskOutcome.FAIL
+    error = reports["task_render_b"].exc_info[1]
+    assert isinstance(error, RuntimeError)
+    assert "not found on your PATH" in str(error)
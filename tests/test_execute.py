@@ -11,7 +11,9 @@ from pytask import cli
 from pytask import ExitCode
 from pytask import main
 from pytask import Mark
+from pytask import Session
 from pytask import Task
+from pytask import TaskOutcome
 from pytask_markdown.execute import pytask_execute_task_setup
 
 
@@ -38,7 +40,7 @@ def default_source():
 def test_pytask_execute_task_setup(monkeypatch, renderer):
     """Make sure that the task setup raises errors."""
     monkeypatch.setattr(
-        "pytask_markdown.execute.shutil.which", lambda x: None  # noqa: U100
+        "pytask_markdown.renderers.shutil.which", lambda x: None  # noqa: U100
     )
     task = Task(
         base_name="example",
@@ -48,7 +50,7 @@ def test_pytask_execute_task_setup(monkeypatch, renderer):
         attributes={"renderer": renderer},
     )
     with pytest.raises(RuntimeError, match=f"{renderer} is needed"):
-        pytask_execute_task_setup(task)
+        pytask_execute_task_setup(session=Session(), task=task)
 
 
 @needs_marp
@@ -205,7 +207,7 @@ def test_raise_error_if_renderer_is_not_found(
 
     # Hide marp/quarto if available.
     monkeypatch.setattr(
-        "pytask_markdown.execute.shutil.which", lambda x: None  # noqa: U100
+        "pytask_markdown.renderers.shutil.which", lambda x: None  # noqa: U100
     )
 
     session = main({"paths": tmp_path})
@@ -376,6 +378,38 @@ def test_render_document_with_wrong_extension(runner, tmp_path):
     assert "The 'document' keyword of the" in result.output
 
 
+@pytest.mark.end_to_end
+@pytest.mark.parametrize(
+    "kwargs, message",
+    [
+        (
+            'document=["document.html", "document.pptx"]',
+            "Multiple documents can only be rendered",
+        ),
+        (
+            'document=["a.html", "b.html"], compilation_steps="quarto"',
+            "must have different suffixes",
+        ),
+    ],
+)
+def test_render_multiple_documents_with_invalid_setup(
+    runner, tmp_path, kwargs, message
+):
+    task_source = f"""
+    import pytask
+
+    @pytask.mark.markdown(script="document.qmd", {kwargs})
+    def task_render_document():
+        pass
+    """
+    tmp_path.joinpath("task_dummy.py").write_text(textwrap.dedent(task_source))
+    tmp_path.joinpath("document.qmd").write_text("## Test")
+
+    result = runner.invoke(cli, [tmp_path.as_posix()])
+    assert result.exit_code == ExitCode.COLLECTION_FAILED
+    assert message in result.output
+
+
 @pytest.mark.end_to_end
 @pytest.mark.parametrize(
     "step, message",
@@ -430,3 +464,144 @@ def test_render_document_with_task_decorator(
 
     result = runner.invoke(cli, [tmp_path.as_posix()])
     assert result.exit_code == ExitCode.OK
+
+
+@pytest.mark.end_to_end
+def test_render_document_with_python_html(runner, tmp_path):
+    task_source = """
+    import pytask
+
+    @pytask.mark.markdown(
+        script="document.md",
+        document="document.html",
+        compilation_steps="python_html",
+        css="custom.css",
+    )
+    def task_render_document():
+        pass
+    """
+    tmp_path.joinpath("task_dummy.py").write_text(textwrap.dedent(task_source))
+    tmp_path.joinpath("document.md").write_text("## Test")
+    tmp_path.joinpath("custom.css").write_text("h2 { color: red; }")
+
+    result = runner.invoke(cli, [tmp_path.as_posix()])
+
+    assert result.exit_code == ExitCode.OK
+    assert "<h2>Test</h2>" in tmp_path.joinpath("document.html").read_text()
+
+
+@pytest.mark.end_to_end
+def test_unchanged_document_is_kept(tmp_path):
+    task_source = """
+    import pytask
+    from pathlib import Path
+
+    @pytask.mark.markdown(
+        script="document.md", document="document.html", compilation_steps="python_html"
+    )
+    def task_render_document():
+        pass
+
+    @pytask.mark.depends_on("document.html")
+    @pytask.mark.produces("copy.html")
+    def task_copy(depends_on, produces):
+        produces.write_text(depends_on.read_text())
+    """
+    tmp_path.joinpath("task_dummy.py").write_text(textwrap.dedent(task_source))
+    tmp_path.joinpath("document.md").write_text("## Test")
+
+    session = main({"paths": tmp_path})
+    assert session.exit_code == ExitCode.OK
+    mtime = tmp_path.joinpath("document.html").stat().st_mtime_ns
+
+    # The heading is rendered to the same html.
+    tmp_path.joinpath("document.md").write_text("##   Test")
+    session = main({"paths": tmp_path})
+
+    assert session.exit_code == ExitCode.OK
+    outcomes = {
+        report.task.short_name.split("::")[-1]: report.outcome
+        for report in session.execution_reports
+    }
+    assert outcomes == {
+        "task_render_document": TaskOutcome.SUCCESS,
+        "task_copy": TaskOutcome.SKIP_UNCHANGED,
+    }
+    assert tmp_path.joinpath("document.html").stat().st_mtime_ns == mtime
+    assert not list(tmp_path.glob(".document.html.*"))
+
+
+@pytest.mark.end_to_end
+def test_unrelated_tasks_are_not_skipped_after_unchanged_render(tmp_path):
+    task_source = """
+    import pytask
+
+    @pytask.mark.markdown(
+        script="document.md", document="document.html", compilation_steps="python_html"
+    )
+    def task_render_document():
+        pass
+
+    @pytask.mark.depends_on("data.txt")
+    @pytask.mark.produces("out.txt")
+    def task_other(depends_on, produces):
+        produces.write_text(depends_on.read_text())
+    """
+    tmp_path.joinpath("task_dummy.py").write_text(textwrap.dedent(task_source))
+    tmp_path.joinpath("document.md").write_text("## Test")
+    tmp_path.joinpath("data.txt").write_text("1")
+
+    session = main({"paths": tmp_path})
+    assert session.exit_code == ExitCode.OK
+
+    tmp_path.joinpath("document.md").write_text("##   Test")
+    tmp_path.joinpath("data.txt").write_text("2")
+    session = main({"paths": tmp_path})
+
+    assert session.exit_code == ExitCode.OK
+    outcomes = {
+        report.task.short_name.split("::")[-1]: report.outcome
+        for report in session.execution_reports
+    }
+    assert outcomes == {
+        "task_render_document": TaskOutcome.SUCCESS,
+        "task_other": TaskOutcome.SUCCESS,
+    }
+    downstream = session.config["_markdown_downstream_tasks"]
+    assert downstream
+    assert not any(name.endswith("task_other") for name in downstream)
+    assert tmp_path.joinpath("out.txt").read_text() == "2"
+
+
+@pytest.mark.end_to_end
+def test_previous_document_is_restored_after_failure(tmp_path):
+    task_source = """
+    import subprocess
+    import pytask
+
+    def run_python_html(path_to_md, path_to_document, path_to_css):
+        path_to_document.write_text("partial")
+        raise subprocess.CalledProcessError(1, "broken")
+
+    @pytask.mark.markdown(
+        script="document.md", document="document.html", compilation_steps=STEPS
+    )
+    def task_render_document():
+        pass
+    """
+    task_source = textwrap.dedent(task_source)
+    tmp_path.joinpath("task_dummy.py").write_text(
+        task_source.replace("STEPS", "'python_html'")
+    )
+    tmp_path.joinpath("document.md").write_text("## Test")
+    session = main({"paths": tmp_path})
+    assert session.exit_code == ExitCode.OK
+    content = tmp_path.joinpath("document.html").read_text()
+
+    tmp_path.joinpath("task_dummy.py").write_text(
+        task_source.replace("STEPS", "run_python_html")
+    )
+    session = main({"paths": tmp_path})
+
+    assert session.exit_code == ExitCode.FAILED
+    assert tmp_path.joinpath("document.html").read_text() == content
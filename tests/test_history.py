@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+import sys
+import textwrap
+
+import pytest
+from pytask import cli
+from pytask import ExitCode
+from pytask import main
+from pytask_markdown.history import DATABASE_NAME
+from pytask_markdown.history import DurationHistory
+from pytask_markdown.history import MAX_RECORDS_PER_TASK
+from pytask_markdown.history import Render
+
+
+@pytest.mark.unit
+def test_estimate_from_history(tmp_path):
+    history = DurationHistory(tmp_path / DATABASE_NAME)
+    assert history.estimate([Render("a", "marp", ".pdf", 100)]) == {}
+
+    history.record(
+        [
+            (Render("a", "marp", ".pdf", 100), 4.0),
+            (Render("a", "marp", ".pdf", 100), 6.0),
+            (Render("b", "marp", ".html", 100), 1.0),
+        ]
+    )
+    estimates = history.estimate(
+        [
+            Render("a", "marp", ".pdf", 100),
+            Render("c", "marp", ".pdf", 50),
+            Render("d", "quarto", ".html", 100),
+        ]
+    )
+    assert estimates == {"a": 5.0, "c": 2.5}
+
+
+@pytest.mark.unit
+def test_history_keeps_last_records(tmp_path):
+    history = DurationHistory(tmp_path / DATABASE_NAME)
+    for i in range(MAX_RECORDS_PER_TASK + 5):
+        history.record([(Render("a", "marp", ".pdf", 100), float(i))])
+
+    estimate = history.estimate([Render("a", "marp", ".pdf", 100)])["a"]
+    assert estimate == sum(range(5, MAX_RECORDS_PER_TASK + 5)) / MAX_RECORDS_PER_TASK
+
+
+@pytest.mark.end_to_end
+@pytest.mark.skipif(sys.platform == "win32", reason="Fake marp is a shell script.")
+def test_longest_renders_are_scheduled_first(tmp_path, runner, fake_marp):
+    task_source = """
+    import pytask
+
+    for suffix in ("html", "pdf", "png"):
+
+        @pytask.mark.task(id=suffix)
+        @pytask.mark.markdown(script="document.md", document=f"document.{suffix}")
+        def task_render_document():
+            pass
+    """
+    tmp_path.joinpath("task_dummy.py").write_text(textwrap.dedent(task_source))
+    tmp_path.joinpath("document.md").write_text("## Slide")
+    tmp_path.joinpath("pyproject.toml").write_text(
+        "[tool.pytask.ini_options]\nmarkdown_duration_history = true"
+    )
+
+    history = DurationHistory(tmp_path / ".pytask" / "markdown" / DATABASE_NAME)
+    history.record(
+        [
+            (Render("other", "marp", ".html", 8), 1.0),
+            (Render("other", "marp", ".pdf", 8), 60.0),
+            (Render("other", "marp", ".png", 8), 30.0),
+        ]
+    )
+
+    result = runner.invoke(cli, [tmp_path.as_posix()])
+
+    assert result.exit_code == ExitCode.OK
+    assert "Estimated render time of markdown tasks: 1m 31s" in result.output
+    outputs = [line.split()[-1] for line in fake_marp.read_text().splitlines()]
+    suffixes = [output.rsplit(".", 1)[-1] for output in outputs]
+    assert suffixes == ["pdf", "png", "html"]
+
+
+@pytest.mark.end_to_end
+@pytest.mark.skipif(sys.platform == "win32", reason="Fake marp is a shell script.")
+def test_durations_are_recorded(tmp_path, fake_marp):  # noqa: ARG001
+    source = """
+    import pytask
+
+    @pytask.mark.markdown(script="document.md", document="document.html")
+    def task_render_document():
+        pass
+    """
+    tmp_path.joinpath("task_dummy.py").write_text(textwrap.dedent(source))
+    tmp_path.joinpath("document.md").write_text("## Slide")
+
+    session = main({"paths": tmp_path, "markdown_duration_history": True})
+
+    assert session.exit_code == ExitCode.OK
+    history = DurationHistory(tmp_path / ".pytask" / "markdown" / DATABASE_NAME)
+    task = session.tasks[0]
+    assert task.name in history.estimate([Render(task.name, "marp", ".html", 8)])
+
+
+@pytest.mark.end_to_end
+@pytest.mark.skipif(sys.platform == "win32", reason="Fake marp is a shell script.")
+def test_durations_are_not_recorded_by_default(
+    tmp_path, runner, fake_marp
+):  # noqa: ARG001
+    source = """
+    import pytask
+
+    @pytask.mark.markdown(script="document.md", document="document.html")
+    def task_render_document():
+        pass
+    """
+    tmp_path.joinpath("task_dummy.py").write_text(textwrap.dedent(source))
+    tmp_path.joinpath("document.md").write_text("## Slide")
+
+    result = runner.invoke(cli, [tmp_path.as_posix()])
+
+    assert result.exit_code == ExitCode.OK
+    assert "Estimated render time" not in result.output
+    assert not tmp_path.joinpath(".pytask", "markdown", DATABASE_NAME).exists()
@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+import sys
+import textwrap
+
+import pytest
+from pytask import cli
+from pytask import ExitCode
+from pytask import main
+from pytask_markdown import metrics
+from pytask_markdown.metrics import measure_step
+from pytask_markdown.metrics import run_command
+
+
+@pytest.mark.unit
+def test_measure_step(tmp_path):
+    document = tmp_path.joinpath("document.html")
+    script = (
+        "import pathlib, sys; data = bytearray(50 * 1024**2); "
+        "pathlib.Path(sys.argv[1]).write_text('12345')"
+    )
+
+    with measure_step("run_step", [document]) as record:
+        assert run_command([sys.executable, "-c", script, document.as_posix()]) == 0
+
+    assert record["name"] == "run_step"
+    assert record["wall_time"] > 0
+    assert record["output_size"] == 5  # noqa: PLR2004
+    if sys.platform != "win32":
+        assert record["cpu_time"] > 0
+        assert record["max_rss"] > 50 * 1024**2
+
+
+@pytest.mark.unit
+def test_measure_step_without_process(tmp_path):
+    with measure_step("run_python", [tmp_path / "document.html"]) as record:
+        pass
+    assert record["cpu_time"] is None
+    assert record["max_rss"] is None
+    assert record["output_size"] == 0
+
+
+@pytest.mark.end_to_end
+@pytest.mark.skipif(sys.platform == "win32", reason="Fake marp is a shell script.")
+def test_metrics_are_stored_and_profiled(runner, tmp_path, fake_marp):  # noqa: ARG001
+    task_source = """
+    import pytask
+
+    @pytask.mark.markdown(script="document.md", document="document.html")
+    def task_render_document():
+        pass
+    """
+    tmp_path.joinpath("task_dummy.py").write_text(textwrap.dedent(task_source))
+    tmp_path.joinpath("document.md").write_text("## Test")
+
+    session = main({"paths": tmp_path})
+
+    assert session.exit_code == ExitCode.OK
+    (record,) = session.tasks[0].attributes["markdown_metrics"]
+    assert record["name"] == "run_marp"
+    assert record["output_size"] == len("rendered")
+    assert tmp_path.joinpath(".pytask", "markdown", "metrics.json").exists()
+    assert not list(tmp_path.joinpath(".pytask", "markdown", "metrics").iterdir())
+
+    result = runner.invoke(cli, ["profile", tmp_path.as_posix()])
+    assert result.exit_code == ExitCode.OK
+    assert "Render" in result.output
+
+
+@pytest.mark.end_to_end
+@pytest.mark.skipif(sys.platform == "win32", reason="Fake marp is a shell script.")
+def test_metrics_of_removed_tasks_are_pruned(tmp_path, fake_marp):  # noqa: ARG001
+    task_source = """
+    import pytask
+
+    for name in {names}:
+
+        @pytask.mark.task(id=name)
+        @pytask.mark.markdown(script=f"{{name}}.md", document=f"{{name}}.html")
+        def task_render_document():
+            pass
+    """
+    for name in ("a", "b"):
+        tmp_path.joinpath(f"{name}.md").write_text("## Test")
+    tmp_path.joinpath("task_dummy.py").write_text(
+        textwrap.dedent(task_source.format(names=["a", "b"]))
+    )
+    session = main({"paths": tmp_path})
+    assert session.exit_code == ExitCode.OK
+
+    tmp_path.joinpath("task_dummy.py").write_text(
+        textwrap.dedent(task_source.format(names=["a"]))
+    )
+    session = main({"paths": tmp_path})
+    assert session.exit_code == ExitCode.OK
+
+    report = metrics.read_report(tmp_path / ".pytask" / "markdown")
+    assert list(report) == [session.tasks[0].name]
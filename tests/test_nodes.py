@@ -0,0 +1,174 @@
+from __future__ import annotations
+
+import json
+import os
+import sys
+import textwrap
+
+import pytest
+from pytask import cli
+from pytask import ExitCode
+from pytask import main
+from pytask_markdown import renderers
+from pytask_markdown.compilation_steps import marp
+from pytask_markdown.compilation_steps import quarto
+from pytask_markdown.nodes import compute_fingerprint
+from pytask_markdown.nodes import FINGERPRINTS_NAME
+from pytask_markdown.nodes import FingerprintNode
+
+
+TASK_SOURCE = """
+import pytask
+from pathlib import Path
+from pytask_markdown.compilation_steps import marp
+
+OPTIONS = Path(__file__).with_name("options.txt").read_text().split()
+
+@pytask.mark.markdown(
+    script="document.md",
+    document="document.html",
+    compilation_steps=marp(options=OPTIONS),
+)
+def task_render_document():
+    pass
+
+@pytask.mark.markdown(script="other.md", document="other.html")
+def task_render_other():
+    pass
+"""
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize(
+    "other, renderer_version, expected",
+    [
+        ([marp(["--html"])], "1.0", True),
+        ([marp(["--html"], timeout=10)], "1.0", True),
+        ([marp(["--html"])], "1.1", False),
+        ([marp(["--html", "--allow-local-files"])], "1.0", False),
+        ([marp(["--html"], incremental=True)], "1.0", False),
+        ([quarto()], "1.0", False),
+    ],
+)
+def test_compute_fingerprint(other, renderer_version, expected):
+    fingerprint = compute_fingerprint([marp(["--html"])], "marp", "1.0")
+    other_fingerprint = compute_fingerprint(other, "marp", renderer_version)
+    assert (fingerprint == other_fingerprint) is expected
+
+
+@pytest.mark.unit
+def test_fingerprint_node_resolves_version_once(monkeypatch):
+    calls = []
+
+    def _describe(renderer, cache_dir=None):
+        calls.append(renderer)
+        return None, "1.0"
+
+    monkeypatch.setattr(renderers, "describe", _describe)
+    node = FingerprintNode("fingerprint", [marp()], "marp")
+
+    assert node.state() == compute_fingerprint([marp()], "marp", "1.0")
+    assert node.value == node.state()
+    assert calls == ["marp"]
+
+
+@pytest.mark.end_to_end
+@pytest.mark.skipif(sys.platform == "win32", reason="Fake marp is a shell script.")
+def test_changed_options_execute_only_affected_task(tmp_path, fake_marp):
+    tmp_path.joinpath("task_dummy.py").write_text(textwrap.dedent(TASK_SOURCE))
+    tmp_path.joinpath("options.txt").write_text("--html")
+    tmp_path.joinpath("document.md").write_text("## Slide")
+    tmp_path.joinpath("other.md").write_text("## Other")
+
+    session = main({"paths": tmp_path})
+    assert session.exit_code == ExitCode.OK
+    assert len(fake_marp.read_text().splitlines()) == 2  # noqa: PLR2004
+
+    session = main({"paths": tmp_path})
+    assert session.exit_code == ExitCode.OK
+    assert len(fake_marp.read_text().splitlines()) == 2  # noqa: PLR2004
+
+    tmp_path.joinpath("options.txt").write_text("--html --allow-local-files")
+    session = main({"paths": tmp_path})
+    assert session.exit_code == ExitCode.OK
+    calls = fake_marp.read_text().splitlines()
+    assert len(calls) == 3  # noqa: PLR2004
+    assert "--allow-local-files" in calls[-1]
+    assert "document.md" in calls[-1]
+
+
+@pytest.mark.end_to_end
+@pytest.mark.skipif(sys.platform == "win32", reason="Fake marp is a shell script.")
+def test_fingerprints_of_failed_tasks_are_not_stored(tmp_path, fake_marp):
+    tmp_path.joinpath("task_dummy.py").write_text(textwrap.dedent(TASK_SOURCE))
+    tmp_path.joinpath("options.txt").write_text("--html")
+    tmp_path.joinpath("document.md").write_text("## Slide")
+    tmp_path.joinpath("other.md").write_text("## Other")
+
+    session = main({"paths": tmp_path})
+    assert session.exit_code == ExitCode.OK
+
+    executable = tmp_path.joinpath("bin", "marp")
+    executable.write_text(
+        executable.read_text().replace("with open(", "sys.exit(1)\nwith open(")
+    )
+    tmp_path.joinpath("options.txt").write_text("--html --allow-local-files")
+    session = main({"paths": tmp_path})
+    assert session.exit_code == ExitCode.FAILED
+
+    fingerprints = json.loads(
+        tmp_path.joinpath(".pytask", "markdown", FINGERPRINTS_NAME).read_text()
+    )
+    changed = {
+        name: fingerprints[name] == node.state()
+        for name, node in session.config["_markdown_fingerprint_nodes"].items()
+    }
+    assert sorted(changed.values()) == [False, True]
+
+    session = main({"paths": tmp_path})
+    assert session.exit_code == ExitCode.FAILED
+    assert len(fake_marp.read_text().splitlines()) == 2  # noqa: PLR2004
+
+
+@pytest.mark.end_to_end
+@pytest.mark.skipif(sys.platform == "win32", reason="Fake marp is a shell script.")
+def test_upgraded_renderer_executes_task_again(tmp_path, fake_marp):
+    tmp_path.joinpath("task_dummy.py").write_text(textwrap.dedent(TASK_SOURCE))
+    tmp_path.joinpath("options.txt").write_text("")
+    tmp_path.joinpath("document.md").write_text("## Slide")
+    tmp_path.joinpath("other.md").write_text("## Other")
+
+    session = main({"paths": tmp_path})
+    assert session.exit_code == ExitCode.OK
+
+    executable = tmp_path.joinpath("bin", "marp")
+    executable.write_text(executable.read_text().replace("v2.2.0", "v2.3.0"))
+    stat = executable.stat()
+    os.utime(executable, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    session = main({"paths": tmp_path})
+    assert session.exit_code == ExitCode.OK
+    assert len(fake_marp.read_text().splitlines()) == 4  # noqa: PLR2004
+
+
+@pytest.mark.end_to_end
+def test_collect_shows_nodes_of_markdown_tasks(runner, tmp_path):
+    task_source = """
+    import pytask
+
+    @pytask.mark.markdown(
+        script="document.md",
+        document="document.html",
+        compilation_steps="python_html",
+    )
+    def task_render_document():
+        pass
+    """
+    tmp_path.joinpath("task_dummy.py").write_text(textwrap.dedent(task_source))
+    tmp_path.joinpath("document.md").write_text("# Title")
+
+    result = runner.invoke(cli, ["collect", "--nodes", tmp_path.as_posix()])
+
+    assert result.exit_code == ExitCode.OK
+    assert "document.md>" in result.output
+    assert "document.html>" in result.output
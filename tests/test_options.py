@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+from contextlib import ExitStack as does_not_raise  # noqa: N813
+
+import pytest
+from pytask_markdown.compilation_steps import marp
+from pytask_markdown.compilation_steps import quarto
+from pytask_markdown.options import parse_options
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize(
+    "renderer, options, expectation, expected",
+    [
+        ("marp", (), does_not_raise(), ()),
+        ("marp", ("--html",), does_not_raise(), ("--html",)),
+        ("marp", ("--images=png",), does_not_raise(), ("--images", "png")),
+        ("marp", ("--images", "jpeg"), does_not_raise(), ("--images", "jpeg")),
+        ("marp", ("--image",), does_not_raise(), ("--image",)),
+        (
+            "marp",
+            ("--images", "--html"),
+            does_not_raise(),
+            ("--html", "--images"),
+        ),
+        ("marp", ("-c", "marp.yml"), does_not_raise(), ("--config-file", "marp.yml")),
+        (
+            "marp",
+            ("--htmlfoo",),
+            pytest.raises(ValueError, match="are invalid"),
+            None,
+        ),
+        (
+            "marp",
+            ("--html=true",),
+            pytest.raises(ValueError, match="are invalid"),
+            None,
+        ),
+        (
+            "marp",
+            ("--images=gif",),
+            pytest.raises(ValueError, match="must be one of"),
+            None,
+        ),
+        (
+            "marp",
+            ("--engine",),
+            pytest.raises(ValueError, match="requires a value"),
+            None,
+        ),
+        (
+            "marp",
+            ("--html", "--html"),
+            pytest.raises(ValueError, match="passed repeatedly"),
+            None,
+        ),
+        (
+            "marp",
+            ("--theme-set", "theme.css"),
+            pytest.raises(ValueError, match="To use a custom css"),
+            None,
+        ),
+        ("quarto", ("--to", "html"), does_not_raise(), ("--to", "html")),
+        ("quarto", ("-t", "html"), does_not_raise(), ("--to", "html")),
+        (
+            "quarto",
+            ("-M", "title:Talk", "--toc", "--metadata=author:Me"),
+            does_not_raise(),
+            ("--metadata", "title:Talk", "--metadata", "author:Me", "--toc"),
+        ),
+        ("quarto", ("--execute-daemon",), does_not_raise(), ("--execute-daemon",)),
+        (
+            "quarto",
+            ("--output", "doc.html"),
+            pytest.raises(ValueError, match="are invalid"),
+            None,
+        ),
+    ],
+)
+def test_parse_options(renderer, options, expectation, expected):
+    with expectation:
+        assert parse_options(renderer, options) == expected
+
+
+@pytest.mark.unit
+def test_equivalent_options_produce_same_step_options():
+    assert (
+        marp(["--images", "png", "--html"]).options
+        == marp(["--html", "--images=png"]).options
+    )
+    assert quarto(["-t", "html"]).options == quarto("--to=html").options
@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+import sys
+import textwrap
+
+import pytest
+from pytask import ExitCode
+from pytask import main
+from pytask_markdown.metrics import run_command
+from pytask_markdown.output import capture_output
+from pytask_markdown.output import get_buffer
+from pytask_markdown.output import OutputBuffer
+
+
+@pytest.mark.unit
+def test_buffer_keeps_last_bytes():
+    buffer = OutputBuffer(10)
+    for i in range(100):
+        buffer.write(f"{i}\n".encode())
+
+    assert buffer.getvalue() == "\n97\n98\n99\n"
+    assert buffer.n_bytes == 290  # noqa: PLR2004
+    assert sum(len(chunk) for chunk in buffer._chunks) < 20  # noqa: PLR2004
+
+
+@pytest.mark.unit
+def test_buffer_bounds_large_writes():
+    buffer = OutputBuffer(1024)
+    buffer.write(b"x" * 1024**2)
+    assert sum(len(chunk) for chunk in buffer._chunks) == 1024  # noqa: PLR2004
+    assert buffer.format_tail().startswith("The last 1 KiB of the renderer's output:")
+
+
+@pytest.mark.unit
+def test_buffer_prints_live_lines(capsys):
+    with capture_output(1024, live_prefix="slides.html") as buffer:
+        buffer.write(b"Start\nConver")
+        buffer.write(b"ting\nEnd")
+        out = capsys.readouterr().out
+        assert out == "[slides.html] Start\n[slides.html] Converting\n"
+
+    assert capsys.readouterr().out == "[slides.html] End\n"
+    assert get_buffer() is None
+
+
+@pytest.mark.unit
+def test_run_command_captures_output():
+    script = "import sys; print('out'); print('err', file=sys.stderr); sys.exit(3)"
+    with capture_output(1024) as buffer:
+        assert run_command([sys.executable, "-c", script]) == 3  # noqa: PLR2004
+    assert buffer.getvalue().split() == ["out", "err"]
+    assert buffer.format_tail() == "The output of the renderer:\n\nout\nerr"
+
+
+@pytest.mark.end_to_end
+@pytest.mark.skipif(sys.platform == "win32", reason="Fake marp is a shell script.")
+@pytest.mark.parametrize(
+    "config, captured",
+    [
+        ({"markdown_output_max_size": 64}, True),
+        ({"markdown_output_max_size": 0}, False),
+        ({}, False),
+        ({"markdown_timeout": 60}, True),
+        ({"markdown_timeout": 60, "markdown_output_max_size": 0}, False),
+    ],
+)
+def test_failed_render_reports_output(tmp_path, fake_marp, config, captured):
+    task_source = """
+    import pytask
+
+    @pytask.mark.markdown(script="document.md", document="document.html")
+    def task_render_document():
+        pass
+    """
+    tmp_path.joinpath("task_dummy.py").write_text(textwrap.dedent(task_source))
+    tmp_path.joinpath("document.md").write_text("FAIL")
+
+    session = main({"paths": tmp_path, **config})
+
+    assert session.exit_code == ExitCode.FAILED
+    message = str(session.execution_reports[0].exc_info[1])
+    assert message.startswith("Compilation step run_marp failed.")
+    assert ("Failed converting the markdown" in message) is captured
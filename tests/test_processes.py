@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import os
+import subprocess
+import sys
+import textwrap
+import time
+
+import pytest
+from pytask import ExitCode
+from pytask import main
+from pytask_markdown.engine import RenderEngine
+from pytask_markdown.metrics import run_command
+from pytask_markdown.processes import deadline
+from pytask_markdown.processes import get_timeout
+
+
+pytestmark = pytest.mark.skipif(
+    sys.platform == "win32", reason="Process groups are tested on POSIX."
+)
+
+
+SPAWN_AND_HANG = """\
+import subprocess, sys, time
+child = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(60)"])
+with open(sys.argv[1], "w") as f:
+    f.write(str(child.pid))
+time.sleep(60)
+"""
+
+
+def _is_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    # A killed child is a zombie until init reaps it.
+    with open(f"/proc/{pid}/stat") as f:
+        return f.read().split(")")[-1].split()[0] != "Z"
+
+
+def _assert_terminated(pid):
+    for _ in range(50):
+        if not _is_alive(pid):
+            return
+        time.sleep(0.1)
+    raise AssertionError(f"Process {pid} is still running.")
+
+
+@pytest.mark.unit
+def test_deadline():
+    assert get_timeout() is None
+    with deadline(10):
+        assert 9 < get_timeout() <= 10  # noqa: PLR2004
+        with deadline(None):
+            assert get_timeout() is not None
+    assert get_timeout() is None
+
+
+@pytest.mark.unit
+@pytest.mark.skipif(not os.path.exists("/proc"), reason="Needs /proc.")
+def test_run_command_terminates_process_group_on_timeout(tmp_path):
+    path_to_pid = tmp_path.joinpath("child.pid")
+    cmd = [sys.executable, "-c", SPAWN_AND_HANG, path_to_pid.as_posix()]
+
+    start = time.monotonic()
+    with deadline(1), pytest.raises(subprocess.TimeoutExpired):
+        run_command(cmd)
+
+    assert time.monotonic() - start < 10  # noqa: PLR2004
+    _assert_terminated(int(path_to_pid.read_text()))
+
+
+@pytest.mark.unit
+@pytest.mark.skipif(not os.path.exists("/proc"), reason="Needs /proc.")
+def test_engine_terminates_process_group_on_timeout(tmp_path):
+    path_to_pid = tmp_path.joinpath("child.pid")
+    cmd = [sys.executable, "-c", SPAWN_AND_HANG, path_to_pid.as_posix()]
+
+    engine = RenderEngine(max_concurrency=2)
+    try:
+        with deadline(1), pytest.raises(subprocess.TimeoutExpired):
+            engine.run(cmd)
+        assert engine.run([sys.executable, "-c", "pass"]) == 0
+    finally:
+        engine.close()
+
+    _assert_terminated(int(path_to_pid.read_text()))
+
+
+@pytest.mark.end_to_end
+@pytest.mark.parametrize(
+    "config, steps, timeout",
+    [
+        ({"markdown_timeout": 1}, "None", "1"),
+        ({"markdown_timeout": 60}, "marp(timeout=0.5)", "0.5"),
+        ({"markdown_timeout": 1, "markdown_max_concurrency": 2}, "None", "1"),
+    ],
+)
+def test_task_fails_with_timeout(tmp_path, fake_marp, config, steps, timeout):
+    task_source = f"""
+    import pytask
+    from pytask_markdown.compilation_steps import marp
+
+    @pytask.mark.markdown(
+        script="document.md", document="document.html", compilation_steps={steps}
+    )
+    def task_render_document():
+        pass
+
+    @pytask.mark.markdown(script="other.md", document="other.html")
+    def task_render_other():
+        pass
+    """
+    tmp_path.joinpath("task_dummy.py").write_text(textwrap.dedent(task_source))
+    tmp_path.joinpath("document.md").write_text("HANG")
+    tmp_path.joinpath("other.md").write_text("## Other")
+
+    session = main({"paths": tmp_path, **config})
+
+    assert session.exit_code == ExitCode.FAILED
+    reports = {
+        report.task.name.split("::")[-1]: report for report in session.execution_reports
+    }
+    exception = reports["task_render_document"].exc_info[1]
+    assert isinstance(exception, TimeoutError)
+    assert f"timed out after {timeout} seconds" in str(exception)
+    assert "Converting..." in str(exception)
+    assert tmp_path.joinpath("other.html").exists()
@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+import os
+import sys
+import textwrap
+
+import pytest
+from pytask import ExitCode
+from pytask import main
+from pytask_markdown import renderers
+
+
+FAKE_RENDERER = """\
+#!{executable}
+with open({log!r}, "a") as f:
+    f.write("probe\\n")
+print("1.2.3")
+"""
+
+
+@pytest.fixture()
+def fake_renderer(tmp_path):
+    log = tmp_path.joinpath("probes.log")
+    executable = tmp_path.joinpath("renderer")
+    executable.write_text(
+        FAKE_RENDERER.format(executable=sys.executable, log=log.as_posix())
+    )
+    executable.chmod(0o755)
+    yield executable, log
+    renderers.clear()
+
+
+@pytest.mark.unit
+@pytest.mark.skipif(sys.platform == "win32", reason="Fake renderer is a script.")
+def test_version_is_probed_once_and_stored_on_disk(tmp_path, fake_renderer):
+    executable, log = fake_renderer
+    cache_dir = tmp_path.joinpath("cache")
+
+    assert renderers.get_version(executable.as_posix(), cache_dir) == "1.2.3"
+    assert renderers.get_version(executable.as_posix(), cache_dir) == "1.2.3"
+    assert len(log.read_text().splitlines()) == 1
+
+    # A new session reads the version from disk.
+    renderers.clear()
+    assert renderers.get_version(executable.as_posix(), cache_dir) == "1.2.3"
+    assert len(log.read_text().splitlines()) == 1
+
+    # An updated renderer is probed again.
+    stat = executable.stat()
+    os.utime(executable, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    renderers.clear()
+    assert renderers.get_version(executable.as_posix(), cache_dir) == "1.2.3"
+    assert len(log.read_text().splitlines()) == 2  # noqa: PLR2004
+
+
+@pytest.mark.unit
+def test_missing_renderers_are_not_remembered(monkeypatch):
+    monkeypatch.setattr(
+        "pytask_markdown.renderers.shutil.which", lambda x: None  # noqa: U100
+    )
+    assert renderers.resolve("marp") is None
+
+    monkeypatch.setattr("pytask_markdown.renderers.shutil.which", lambda x: f"/bin/{x}")
+    assert renderers.resolve("marp") == "/bin/marp"
+    renderers.clear()
+
+
+@pytest.mark.end_to_end
+@pytest.mark.skipif(sys.platform == "win32", reason="Fake marp is a shell script.")
+def test_resolved_renderer_is_passed_to_steps(tmp_path, fake_marp):
+    task_source = """
+    import pytask
+
+    @pytask.mark.markdown(script="document.md", document="document.html")
+    def task_render_document():
+        pass
+    """
+    tmp_path.joinpath("task_dummy.py").write_text(textwrap.dedent(task_source))
+    tmp_path.joinpath("document.md").write_text("## Test")
+
+    session = main({"paths": tmp_path})
+
+    assert session.exit_code == ExitCode.OK
+    version = session.tasks[0].attributes["renderer_version"]
+    assert version.startswith("@marp-team/marp-cli")
+    assert tmp_path.joinpath(".pytask", "markdown", "renderers.json").exists()
+    assert tmp_path.joinpath("document.html").exists()
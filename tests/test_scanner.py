@@ -0,0 +1,183 @@
+from __future__ import annotations
+
+import textwrap
+
+import pytest
+from pytask import main
+from pytask_markdown import scanner
+from pytask_markdown.scanner import ParseIndex
+from pytask_markdown.scanner import scan
+
+
+MARP_SOURCE = """
+---
+marp: true
+theme: custom
+backgroundImage: url('background.png')
+---
+
+![bg left:40%](images/left.png)
+![remote](https://example.com/image.png)
+
+<!-- _backgroundImage: url("other background.png") -->
+<img src="html.jpg" alt="An image">
+
+```markdown
+![not an image](code.png)
+```
+
+![with title](title.svg "A title")
+"""
+
+
+@pytest.mark.unit
+def test_scan_marp_document(tmp_path):
+    tmp_path.joinpath("document.md").write_text(textwrap.dedent(MARP_SOURCE))
+    tmp_path.joinpath("custom.css").touch()
+
+    result = scan(tmp_path.joinpath("document.md"))
+
+    expected = [
+        "images/left.png",
+        "title.svg",
+        "background.png",
+        "other background.png",
+        "html.jpg",
+        "custom.css",
+    ]
+    assert result == [tmp_path.joinpath(name) for name in expected]
+
+
+@pytest.mark.unit
+def test_index_is_reused_until_document_changes(tmp_path, monkeypatch):
+    path = tmp_path.joinpath("document.md")
+    path.write_text("![](a.png)")
+    index_path = tmp_path.joinpath("index.json")
+
+    index = ParseIndex.from_path(index_path)
+    assert scan(path, index) == [tmp_path.joinpath("a.png")]
+    index.save()
+
+    def _fail(*args):  # noqa: ARG001
+        raise AssertionError("Document was parsed again.")
+
+    monkeypatch.setattr(scanner, "_parse_markdown", _fail)
+    assert scan(path, ParseIndex.from_path(index_path)) == [tmp_path / "a.png"]
+
+    monkeypatch.undo()
+    path.write_text("![](a.png)\n![](b.png)")
+    assert scan(path, ParseIndex.from_path(index_path)) == [
+        tmp_path / "a.png",
+        tmp_path / "b.png",
+    ]
+
+
+@pytest.mark.end_to_end
+def test_infer_markdown_dependencies(tmp_path):
+    task_source = """
+    import pytask
+
+    @pytask.mark.produces("generated.png")
+    def task_create_image(produces):
+        produces.touch()
+
+    @pytask.mark.markdown(script="document.md", document="document.html")
+    def task_render_document():
+        pass
+    """
+    tmp_path.joinpath("task_dummy.py").write_text(textwrap.dedent(task_source))
+    tmp_path.joinpath("document.md").write_text(
+        "![](existing.png)\n![](generated.png)\n![](missing.png)"
+    )
+    tmp_path.joinpath("existing.png").touch()
+
+    session = main(
+        {"paths": tmp_path, "infer_markdown_dependencies": True, "dry_run": True}
+    )
+
+    task = next(t for t in session.tasks if t.base_name == "task_render_document")
+    inferred = {
+        node.path for key, node in task.depends_on.items() if "inferred" in str(key)
+    }
+    assert inferred == {tmp_path / "existing.png", tmp_path / "generated.png"}
+    assert tmp_path.joinpath(".pytask", "markdown", "scanner.json").exists()
+
+
+QUARTO_SOURCE = """
+---
+title: Report
+bibliography:
+  - refs.bib
+  - more.bib
+csl: "style.csl"
+---
+
+{{< include sections/_intro.qmd >}}
+
+{{< embed notebook.ipynb#fig-plot >}}
+
+```{python}
+import pandas as pd
+
+df = pd.read_csv("data/input.csv")
+```
+"""
+
+
+@pytest.mark.unit
+def test_scan_quarto_document(tmp_path):
+    tmp_path.joinpath("_quarto.yml").write_text("bibliography: project.bib\n")
+    tmp_path.joinpath("report").mkdir()
+    tmp_path.joinpath("report", "_metadata.yml").write_text("csl: [other.csl]\n")
+    tmp_path.joinpath("report", "document.qmd").write_text(
+        textwrap.dedent(QUARTO_SOURCE)
+    )
+    tmp_path.joinpath("report", "sections").mkdir()
+    tmp_path.joinpath("report", "sections", "_intro.qmd").write_text(
+        "{{< include _nested.qmd >}}\n![](figure.png)"
+    )
+    tmp_path.joinpath("report", "sections", "_nested.qmd").write_text(
+        "{{< include ../../report/sections/_intro.qmd >}}"
+    )
+
+    result = scan(tmp_path.joinpath("report", "document.qmd"), quarto=True)
+
+    report = tmp_path / "report"
+    assert set(result) == {
+        tmp_path / "_quarto.yml",
+        tmp_path / "project.bib",
+        report / "_metadata.yml",
+        report / "other.csl",
+        report / "refs.bib",
+        report / "more.bib",
+        report / "style.csl",
+        report / "data" / "input.csv",
+        report / "notebook.ipynb",
+        report / "sections" / "_intro.qmd",
+        report / "sections" / "_nested.qmd",
+        report / "sections" / "figure.png",
+    }
+
+
+@pytest.mark.unit
+def test_project_files_are_ignored_without_quarto(tmp_path):
+    tmp_path.joinpath("_quarto.yml").touch()
+    tmp_path.joinpath("document.md").write_text("Text")
+    assert scan(tmp_path.joinpath("document.md")) == []
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize(
+    "code",
+    [
+        'plt.savefig("written.png")',
+        'df.to_csv("written.csv", index=False)',
+        'with open("written.txt", mode="w") as f:\n    pass',
+        'ggsave(\n  filename = "written.png"\n)',
+        'write.csv(df, "written.csv")',
+    ],
+)
+def test_files_written_by_code_chunks_are_ignored(tmp_path, code):
+    source = f'```{{python}}\ndata = open("read.txt").read()\n{code}\n```\n'
+    tmp_path.joinpath("document.qmd").write_text(source)
+    assert scan(tmp_path.joinpath("document.qmd")) == [tmp_path / "read.txt"]
@@ -0,0 +1,202 @@
+from __future__ import annotations
+
+import re
+import textwrap
+from pathlib import Path
+
+import pytest
+from pytask_markdown.compilation_steps import marp
+from pytask_markdown.slides import get_path_to_manifest
+from pytask_markdown.slides import get_path_to_slide
+from pytask_markdown.slides import render_slides
+from pytask_markdown.slides import split_deck
+
+
+FRONT_MATTER = """\
+---
+marp: true
+theme: gaia
+---
+
+"""
+
+
+def _deck(*slides, front_matter=FRONT_MATTER):
+    return front_matter + "\n\n---\n\n".join(textwrap.dedent(s) for s in slides)
+
+
+@pytest.fixture()
+def convert():
+    """Imitate marp which writes every slide of a deck to a numbered image."""
+    calls = []
+
+    def _convert(path_to_md, path_to_document):
+        text = path_to_md.read_text()
+        body = re.sub(r"\A---\n.*?\n---\n", "", text, flags=re.S)
+        slides = re.split(r"^---$", body, flags=re.M)
+        calls.append([slide.strip() for slide in slides])
+        for i, slide in enumerate(slides, start=1):
+            get_path_to_slide(path_to_document, i).write_text(slide.strip())
+
+    _convert.calls = calls
+    return _convert
+
+
+@pytest.mark.unit
+def test_split_deck():
+    deck = split_deck(
+        _deck(
+            "# One\n<!-- class: lead -->\n",
+            "# Two <!-- _color: red -->\n\n```\n---\n```\n",
+            "<!-- theme: uncover -->\n# Three\n",
+        )
+    )
+
+    assert deck.front_matter == FRONT_MATTER.rstrip() + "\n"
+    assert len(deck.slides) == 3  # noqa: PLR2004
+    assert deck.inherited_contexts == ["", *["<!-- class: lead -->"] * 2]
+    assert deck.global_context == "<!-- theme: uncover -->"
+    assert deck.supported
+
+
+@pytest.mark.unit
+def test_split_deck_with_pagination_is_not_supported():
+    deck = split_deck(_deck("# One", "<!-- paginate: true -->\n# Two"))
+    assert not deck.supported
+
+
+@pytest.mark.unit
+def test_render_only_changed_slides(tmp_path, convert):
+    path_to_md = tmp_path.joinpath("deck.md")
+    path_to_document = tmp_path.joinpath("deck.png")
+
+    path_to_md.write_text(_deck("# One", "# Two", "# Three"))
+    render_slides(path_to_md, path_to_document, "", convert)
+
+    assert convert.calls == [["# One", "# Two", "# Three"]]
+    assert path_to_document.read_text() == "# One"
+    assert get_path_to_manifest(path_to_document).exists()
+
+    path_to_md.write_text(_deck("# One", "# Two changed", "# Three"))
+    render_slides(path_to_md, path_to_document, "", convert)
+
+    assert convert.calls[1] == ["# Two changed"]
+    assert [get_path_to_slide(path_to_document, i).read_text() for i in (1, 2, 3)] == [
+        "# One",
+        "# Two changed",
+        "# Three",
+    ]
+
+
+@pytest.mark.unit
+def test_moved_slides_are_reused_and_stale_slides_removed(tmp_path, convert):
+    path_to_md = tmp_path.joinpath("deck.md")
+    path_to_document = tmp_path.joinpath("deck.png")
+
+    path_to_md.write_text(_deck("# One", "# Two", "# Three"))
+    render_slides(path_to_md, path_to_document, "", convert)
+
+    path_to_md.write_text(_deck("# New", "# One", "# Three"))
+    render_slides(path_to_md, path_to_document, "", convert)
+
+    assert convert.calls[1] == ["# New"]
+    assert [get_path_to_slide(path_to_document, i).read_text() for i in (1, 2, 3)] == [
+        "# New",
+        "# One",
+        "# Three",
+    ]
+    assert path_to_document.read_text() == "# New"
+
+    path_to_md.write_text(_deck("# New", "# One"))
+    render_slides(path_to_md, path_to_document, "", convert)
+
+    assert len(convert.calls) == 2  # noqa: PLR2004
+    assert not get_path_to_slide(path_to_document, 3).exists()
+
+
+@pytest.mark.unit
+def test_inherited_directives_are_kept(tmp_path, convert):
+    path_to_md = tmp_path.joinpath("deck.md")
+    path_to_document = tmp_path.joinpath("deck.png")
+
+    path_to_md.write_text(_deck("<!-- class: lead -->\n# One", "# Two", "# Three"))
+    render_slides(path_to_md, path_to_document, "", convert)
+
+    path_to_md.write_text(_deck("<!-- class: lead -->\n# One", "# Two", "# Changed"))
+    render_slides(path_to_md, path_to_document, "", convert)
+
+    assert convert.calls[1] == ["<!-- class: lead -->\n\n# Changed"]
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize(
+    "front_matter, key",
+    [
+        (FRONT_MATTER.replace("theme: gaia", "theme: uncover"), ""),
+        (FRONT_MATTER.replace("theme: gaia", "paginate: true"), ""),
+        (FRONT_MATTER, "other options"),
+    ],
+)
+def test_render_whole_deck(tmp_path, convert, front_matter, key):
+    path_to_md = tmp_path.joinpath("deck.md")
+    path_to_document = tmp_path.joinpath("deck.png")
+
+    path_to_md.write_text(_deck("# One", "# Two"))
+    render_slides(path_to_md, path_to_document, "", convert)
+    path_to_md.write_text(_deck("# One", "# Two", front_matter=front_matter))
+    render_slides(path_to_md, path_to_document, key, convert)
+
+    assert convert.calls[1] == ["# One", "# Two"]
+
+
+@pytest.mark.unit
+def test_marp_renders_slides_incrementally(tmp_path, monkeypatch):
+    commands = []
+
+    def _run(cmd, **kwargs):  # noqa: ARG001
+        commands.append(cmd)
+        n_slides = len(split_deck(Path(cmd[1]).read_text()).slides)
+        path_to_document = Path(cmd[cmd.index("--output") + 1])
+        for i in range(1, n_slides + 1):
+            get_path_to_slide(path_to_document, i).write_text("image")
+        return 0
+
+    monkeypatch.setattr("pytask_markdown.compilation_steps.run_command", _run)
+    step = marp(["--images", "png"], incremental=True)
+    path_to_md = tmp_path.joinpath("deck.md")
+
+    for text in (_deck("# One", "# Two"), _deck("# One", "# Changed")):
+        path_to_md.write_text(text)
+        step(
+            path_to_md=path_to_md,
+            path_to_document=tmp_path / "deck.png",
+            path_to_css=None,
+        )
+
+    assert len(commands) == 2  # noqa: PLR2004
+    assert Path(commands[0][1]) == path_to_md
+    assert Path(commands[1][1]).name == ".deck.partial.md"
+    assert tmp_path.joinpath("deck.png").exists()
+
+
+@pytest.mark.unit
+def test_changed_assets_render_slides_again(tmp_path, convert):
+    path_to_md = tmp_path.joinpath("deck.md")
+    path_to_document = tmp_path.joinpath("deck.png")
+    chart = tmp_path.joinpath("images", "chart.png")
+    chart.parent.mkdir()
+    chart.write_text("chart")
+    logo = tmp_path.joinpath("logo.png")
+    logo.write_text("logo")
+    dependencies = [chart, logo]
+
+    path_to_md.write_text(_deck("# One", "![](images/chart.png)", "# Three"))
+    render_slides(path_to_md, path_to_document, "", convert, dependencies)
+
+    chart.write_text("changed chart")
+    render_slides(path_to_md, path_to_document, "", convert, dependencies)
+    assert convert.calls[1] == ["![](images/chart.png)"]
+
+    logo.write_text("changed logo")
+    render_slides(path_to_md, path_to_document, "", convert, dependencies)
+    assert len(convert.calls[2]) == 3  # noqa: PLR2004
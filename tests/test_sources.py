@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+import os
+import sys
+import textwrap
+
+import pytest
+from pytask import ExitCode
+from pytask import main
+from pytask import TaskOutcome
+from pytask_markdown.sources import fingerprint
+from pytask_markdown.sources import normalize
+from pytask_markdown.sources import SourceIndex
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize(
+    "text, other, normalizers, expected",
+    [
+        ("# A\n\nText\n", "# A \t\n\n\n\nText \r\n\n", ["whitespace"], True),
+        ("Line  \nbreak\n", "Line\nbreak\n", ["whitespace"], False),
+        ("```\ncode\n```\n", "```\ncode  \n```\n", ["whitespace"], False),
+        ("# A\n", "# A\n<!-- todo -->\n", ["comments"], True),
+        ("a b\n", "a <!-- x --> b\n", ["comments"], False),
+        ("# A\n", "# A\n<!-- todo -->\n", ["whitespace"], False),
+        ("# A\n", "# A\n<!-- paginate: true -->\n", ["comments"], False),
+        ("```\n```\n", "```\n<!-- x -->\n```\n", ["comments"], False),
+        ("---\na: 1\n---\n", "---\na: 1\n\n\n---\n", ["whitespace"], False),
+        ("# A\n", "# A\n<!-- note -->\n", ["notes"], True),
+        ("# A\n", "# A\n\n::: {.notes}\nNote\n:::\n", ["notes"], False),
+        ("# A\n\n", "# A\n\n::: {.notes}\nNote\n:::\n", ["notes"], True),
+        ("# A\n\n", "# A\n\n::: notes\n::: {.x}\n:::\n:::\n", ["notes"], True),
+        ("# A\n\n", "# A\n\n::: notes\n```\n:::\n```\n:::\n", ["notes"], True),
+    ],
+)
+def test_normalize(text, other, normalizers, expected):
+    assert (normalize(text, normalizers) == normalize(other, normalizers)) is expected
+
+
+@pytest.mark.unit
+def test_fingerprint_is_reused_while_size_and_mtime_match(tmp_path):
+    path = tmp_path.joinpath("document.md")
+    path.write_text("# Slide A")
+    index = SourceIndex(tmp_path.joinpath("sources.json"))
+    first = fingerprint(path, ["whitespace"], index)
+    index.save()
+
+    stat = path.stat()
+    path.write_text("# Slide B")
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    index = SourceIndex.from_path(tmp_path.joinpath("sources.json"))
+    assert fingerprint(path, ["whitespace"], index) == first
+    assert fingerprint(path, ["comments"], index) != first
+
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert fingerprint(path, ["whitespace"], index) != first
+
+
+def _get_outcomes(session):
+    return {
+        report.task.name.split("::")[-1]: report.outcome
+        for report in session.execution_reports
+    }
+
+
+@pytest.mark.end_to_end
+def test_insignificant_edits_do_not_execute_task(tmp_path):
+    task_source = """
+    import pytask
+
+    @pytask.mark.markdown(
+        script="document.md",
+        document="document.html",
+        compilation_steps="python_html",
+    )
+    def task_render_document():
+        pass
+    """
+    tmp_path.joinpath("task_dummy.py").write_text(textwrap.dedent(task_source))
+    path_to_md = tmp_path.joinpath("document.md")
+    path_to_md.write_text("# Title\n\nText\n")
+    config = {
+        "paths": tmp_path,
+        "markdown_source_normalization": "whitespace, comments",
+    }
+
+    session = main({**config})
+    assert session.exit_code == ExitCode.OK
+    assert tmp_path.joinpath(".pytask", "markdown", "sources.json").exists()
+
+    path_to_md.write_text("# Title \n\n\n<!-- todo -->\nText \n")
+    session = main({**config})
+    assert session.exit_code == ExitCode.OK
+    assert _get_outcomes(session) == {
+        "task_render_document": TaskOutcome.SKIP_UNCHANGED
+    }
+
+    path_to_md.write_text("# Title\n\nOther text\n")
+    session = main({**config})
+    assert session.exit_code == ExitCode.OK
+    assert _get_outcomes(session) == {"task_render_document": TaskOutcome.SUCCESS}
+    assert "Other text" in tmp_path.joinpath("document.html").read_text()
+
+
+@pytest.mark.end_to_end
+@pytest.mark.skipif(sys.platform == "win32", reason="Fake marp is a shell script.")
+@pytest.mark.parametrize(
+    "normalization", [["notes"], ["comments"], ["notes", "comments"]]
+)
+def test_notes_are_ignored_for_pdf_documents(tmp_path, fake_marp, normalization):
+    task_source = """
+    import pytask
+
+    for suffix in ("html", "pdf"):
+
+        @pytask.mark.task(id=suffix)
+        @pytask.mark.markdown(script=f"{suffix}.md", document=f"document.{suffix}")
+        def task_render_document():
+            pass
+    """
+    tmp_path.joinpath("task_dummy.py").write_text(textwrap.dedent(task_source))
+    for name in ("html.md", "pdf.md"):
+        tmp_path.joinpath(name).write_text("## Slide\n\n<!-- Note -->\n")
+    config = {"paths": tmp_path, "markdown_source_normalization": normalization}
+
+    session = main({**config})
+    assert session.exit_code == ExitCode.OK
+    assert len(fake_marp.read_text().splitlines()) == 2  # noqa: PLR2004
+
+    for name in ("html.md", "pdf.md"):
+        tmp_path.joinpath(name).write_text("## Slide\n\n<!-- Other note -->\n")
+    session = main({**config})
+    assert session.exit_code == ExitCode.OK
+    assert _get_outcomes(session) == {
+        "task_render_document[html]": TaskOutcome.SUCCESS,
+        "task_render_document[pdf]": TaskOutcome.SKIP_UNCHANGED,
+    }
+
+
+@pytest.mark.end_to_end
+def test_unknown_normalization_raises_error(tmp_path):
+    session = main({"paths": tmp_path, "markdown_source_normalization": "spaces"})
+    assert session.exit_code == ExitCode.CONFIGURATION_FAILED
@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import subprocess
+import sys
+import textwrap
+import threading
+import time
+
+import pytest
+from pytask import ExitCode
+from pytask import main
+from pytask_markdown.compilation_steps import marp
+from pytask_markdown.compilation_steps import python_html
+from pytask_markdown.compilation_steps import quarto
+from pytask_markdown.tokens import is_heavy
+from pytask_markdown.tokens import TokenPool
+
+
+HOLD_TOKEN = """\
+import sys
+from pathlib import Path
+from pytask_markdown.tokens import TokenPool
+
+with TokenPool(Path(sys.argv[1]), 1).acquire():
+    print("acquired", flush=True)
+    sys.stdin.read()
+"""
+
+
+@pytest.mark.unit
+def test_pool_limits_concurrent_holders(tmp_path):
+    pool = TokenPool(tmp_path, 2)
+    lock = threading.Lock()
+    active = []
+    max_active = []
+
+    def _render():
+        with pool.acquire():
+            with lock:
+                active.append(1)
+                max_active.append(len(active))
+            time.sleep(0.05)
+            with lock:
+                active.pop()
+
+    threads = [threading.Thread(target=_render) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(max_active) == 6  # noqa: PLR2004
+    assert max(max_active) == 2  # noqa: PLR2004
+
+
+@pytest.mark.unit
+def test_pool_is_shared_with_other_processes(tmp_path):
+    process = subprocess.Popen(
+        [sys.executable, "-c", HOLD_TOKEN, tmp_path.as_posix()],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    try:
+        assert process.stdout.readline() == "acquired\n"
+        threading.Timer(0.3, process.stdin.close).start()
+
+        start = time.monotonic()
+        with TokenPool(tmp_path, 1).acquire() as token:
+            assert token == 0
+        assert time.monotonic() - start > 0.2  # noqa: PLR2004
+    finally:
+        process.wait()
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize(
+    "steps, script, documents, expected",
+    [
+        ([marp()], "## Slide", ["a.html"], False),
+        ([marp()], "## Slide", ["a.pdf"], True),
+        ([marp("--images=png")], "## Slide", ["a.png"], True),
+        ([quarto()], "## Text", ["a.html"], False),
+        ([quarto()], "```{python}\n1 + 1\n```", ["a.html"], True),
+        ([quarto()], "```{=html}\n<br>\n```", ["a.html"], False),
+        ([quarto("--no-execute")], "```{r}\n1\n```", ["a.html"], False),
+        ([python_html()], "## Text", ["a.html"], False),
+    ],
+)
+def test_is_heavy(tmp_path, steps, script, documents, expected):
+    path_to_md = tmp_path.joinpath("a.qmd")
+    path_to_md.write_text(script)
+    paths_to_documents = [tmp_path / doc for doc in documents]
+    assert is_heavy(steps, path_to_md, paths_to_documents) is expected
+
+
+@pytest.mark.end_to_end
+@pytest.mark.skipif(sys.platform == "win32", reason="Fake marp is a shell script.")
+def test_heavy_tasks_are_tagged(tmp_path, fake_marp):
+    task_source = """
+    import pytask
+
+    for suffix in ("html", "pdf"):
+
+        @pytask.mark.task(id=suffix)
+        @pytask.mark.markdown(script="document.md", document=f"document.{suffix}")
+        def task_render_document():
+            pass
+    """
+    tmp_path.joinpath("task_dummy.py").write_text(textwrap.dedent(task_source))
+    tmp_path.joinpath("document.md").write_text("## Slide")
+
+    session = main(
+        {
+            "paths": tmp_path,
+            "markdown_max_heavy_renders": 1,
+            "markdown_max_concurrency": 2,
+        }
+    )
+
+    assert session.exit_code == ExitCode.OK
+    heavy = {
+        task.name.split("[")[-1][:-1]: task.attributes["markdown_heavy"]
+        for task in session.tasks
+    }
+    assert heavy == {"html": False, "pdf": True}
+    assert len(fake_marp.read_text().splitlines()) == 2  # noqa: PLR2004
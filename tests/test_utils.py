@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+import os
+
+import pytest
+from pytask_markdown.utils import have_same_content
+from pytask_markdown.utils import remove_previous_documents
+from pytask_markdown.utils import replace_if_changed
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize(
+    "content, other, expected",
+    [
+        (b"abc", b"abc", True),
+        (b"abc", b"abd", False),
+        (b"abc", b"abcd", False),
+        (b"", b"", True),
+        (b"a" * 3 * 1024**2, b"a" * 3 * 1024**2, True),
+        (b"a" * 3 * 1024**2, b"a" * (3 * 1024**2 - 1) + b"b", False),
+    ],
+)
+def test_have_same_content(tmp_path, content, other, expected):
+    tmp_path.joinpath("a").write_bytes(content)
+    tmp_path.joinpath("b").write_bytes(other)
+    assert have_same_content(tmp_path / "a", tmp_path / "b") is expected
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("content, replaced", [("abc", False), ("abd", True)])
+def test_replace_if_changed(tmp_path, content, replaced):
+    source = tmp_path.joinpath("source")
+    target = tmp_path.joinpath("target")
+    source.write_text(content)
+    target.write_text("abc")
+    os.utime(target, ns=(0, 10**9))
+
+    replace_if_changed(source, target)
+
+    assert not source.exists()
+    assert target.read_text() == content
+    assert (target.stat().st_mtime_ns != 10**9) is replaced
+
+
+@pytest.mark.unit
+def test_remove_previous_documents(tmp_path):
+    names = [".doc.html.123.previous", ".doc.pdf.1.previous", ".doc.html.previous"]
+    for name in names:
+        tmp_path.joinpath(name).touch()
+
+    remove_previous_documents([tmp_path / "doc.html", tmp_path / "missing" / "a.pdf"])
+
+    assert sorted(p.name for p in tmp_path.iterdir()) == sorted(names[1:])
@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import json
+import subprocess
+import textwrap
+
+import pytest
+from conftest import needs_node
+from pytask_markdown.output import capture_output
+from pytask_markdown.processes import deadline
+from pytask_markdown.workers import find_marp_package
+from pytask_markdown.workers import MarpWorkerPool
+
+
+FAKE_MARP_CLI = """
+const fs = require("fs");
+
+exports.marpCli = async (args) => {
+  console.log("Converting...");
+  if (args.includes("--hang")) {
+    await new Promise(() => {});
+  }
+  if (args.includes("--fail")) {
+    return 1;
+  }
+  fs.writeFileSync(args[args.indexOf("--output") + 1], args.join(" "));
+  return 0;
+};
+"""
+
+
+@pytest.fixture()
+def fake_marp_package(tmp_path):
+    path = tmp_path.joinpath("node_modules", "@marp-team", "marp-cli")
+    path.mkdir(parents=True)
+    path.joinpath("package.json").write_text(
+        json.dumps({"name": "@marp-team/marp-cli", "main": "index.js"})
+    )
+    path.joinpath("index.js").write_text(textwrap.dedent(FAKE_MARP_CLI))
+    path.joinpath("marp-cli.js").touch()
+    return path
+
+
+@needs_node
+@pytest.mark.unit
+def test_pool_renders_documents(tmp_path, fake_marp_package):
+    pool = MarpWorkerPool(2, fake_marp_package)
+    try:
+        for i in range(3):
+            out = tmp_path.joinpath(f"out_{i}.html")
+            assert pool.run(["in.md", "--output", out.as_posix()]) == 0
+            assert out.read_text() == f"in.md --output {out.as_posix()}"
+        assert pool.run(["in.md", "--fail"]) == 1
+    finally:
+        pool.close()
+
+
+@needs_node
+@pytest.mark.unit
+def test_pool_returns_captured_output(tmp_path, fake_marp_package):
+    pool = MarpWorkerPool(1, fake_marp_package)
+    try:
+        with capture_output(1024) as buffer:
+            assert pool.run(["in.md", "--fail"]) == 1
+        assert buffer.getvalue() == "Converting...\n"
+    finally:
+        pool.close()
+
+
+@needs_node
+@pytest.mark.unit
+def test_pool_replaces_worker_after_timeout(tmp_path, fake_marp_package):
+    pool = MarpWorkerPool(1, fake_marp_package)
+    try:
+        with deadline(0.5), pytest.raises(subprocess.TimeoutExpired):
+            pool.run(["in.md", "--hang"])
+        out = tmp_path.joinpath("out.html")
+        assert pool.run(["in.md", "--output", out.as_posix()]) == 0
+    finally:
+        pool.close()
+
+
+@pytest.mark.unit
+def test_find_marp_package(tmp_path, monkeypatch, fake_marp_package):
+    bin_dir = tmp_path.joinpath("bin")
+    bin_dir.mkdir()
+    bin_dir.joinpath("marp").symlink_to(fake_marp_package.joinpath("marp-cli.js"))
+    monkeypatch.setattr(
+        "pytask_markdown.workers.shutil.which",
+        lambda x: bin_dir.joinpath(x).as_posix(),
+    )
+    assert find_marp_package("marp") == fake_marp_package
+
+
+@pytest.mark.unit
+def test_find_marp_package_of_resolved_executable(tmp_path, fake_marp_package):
+    executable = tmp_path.joinpath("elsewhere", "marp")
+    executable.parent.mkdir()
+    executable.symlink_to(fake_marp_package.joinpath("marp-cli.js"))
+    fake_marp_package.joinpath("marp-cli.js").chmod(0o755)
+    assert find_marp_package(executable.as_posix()) == fake_marp_package